@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+拦截器开销基准工具
+按服务器的配置（GRPC_LOG_SAMPLE_RATE、GRPC_METHOD_CONCURRENCY，见grpc_server.load_server_settings）
+创建FusedInterceptor，分别计时直接调用空处理器和经拦截器包装后调用，输出每次调用的额外开销；
+不启动服务器、不经过网络，处理器不访问数据库，结果只包含拦截器本身（并发限制、会话作用域、错误处理、日志）。
+日志照常格式化，输出写入空设备
+"""
+import argparse
+import logging
+import os
+import timeit
+from collections import namedtuple
+
+import grpc
+
+from grpc_server import init_flask_app, load_server_settings
+from grpc_services.interceptors import FusedInterceptor
+from utils.app_context import CallSessionScope
+
+HandlerCallDetails = namedtuple('HandlerCallDetails', ['method', 'invocation_metadata'])
+
+
+class BenchContext:
+    """基准用的最小gRPC上下文（顺序调用不会触发并发限制，abort只在异常时出现）"""
+
+    def abort(self, code, details):
+        raise RuntimeError(f"{code}: {details}")
+
+    def is_active(self) -> bool:
+        return True
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="测量gRPC拦截器每次调用的开销")
+    parser.add_argument('--method', default='/plotinus.ConstellationService/ExportConstellations',
+                        help="方法全名（默认ExportConstellations，受并发限制的方法会同时计入获取/释放许可）")
+    parser.add_argument('--calls', type=int, default=20000, help="每轮调用次数，默认20000")
+    parser.add_argument('--repeat', type=int, default=5, help="轮数（取最快一轮），默认5")
+    parser.add_argument('--messages', type=int, default=10, help="流式方法每次调用的消息数，默认10")
+    return parser.parse_args()
+
+
+def time_per_call(func, calls: int, repeat: int) -> float:
+    """最快一轮中每次调用的耗时（微秒）"""
+    return min(timeit.repeat(func, number=calls, repeat=repeat)) / calls * 1e6
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+    settings = load_server_settings()
+    interceptor = FusedInterceptor(
+        CallSessionScope(init_flask_app()),
+        settings.method_concurrency,
+        settings.log_sample_rate
+    )
+
+    # 日志照常格式化和写出，只是不输出到终端
+    devnull = open(os.devnull, 'w')
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(devnull)
+
+    details = HandlerCallDetails(args.method, (('user_id', '1'), ('authorization', 'Bearer x')))
+    context = BenchContext()
+    messages = list(range(args.messages))
+
+    def unary(request, context):
+        return request
+
+    def stream(request, context):
+        yield from messages
+
+    unary_handler = grpc.unary_unary_rpc_method_handler(unary)
+    stream_handler = grpc.unary_stream_rpc_method_handler(stream)
+
+    def bare_unary():
+        unary(1, context)
+
+    def wrapped_unary():
+        interceptor.intercept_service(lambda _: unary_handler, details).unary_unary(1, context)
+
+    def bare_stream():
+        for _ in stream(1, context):
+            pass
+
+    def wrapped_stream():
+        for _ in interceptor.intercept_service(lambda _: stream_handler, details).unary_stream(1, context):
+            pass
+
+    print("=" * 70)
+    print("  拦截器开销基准")
+    print("=" * 70)
+    print(f"方法: {args.method}")
+    print(f"并发上限: {settings.method_concurrency.get(args.method, '不限')}")
+    print(f"日志抽样比例: {settings.log_sample_rate}")
+    print(f"每轮调用: {args.calls}，轮数: {args.repeat}，流式消息数: {args.messages}")
+    print("-" * 70)
+
+    for label, bare, wrapped in (('一元', bare_unary, wrapped_unary), ('流式', bare_stream, wrapped_stream)):
+        bare_us = time_per_call(bare, args.calls, args.repeat)
+        wrapped_us = time_per_call(wrapped, args.calls, args.repeat)
+        print(f"{label}: 直接调用 {bare_us:7.2f} us  经拦截器 {wrapped_us:7.2f} us  "
+              f"开销 {wrapped_us - bare_us:7.2f} us/次")
+    print("=" * 70)
+    devnull.close()
+
+
+if __name__ == '__main__':
+    main()
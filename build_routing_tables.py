@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+路由表批处理工具
+按时间步为星座计算全网路由表（每颗卫星去往每个目的卫星的下一跳），
+每个时间步在进程池中并行计算，结果以压缩的NumPy矩阵写入磁盘和/或Redis；
+可选按距离和地球遮挡剔除该时刻不可用的链接
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from dal.satellite_dal import SatelliteDAL, LinkedSatelliteDAL
+from history.model import ConstellationModel
+from orbit.feasibility import DEFAULT_CLEARANCE_KM, link_feasibility
+from orbit.isl_graph import ISLGraph
+from orbit.propagator import PackedConstellation, build_time_grid
+from orbit.routing import next_hop_table, node_positions
+from utils.app_context import create_db_app
+from utils.redis_client import RedisClient
+from utils.redis_keys import LinkKeys, TTL
+
+# 工作进程内的全局状态（由initializer设置一次，避免每个任务重复传输链路和TLE）
+_worker_state = {}
+
+
+def _init_worker(constellation_id, link_rows, tle_rows, options):
+    """工作进程初始化：构建链路图并编译TLE"""
+    _worker_state['constellation_id'] = constellation_id
+    _worker_state['graph'] = ISLGraph.from_rows(constellation_id, link_rows)
+    _worker_state['packed'] = PackedConstellation.from_tle_rows(tle_rows)
+    _worker_state['options'] = options
+
+
+def _build_table(timestamp):
+    """计算某一时刻的路由表并写出，返回 (时刻, 字节数, 可达比例)"""
+    constellation_id = _worker_state['constellation_id']
+    graph = _worker_state['graph']
+    options = _worker_state['options']
+
+    positions = None
+    if options['metric'] == 'latency':
+        positions = node_positions(graph, _worker_state['packed'], timestamp)
+
+    link_mask = None
+    if options['check_links']:
+        link_mask = link_feasibility(
+            graph, _worker_state['packed'], timestamp, timestamp, 1,
+            max_range_km=options['max_range'], clearance_km=options['clearance']
+        )[0]
+    table = next_hop_table(graph, positions, link_mask)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, time=np.int64(timestamp), node_ids=graph.node_ids, next_hop=table)
+    data = buffer.getvalue()
+
+    if options['output_dir']:
+        file_name = f"routing_{constellation_id}_{timestamp}.npz"
+        with open(os.path.join(options['output_dir'], file_name), 'wb') as f:
+            f.write(data)
+
+    if options['redis']:
+        RedisClient.cache_data(LinkKeys.routing_table(constellation_id, timestamp), data, options['ttl'])
+
+    reachable = float(np.count_nonzero(table >= 0)) / table.size if table.size else 0.0
+    return timestamp, len(data), reachable
+
+
+def load_constellation(constellation_id):
+    """在应用上下文中读取星座的链路和TLE"""
+    app = create_db_app(__name__)
+    with app.app_context():
+        if ConstellationModel.query.get(constellation_id) is None:
+            return None, None
+        link_rows = LinkedSatelliteDAL.get_link_rows(constellation_id)
+        tle_rows = SatelliteDAL.get_tle_rows(constellation_id)
+    return link_rows, tle_rows
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="按时间步批量计算星座全网路由表")
+    parser.add_argument('constellation_id', type=int, help="星座ID")
+    parser.add_argument('--start', type=int, required=True, help="起始时刻（Unix秒）")
+    parser.add_argument('--end', type=int, required=True, help="结束时刻（Unix秒）")
+    parser.add_argument('--step', type=int, default=60, help="时间步长（秒），默认60")
+    parser.add_argument('--metric', choices=['latency', 'hops'], default='latency',
+                        help="路由度量：latency按星间距离，hops按跳数（默认latency）")
+    parser.add_argument('--check-links', action='store_true',
+                        help="剔除该时刻超出通信距离或被地球遮挡的链接")
+    parser.add_argument('--max-range', type=float, default=None,
+                        help="最大通信距离（km），仅在--check-links时生效，默认不限")
+    parser.add_argument('--clearance', type=float, default=DEFAULT_CLEARANCE_KM,
+                        help=f"视线距地面的最小高度（km），默认{DEFAULT_CLEARANCE_KM:g}")
+    parser.add_argument('--output', default='routing_tables',
+                        help="输出目录（默认routing_tables，传空字符串则不写磁盘）")
+    parser.add_argument('--redis', action='store_true', help="同时写入Redis")
+    parser.add_argument('--ttl', type=int, default=TTL.LONG, help="Redis过期时间（秒），默认1小时")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="进程数，默认CPU核数")
+    return parser.parse_args()
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+
+    if not args.output and not args.redis:
+        print("错误: 至少需要指定一个输出（--output 或 --redis）")
+        sys.exit(1)
+
+    try:
+        times = build_time_grid(args.start, args.end, args.step)
+    except ValueError as e:
+        print(f"错误: 时间参数无效 - {str(e)}")
+        sys.exit(1)
+
+    print("=" * 70)
+    print("  路由表批处理工具")
+    print("=" * 70)
+
+    print(f"\n[1/3] 读取星座 {args.constellation_id} 的链路和TLE...")
+    link_rows, tle_rows = load_constellation(args.constellation_id)
+    if link_rows is None:
+        print(f"错误: 星座不存在 - {args.constellation_id}")
+        sys.exit(1)
+    if not link_rows:
+        print("错误: 星座没有任何链路")
+        sys.exit(1)
+    print(f"链路: {len(link_rows)} 条，卫星: {len(tle_rows)} 颗")
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    options = {
+        'metric': args.metric,
+        'check_links': args.check_links,
+        'max_range': args.max_range,
+        'clearance': args.clearance,
+        'output_dir': args.output,
+        'redis': args.redis,
+        'ttl': args.ttl
+    }
+
+    print(f"\n[2/3] 计算 {len(times)} 个时间步（{args.workers} 个进程）...")
+    started = time.time()
+    total_bytes = 0
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.constellation_id, link_rows, tle_rows, options)
+    ) as executor:
+        futures = [executor.submit(_build_table, int(t)) for t in times]
+        for done, future in enumerate(as_completed(futures), 1):
+            timestamp, size, reachable = future.result()
+            total_bytes += size
+            print(f"  [{done}/{len(times)}] t={timestamp}  {size} 字节  可达比例 {reachable:.1%}")
+
+    print("\n[3/3] 完成")
+    print("=" * 70)
+    print(f"时间步: {len(times)}")
+    print(f"总大小: {total_bytes} 字节")
+    print(f"耗时: {time.time() - started:.1f} 秒")
+    if args.output:
+        print(f"输出目录: {args.output}")
+    if args.redis:
+        print(f"Redis键: {LinkKeys.routing_table(args.constellation_id, '<时刻>')}")
+    print("=" * 70)
+
+
+if __name__ == '__main__':
+    main()
@@ -25,4 +25,32 @@ SQLALCHEMY_MAX_OVERFLOW = 40
 
 # gRPC服务器配置
 GRPC_SERVER_PORT = 50051
+# 执行同步方法的线程数
 GRPC_MAX_WORKERS = 10
+# 同时进行的调用数上限（含在线程池中排队的调用），超出时立即返回RESOURCE_EXHAUSTED；
+# 不配置时线程池服务器为GRPC_MAX_WORKERS的4倍，asyncio服务器不限；None表示不限
+GRPC_MAXIMUM_CONCURRENT_RPCS = 40
+# 单个方法的并发上限，超出时立即返回RESOURCE_EXHAUSTED（应小于GRPC_MAX_WORKERS，为交互式调用保留线程）；
+# 未列出的方法不限
+GRPC_METHOD_CONCURRENCY = {
+    "/plotinus.ConstellationService/ExportConstellations": 2,
+    "/plotinus.ConstellationService/StreamExportConstellations": 2,
+    "/plotinus.ConstellationService/ImportSatellites": 4,
+    "/plotinus.SatelliteService/ImportLinks": 4,
+    "/plotinus.SatelliteService/PropagateConstellation": 2,
+    "/plotinus.SatelliteService/StreamEphemeris": 2,
+    "/plotinus.SatelliteService/EvaluateLinkFeasibility": 2,
+    "/plotinus.SatelliteService/DiscoverLinks": 2,
+}
+# 记录调用开始/完成日志的比例（0~1），高并发时可调低，如0.01；异常日志始终记录
+GRPC_LOG_SAMPLE_RATE = 1.0
+
+# 导出文件缓存（可选）：目录（含用户的私有数据，以0700权限创建，应位于仅服务用户可访问的位置）、
+# 总大小上限（字节）和最长保留时间（秒）
+EXPORT_CACHE_DIR = "/var/cache/plotinus/exports"
+EXPORT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+EXPORT_CACHE_MAX_AGE = 24 * 3600
+
+# asyncio gRPC服务器（python grpc_server.py --aio）使用的数据库连接URI（可选）
+# 未配置时由SQLALCHEMY_DATABASE_URI换用异步驱动（aiomysql）得到
+ASYNC_DATABASE_URI = f"mysql+aiomysql://{USERNAME}:{PASSWORD}@{HOSTNAME}:{PORT}/{DATABASE}"
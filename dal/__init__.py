@@ -5,11 +5,18 @@ from .user_dal import UserDAL
 from .constellation_dal import ConstellationDAL
 from .satellite_dal import SatelliteDAL, LinkedSatelliteDAL
 from .base_dal import BaseDAL
+from .import_staging_dal import ImportStagingDAL
+from .export_stream import ExportDAL
+from .export_cache import ExportCache, export_cache
 
 __all__ = [
     'UserDAL',
     'ConstellationDAL',
     'SatelliteDAL',
     'LinkedSatelliteDAL',
-    'BaseDAL'
+    'BaseDAL',
+    'ImportStagingDAL',
+    'ExportDAL',
+    'ExportCache',
+    'export_cache'
 ]
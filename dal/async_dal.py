@@ -0,0 +1,75 @@
+"""
+数据访问层（DAL）- 异步查询
+asyncio gRPC服务使用的只读查询，调用方传入AsyncSession（见utils.async_db），
+查询语句与同步DAL一致
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from history.model import UserModel, ConstellationModel, SatelliteModel
+
+
+class AsyncUserDAL:
+    """用户异步数据访问层"""
+
+    @staticmethod
+    async def get_by_id(session: AsyncSession, user_id: int) -> Optional[UserModel]:
+        """根据ID获取用户"""
+        return await session.get(UserModel, user_id)
+
+
+class AsyncConstellationDAL:
+    """星座异步数据访问层"""
+
+    @staticmethod
+    async def get_by_id(session: AsyncSession, constellation_id: int, user_id: int) -> Optional[ConstellationModel]:
+        """根据ID获取星座"""
+        result = await session.execute(
+            select(ConstellationModel).where(
+                ConstellationModel.id == constellation_id,
+                ConstellationModel.user_id == user_id
+            ).limit(1)
+        )
+        return result.scalars().first()
+
+    @staticmethod
+    async def get_all_by_user(session: AsyncSession, user_id: int) -> List[ConstellationModel]:
+        """获取用户的所有星座"""
+        result = await session.execute(
+            select(ConstellationModel).where(ConstellationModel.user_id == user_id)
+        )
+        return list(result.scalars().all())
+
+    @staticmethod
+    async def get_satellites_paginated(session: AsyncSession, constellation_id: int,
+                                       page: int, per_page: int) -> Tuple[List[SatelliteModel], int]:
+        """获取星座的卫星（分页），返回 (当前页卫星, 总数)"""
+        total = await session.scalar(
+            select(func.count()).select_from(SatelliteModel).where(
+                SatelliteModel.constellation_id == constellation_id
+            )
+        )
+        result = await session.execute(
+            select(SatelliteModel).where(
+                SatelliteModel.constellation_id == constellation_id
+            ).order_by(
+                SatelliteModel.satellite_id
+            ).offset(
+                (page - 1) * per_page
+            ).limit(per_page)
+        )
+        return list(result.scalars().all()), total or 0
+
+
+class AsyncSatelliteDAL:
+    """卫星异步数据访问层"""
+
+    @staticmethod
+    async def get_by_constellation(session: AsyncSession, constellation_id: int) -> List[SatelliteModel]:
+        """获取星座的所有卫星"""
+        result = await session.execute(
+            select(SatelliteModel).where(SatelliteModel.constellation_id == constellation_id)
+        )
+        return list(result.scalars().all())
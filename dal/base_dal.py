@@ -3,12 +3,72 @@
 """
 from history.model import BaseModel
 from history.exts import db
-from typing import List, Optional
+from orbit.frames import geodetic_to_ecef
+from typing import List, Optional, Tuple
+import json
+import re
+
+# 位置：(纬度度, 经度度, 海拔米)
+Location = Tuple[float, float, float]
+
+
+def parse_location(info: str) -> Location:
+    """
+    从基座info文本中解析位置（兼容旧数据）
+
+    支持JSON（{"lat": 纬度, "lon": 经度, "alt": 海拔米}）或 "纬度,经度[,海拔米]" 文本
+
+    Raises:
+        ValueError: 无法解析或超出范围
+    """
+    try:
+        data = json.loads(info)
+    except (json.JSONDecodeError, TypeError):
+        data = None
+
+    try:
+        if isinstance(data, dict):
+            lat, lon, alt = float(data['lat']), float(data['lon']), float(data.get('alt', 0))
+        else:
+            parts = [p for p in re.split(r'[,\s]+', info.strip()) if p]
+            lat, lon = float(parts[0]), float(parts[1])
+            alt = float(parts[2]) if len(parts) > 2 else 0.0
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+        raise ValueError("location not found in info")
+
+    validate_location((lat, lon, alt))
+    return lat, lon, alt
+
+
+def validate_location(location: Location) -> None:
+    """检查经纬度范围"""
+    lat, lon, _ = location
+    if not -90.0 <= lat <= 90.0 or not -180.0 <= lon <= 180.0:
+        raise ValueError("latitude/longitude out of range")
 
 
 class BaseDAL:
     """基座数据访问层"""
 
+    @staticmethod
+    def _apply_location(base: BaseModel, location: Location) -> None:
+        """写入大地坐标和预计算的ECEF位置"""
+        lat, lon, alt = location
+        x, y, z = geodetic_to_ecef(lat, lon, alt / 1000.0).tolist()
+        base.latitude, base.longitude, base.altitude = lat, lon, alt
+        base.ecef_x, base.ecef_y, base.ecef_z = x, y, z
+
+    @staticmethod
+    def _resolve_location(info: str, location: Optional[Location]) -> Optional[Location]:
+        """未显式提供位置时尝试从info中解析"""
+        if location is not None:
+            validate_location(location)
+            return location
+        try:
+            return parse_location(info)
+        except ValueError:
+            return None
+
     @staticmethod
     def get_by_id(base_id: int, user_id: int) -> Optional[BaseModel]:
         """根据ID获取基座"""
@@ -23,22 +83,39 @@ class BaseDAL:
         return BaseModel.query.filter_by(user_id=user_id).all()
 
     @staticmethod
-    def create(base_name: str, info: str, user_id: int) -> BaseModel:
-        """创建基座"""
+    def get_located_by_user(user_id: int, base_ids: Optional[List[int]] = None) -> List[BaseModel]:
+        """获取用户已设置位置的基座"""
+        query = BaseModel.query.filter(
+            BaseModel.user_id == user_id,
+            BaseModel.latitude.isnot(None)
+        )
+        if base_ids:
+            query = query.filter(BaseModel.id.in_(base_ids))
+        return query.all()
+
+    @staticmethod
+    def create(base_name: str, info: str, user_id: int, location: Optional[Location] = None) -> BaseModel:
+        """创建基座（location为空时尝试从info中解析）"""
         base = BaseModel(
             base_name=base_name,
             info=info,
             user_id=user_id
         )
+        location = BaseDAL._resolve_location(info, location)
+        if location is not None:
+            BaseDAL._apply_location(base, location)
         db.session.add(base)
         db.session.commit()
         return base
 
     @staticmethod
-    def update(base: BaseModel, base_name: str, info: str) -> BaseModel:
-        """更新基座"""
+    def update(base: BaseModel, base_name: str, info: str, location: Optional[Location] = None) -> BaseModel:
+        """更新基座（location为空时尝试从info中解析，解析失败则保留原位置）"""
         base.base_name = base_name
         base.info = info
+        location = BaseDAL._resolve_location(info, location)
+        if location is not None:
+            BaseDAL._apply_location(base, location)
         db.session.commit()
         return base
 
@@ -0,0 +1,74 @@
+"""
+数据访问层（DAL）- 批量写入
+绕过ORM对象，按MySQL数据包大小自适应分批，每批一次executemany
+（驱动将其改写为多行 INSERT ... VALUES，不再逐行往返，也不需要回读自增主键）
+"""
+from typing import Optional
+
+from sqlalchemy import Table, insert, text
+
+from history.exts import db
+
+# 无法读取max_allowed_packet时的单条语句字节预算
+DEFAULT_PACKET_BYTES = 4 * 1024 * 1024
+# 单条语句的行数上限
+MAX_BATCH_ROWS = 20000
+# 每行SQL除字段值外的固定开销估计（括号、引号、逗号、转义等）
+ROW_OVERHEAD_BYTES = 32
+
+
+def max_statement_bytes() -> int:
+    """单条多行INSERT语句的字节预算（取MySQL max_allowed_packet的一半，留出转义余量）"""
+    if db.session.get_bind().dialect.name == 'mysql':
+        packet = db.session.execute(text("SELECT @@max_allowed_packet")).scalar()
+        if packet:
+            return int(packet) // 2
+    return DEFAULT_PACKET_BYTES
+
+
+class BulkInserter:
+    """
+    多行INSERT批量写入器
+
+    行先缓存在内存中，估计的数据量达到字节预算或行数上限时写入一批并提交，
+    调用方只需逐行add()，最后调用close()
+
+    Attributes:
+        sent: 已写入数据库的行数
+        inserted: 实际插入的行数（ignore_duplicates时不含被忽略的重复行）
+    """
+
+    def __init__(self, table: Table, max_bytes: Optional[int] = None, max_rows: int = MAX_BATCH_ROWS,
+                 ignore_duplicates: bool = False):
+        self.table = table
+        self.max_bytes = max_bytes or max_statement_bytes()
+        self.max_rows = max_rows
+        self.sent = 0
+        self.inserted = 0
+        self._statement = insert(table).prefix_with('IGNORE', dialect='mysql') if ignore_duplicates else insert(table)
+        self._rows = []
+        self._bytes = 0
+
+    def add(self, row: dict) -> None:
+        """添加一行（字段名 -> 值）"""
+        size = ROW_OVERHEAD_BYTES + sum(len(str(value)) + 4 for value in row.values())
+        if self._rows and (self._bytes + size > self.max_bytes or len(self._rows) >= self.max_rows):
+            self.flush()
+        self._rows.append(row)
+        self._bytes += size
+
+    def flush(self) -> None:
+        """写入并提交当前批次"""
+        if not self._rows:
+            return
+        result = db.session.execute(self._statement, self._rows)
+        db.session.commit()
+        self.sent += len(self._rows)
+        self.inserted += result.rowcount if result.rowcount >= 0 else len(self._rows)
+        self._rows = []
+        self._bytes = 0
+
+    def close(self) -> int:
+        """写入剩余的行，返回实际插入的行数"""
+        self.flush()
+        return self.inserted
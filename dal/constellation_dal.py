@@ -3,7 +3,8 @@
 """
 from history.model import ConstellationModel, SatelliteModel
 from history.exts import db
-from typing import List, Optional, Tuple
+from orbit.isl_graph import isl_graph_cache
+from typing import Iterable, List, Optional, Tuple
 from sqlalchemy import select
 
 
@@ -48,8 +49,10 @@ class ConstellationDAL:
     @staticmethod
     def delete(constellation: ConstellationModel) -> None:
         """删除星座"""
+        constellation_id = constellation.id
         db.session.delete(constellation)
         db.session.commit()
+        isl_graph_cache.invalidate(constellation_id)
 
     @staticmethod
     def name_exists(constellation_name: str, user_id: int, exclude_id: Optional[int] = None) -> bool:
@@ -87,6 +90,32 @@ class ConstellationDAL:
             constellation.satellite_count = actual_count
             db.session.commit()
 
+    @staticmethod
+    def bump_data_version(constellation_ids: Iterable[int]) -> None:
+        """
+        星座数据版本号加1（不提交，随调用方的事务提交）
+
+        通过ORM对卫星或链接的增删改会自动递增版本号（见history.model），
+        绕过ORM的批量写入（INSERT ... SELECT、多行INSERT等）需显式调用
+        """
+        constellation_ids = list(constellation_ids)
+        if not constellation_ids:
+            return
+        db.session.execute(
+            ConstellationModel.__table__.update().where(
+                ConstellationModel.id.in_(constellation_ids)
+            ).values(
+                data_version=ConstellationModel.data_version + 1
+            )
+        )
+
+    @staticmethod
+    def get_data_version(constellation_id: int) -> Optional[int]:
+        """读取星座当前的数据版本号（星座不存在时返回None）"""
+        return db.session.execute(
+            select(ConstellationModel.data_version).where(ConstellationModel.id == constellation_id)
+        ).scalar()
+
     @staticmethod
     def get_existing_satellite_ids(constellation_id: int) -> set:
         """获取星座中已存在的卫星ID集合"""
@@ -0,0 +1,207 @@
+"""
+数据访问层（DAL）- 导出文件缓存
+生成的导出ZIP保存在磁盘上，以 (星座ID, 名称, data_version, 导出格式) 的组合为键；
+星座数据未变化时再次导出直接读取文件（续传时可直接从偏移量处读取），不再查询和压缩；
+导出内容是用户的私有数据，缓存目录权限为0700、文件权限为0600，目录可通过config的EXPORT_CACHE_DIR配置
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from history import config
+
+# 缓存目录（多个服务进程共享，需以同一用户运行）
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'plotinus_export_cache')
+# 缓存文件总大小上限（字节），超出时删除最久未使用的文件
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# 缓存文件最长保留时间（秒）
+DEFAULT_MAX_AGE = 24 * 3600
+# 读取缓存文件的块大小（字节）
+READ_CHUNK_BYTES = 256 * 1024
+# 导出格式版本（导出内容的格式变化时修改，使旧缓存失效）
+FORMAT_VERSION = 1
+
+
+class ExportArtifact(NamedTuple):
+    """缓存的导出文件"""
+    path: str
+    size: int
+    sha256: str
+    created_at: int
+
+
+class ExportCache:
+    """
+    导出文件磁盘缓存
+
+    文件先写入临时文件，生成完整后再原子重命名，读取方不会看到不完整的文件；
+    元数据（文件名、大小、SHA-256、created_at）保存在以缓存键命名的 .json 文件中。
+    目录首次使用时创建（0700）并检查属主，不属于当前用户的目录拒绝使用
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age: int = DEFAULT_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._directory_ready = False
+
+    def _ensure_directory(self) -> None:
+        """创建缓存目录（0700）；已存在时检查属主并收回组和其他用户的权限"""
+        if self._directory_ready:
+            return
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        if hasattr(os, 'getuid'):
+            stat = os.stat(self.directory)
+            if stat.st_uid != os.getuid():
+                raise PermissionError(f"Export cache directory {self.directory} is owned by another user")
+            if stat.st_mode & 0o077:
+                os.chmod(self.directory, 0o700)
+        self._directory_ready = True
+
+    @staticmethod
+    def _open_private(path: str, mode: str):
+        """新建只有属主可读写（0600）的文件"""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o600)
+        return os.fdopen(fd, mode, encoding=None if 'b' in mode else 'utf-8')
+
+    @staticmethod
+    def key(plan, columnar: bool = False) -> str:
+        """
+        缓存键：导出计划中每个星座的 (ID, 名称, data_version) 和导出格式
+
+        星座名称写在tles.txt中，因此也是键的一部分
+        """
+        payload = json.dumps({
+            'format': FORMAT_VERSION,
+            'columnar': columnar,
+            'constellations': [
+                [constellation.id, constellation.constellation_name, constellation.data_version or 0]
+                for constellation in plan.constellations
+            ]
+        }, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[ExportArtifact]:
+        """查询缓存，未命中返回None"""
+        try:
+            self._ensure_directory()
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            path = os.path.join(self.directory, meta['file'])
+            size = os.path.getsize(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        if size != meta.get('size'):
+            return None
+
+        # 更新访问时间，清理时按最久未使用删除
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return ExportArtifact(path, size, meta['sha256'], meta['created_at'])
+
+    def read(self, artifact: ExportArtifact, offset: int = 0,
+             chunk_bytes: int = READ_CHUNK_BYTES) -> Iterator[bytes]:
+        """从偏移量处分块读取缓存文件"""
+        with open(artifact.path, 'rb') as f:
+            f.seek(offset)
+            for data in iter(lambda: f.read(chunk_bytes), b''):
+                yield data
+
+    def store(self, key: str, chunks: Iterable[bytes], created_at: int) -> Iterator[bytes]:
+        """
+        边转发边缓存：原样产出chunks，同时写入缓存文件
+
+        chunks完整迭代结束后文件才生效；迭代中断（客户端取消、生成出错）时删除临时文件。
+        每次写入使用独立的文件名，元数据最后原子替换，同一键并发写入时元数据与文件始终对应
+        """
+        self._ensure_directory()
+        token = uuid.uuid4().hex
+        file_name = f"{key}.{token}.zip"
+        temp_path = os.path.join(self.directory, f"{file_name}.tmp")
+        digest = hashlib.sha256()
+        size = 0
+        completed = False
+        try:
+            with self._open_private(temp_path, 'wb') as f:
+                for data in chunks:
+                    f.write(data)
+                    digest.update(data)
+                    size += len(data)
+                    yield data
+
+            os.replace(temp_path, os.path.join(self.directory, file_name))
+            meta_temp_path = os.path.join(self.directory, f"{key}.{token}.json.tmp")
+            with self._open_private(meta_temp_path, 'w') as f:
+                json.dump({'file': file_name, 'size': size, 'sha256': digest.hexdigest(),
+                           'created_at': created_at}, f)
+            os.replace(meta_temp_path, self._meta_path(key))
+            completed = True
+        finally:
+            if not completed and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.prune()
+
+    def prune(self) -> None:
+        """
+        删除过期文件，总大小超过上限时按最久未使用删除
+
+        被同一键的新文件替换掉的旧文件不再被元数据引用，最终也按时间或总大小删除；
+        元数据指向已删除的文件时，get按未命中处理
+        """
+        now = time.time()
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.zip')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+        # 清理引用的文件已删除的元数据
+        for meta_path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    file_name = json.load(f)['file']
+                if not os.path.exists(os.path.join(self.directory, file_name)):
+                    os.remove(meta_path)
+            except (OSError, ValueError, KeyError):
+                pass
+
+        # 清理中断后遗留的临时文件
+        for path in glob.glob(os.path.join(self.directory, '*.tmp')):
+            try:
+                if now - os.path.getmtime(path) > self.max_age:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+# 进程内共享的缓存实例（目录在多个进程之间共享）
+export_cache = ExportCache(
+    getattr(config, 'EXPORT_CACHE_DIR', DEFAULT_CACHE_DIR),
+    getattr(config, 'EXPORT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES),
+    getattr(config, 'EXPORT_CACHE_MAX_AGE', DEFAULT_MAX_AGE)
+)
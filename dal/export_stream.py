@@ -0,0 +1,348 @@
+"""
+数据访问层（DAL）- 流式导出
+先用集合查询生成导出计划（星座、各星座卫星数、ID偏移量），再用服务端游标一次查询读出所有
+星座的卫星和链接，边生成TLE/ISL文本边压缩，压缩结果按块产出；
+查询次数与导出的星座数无关，峰值内存只与块大小有关
+
+可选的列式导出在同一个ZIP中追加 columnar/ 目录：每列一个不压缩的NumPy .npy文件
+（解压后可用 np.load(path, mmap_mode='r') 直接映射），列数据在生成文本的同时收集，
+内存占用与卫星数和链接数成正比（每颗卫星约80字节，每条链接8字节）
+"""
+import io
+import json
+import time
+from array import array
+from itertools import accumulate
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+import numpy as np
+from sqlalchemy import case, func, select
+
+from history.exts import db
+from history.model import ConstellationModel, LinkedSatelliteModel, SatelliteModel
+from orbit.tle import TLEElements, parse_tle
+
+# 服务端游标每次取回的行数
+FETCH_ROWS = 5000
+# 产出的压缩块大小（字节）
+DEFAULT_CHUNK_BYTES = 256 * 1024
+# 每次写入压缩器的文本块大小（字节），减少逐行调用压缩器的开销
+TEXT_BLOCK_BYTES = 64 * 1024
+
+# 列式导出的目录和格式版本
+COLUMNAR_DIR = 'columnar/'
+COLUMNAR_VERSION = 1
+
+
+class _ChunkSink:
+    """ZipFile的只写输出：收集压缩后的字节，由调用方按块取走（不可seek，ZipFile自动使用数据描述符）"""
+
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        self.size = 0
+        return data
+
+
+def _text_blocks(lines: Iterable[str]) -> Iterator[bytes]:
+    """行以换行符连接（末尾不加换行），按TEXT_BLOCK_BYTES合并为字节块"""
+    block = []
+    size = 0
+    first = True
+    for line in lines:
+        if not first:
+            block.append('\n')
+        first = False
+        block.append(line)
+        size += len(line) + 1
+        if size >= TEXT_BLOCK_BYTES:
+            yield ''.join(block).encode('utf-8')
+            block = []
+            size = 0
+    if block:
+        yield ''.join(block).encode('utf-8')
+
+
+def _npy_blocks(values: np.ndarray) -> Iterator[bytes]:
+    """按.npy格式（1.0版头部 + C顺序数据）分块产出数组，不复制整个数组"""
+    values = np.ascontiguousarray(values)
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(header, np.lib.format.header_data_from_array_1_0(values))
+    yield header.getvalue()
+
+    data = memoryview(values).cast('B') if values.size else memoryview(b'')
+    for start in range(0, len(data), TEXT_BLOCK_BYTES):
+        yield data[start:start + TEXT_BLOCK_BYTES]
+
+
+class ZipEntry(NamedTuple):
+    """ZIP中的一个文件：文件名、字节块迭代器、压缩方式"""
+    name: str
+    blocks: Iterable[bytes]
+    compress_type: int = ZIP_DEFLATED
+
+
+def iter_zip_chunks(entries: Iterable[ZipEntry],
+                    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                    created_at: Optional[int] = None) -> Iterator[bytes]:
+    """
+    流式生成ZIP文件
+
+    内容和created_at相同时输出逐字节相同，客户端可以据此从断点偏移量续传
+
+    Args:
+        entries: ZipEntry迭代器，按顺序逐个写入（前一个文件的数据全部取完后才取下一个文件，
+            因此后面的文件可以依赖前面文件生成过程中收集的数据）
+        chunk_bytes: 产出块的大致大小
+        created_at: 文件修改时间（Unix秒），默认当前时间
+
+    Yields:
+        ZIP文件的连续字节块，全部拼接即为完整的ZIP文件
+    """
+    date_time = time.localtime(time.time() if created_at is None else created_at)[:6]
+    sink = _ChunkSink()
+    with ZipFile(sink, 'w', ZIP_DEFLATED) as zipf:
+        for name, blocks, compress_type in entries:
+            info = ZipInfo(name, date_time=date_time)
+            info.compress_type = compress_type
+            info.external_attr = 0o600 << 16
+            # 大小事先未知，启用ZIP64以支持超过2GB的文件
+            with zipf.open(info, 'w', force_zip64=True) as entry:
+                for block in blocks:
+                    entry.write(block)
+                    if sink.size >= chunk_bytes:
+                        yield sink.drain()
+    # 剩余数据和中央目录
+    yield sink.drain()
+
+
+class ExportPlan(NamedTuple):
+    """
+    导出计划
+
+    Attributes:
+        constellations: 要导出的星座（按请求顺序，已去重，只包含属于该用户的星座）
+        satellite_counts: 每个星座的卫星数
+        offsets: 每个星座在ISL文件中的卫星ID偏移量（前面所有星座卫星数的前缀和）
+    """
+    constellations: List[ConstellationModel]
+    satellite_counts: List[int]
+    offsets: List[int]
+
+    @property
+    def constellation_ids(self) -> List[int]:
+        return [constellation.id for constellation in self.constellations]
+
+    def order_by(self, column):
+        """按计划中星座顺序排序的表达式"""
+        return case(
+            {constellation_id: index for index, constellation_id in enumerate(self.constellation_ids)},
+            value=column
+        )
+
+
+class ColumnarCollector:
+    """
+    列式导出的数据收集器（随TLE/ISL文本生成逐行累积）
+
+    卫星按导出顺序编号为行号，链接保存为两端卫星的行号（int32边数组），
+    两端卫星不在导出中的链接不写入；TLE无法解析的卫星轨道根数为NaN
+    """
+
+    def __init__(self, plan: ExportPlan):
+        self.plan = plan
+        self.satellite_ids = array('i')
+        self.constellation_index = array('i')
+        self.elements = array('d')
+        self.edges = array('i')
+        self.skipped_links = 0
+        self._constellation_index = {cid: index for index, cid in enumerate(plan.constellation_ids)}
+        self._rows = {}
+
+    def add_satellite(self, constellation_id: int, satellite_id: int, info_line1: str, info_line2: str) -> None:
+        """记录一颗卫星（行号为当前卫星数）"""
+        self._rows[(constellation_id, satellite_id)] = len(self.satellite_ids)
+        self.satellite_ids.append(satellite_id)
+        self.constellation_index.append(self._constellation_index[constellation_id])
+        try:
+            self.elements.extend(parse_tle(info_line1, info_line2))
+        except ValueError:
+            self.elements.extend([float('nan')] * len(TLEElements._fields))
+
+    def add_link(self, constellation_id: int, satellite_id1: int, satellite_id2: int) -> None:
+        """记录一条链接"""
+        row1 = self._rows.get((constellation_id, satellite_id1))
+        row2 = self._rows.get((constellation_id, satellite_id2))
+        if row1 is None or row2 is None:
+            self.skipped_links += 1
+            return
+        self.edges.append(row1)
+        self.edges.append(row2)
+
+    def columns(self) -> List[Tuple[str, np.ndarray]]:
+        """所有列（文件名不含目录和扩展名）"""
+        elements = np.frombuffer(self.elements, dtype=np.float64).reshape(-1, len(TLEElements._fields))
+        columns = [
+            ('satellite_id', np.frombuffer(self.satellite_ids, dtype=np.int32)),
+            ('constellation_index', np.frombuffer(self.constellation_index, dtype=np.int32)),
+        ]
+        columns.extend((field, elements[:, k]) for k, field in enumerate(TLEElements._fields))
+        columns.append(('links', np.frombuffer(self.edges, dtype=np.int32).reshape(-1, 2)))
+        return columns
+
+    def manifest(self) -> bytes:
+        """列式数据的说明（JSON）：星座列表、各列的类型和形状"""
+        columns = self.columns()
+        return json.dumps({
+            'version': COLUMNAR_VERSION,
+            'constellations': [
+                {'id': constellation.id, 'name': constellation.constellation_name, 'satellite_count': count}
+                for constellation, count in zip(self.plan.constellations, self.plan.satellite_counts)
+            ],
+            'satellite_count': len(self.satellite_ids),
+            'link_count': len(self.edges) // 2,
+            'skipped_links': self.skipped_links,
+            'columns': {
+                name: {'file': f"{name}.npy", 'dtype': values.dtype.str, 'shape': list(values.shape)}
+                for name, values in columns
+            },
+            'units': {
+                'epoch_jd': 'julian date', 'inclination': 'deg', 'raan': 'deg', 'arg_perigee': 'deg',
+                'mean_anomaly': 'deg', 'mean_motion': 'rev/day', 'links': 'satellite row index'
+            }
+        }, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8')
+
+    def entries(self) -> Iterator[ZipEntry]:
+        """列式数据的ZIP文件（.npy不压缩）"""
+        yield ZipEntry(f"{COLUMNAR_DIR}manifest.json", [self.manifest()])
+        for name, values in self.columns():
+            yield ZipEntry(f"{COLUMNAR_DIR}{name}.npy", _npy_blocks(values), ZIP_STORED)
+
+
+class ExportDAL:
+    """星座导出数据访问层"""
+
+    @staticmethod
+    def plan(constellation_ids: Iterable, user_id) -> ExportPlan:
+        """
+        生成导出计划（两次查询：选中的星座、按星座分组的卫星数）
+
+        Args:
+            constellation_ids: 星座ID（可以是字符串形式），重复的ID只导出一次
+            user_id: 当前用户，不属于该用户的星座被忽略
+        """
+        ids = list(dict.fromkeys(int(constellation_id) for constellation_id in constellation_ids))
+        if not ids:
+            return ExportPlan([], [], [])
+
+        rows = ConstellationModel.query.filter(
+            ConstellationModel.id.in_(ids),
+            ConstellationModel.user_id == user_id
+        ).all()
+        by_id = {constellation.id: constellation for constellation in rows}
+        constellations = [by_id[constellation_id] for constellation_id in ids if constellation_id in by_id]
+
+        counts = dict(db.session.execute(
+            select(
+                SatelliteModel.constellation_id,
+                func.count()
+            ).where(
+                SatelliteModel.constellation_id.in_(list(by_id))
+            ).group_by(
+                SatelliteModel.constellation_id
+            )
+        ).all())
+        satellite_counts = [counts.get(constellation.id, 0) for constellation in constellations]
+        offsets = [0] + list(accumulate(satellite_counts))[:-1] if satellite_counts else []
+        return ExportPlan(constellations, satellite_counts, offsets)
+
+    @staticmethod
+    def iter_tle_lines(plan: ExportPlan, columns: Optional[ColumnarCollector] = None) -> Iterator[str]:
+        """
+        逐行产出TLE文件内容（每颗卫星3行：星座名 卫星ID / TLE第一行 / TLE第二行），一次查询
+
+        Args:
+            columns: 可选的列式数据收集器
+        """
+        if not plan.constellations:
+            return
+        names = {constellation.id: constellation.constellation_name for constellation in plan.constellations}
+        query = select(
+            SatelliteModel.constellation_id,
+            SatelliteModel.satellite_id,
+            SatelliteModel.info_line1,
+            SatelliteModel.info_line2
+        ).where(
+            SatelliteModel.constellation_id.in_(plan.constellation_ids)
+        ).order_by(
+            plan.order_by(SatelliteModel.constellation_id),
+            SatelliteModel.id
+        ).execution_options(stream_results=True, yield_per=FETCH_ROWS)
+
+        for constellation_id, satellite_id, info_line1, info_line2 in db.session.execute(query):
+            if columns is not None:
+                columns.add_satellite(constellation_id, satellite_id, info_line1, info_line2)
+            yield f"{names[constellation_id]} {satellite_id}"
+            yield info_line1
+            yield info_line2
+
+    @staticmethod
+    def iter_isl_lines(plan: ExportPlan, columns: Optional[ColumnarCollector] = None) -> Iterator[str]:
+        """
+        逐行产出ISL文件内容（卫星ID1 卫星ID2），一次查询
+
+        第二个及以后星座的卫星ID加上计划中的偏移量
+
+        Args:
+            columns: 可选的列式数据收集器（需已收集完卫星）
+        """
+        if not plan.constellations:
+            return
+        offsets = dict(zip(plan.constellation_ids, plan.offsets))
+        query = select(
+            LinkedSatelliteModel.constellation_id,
+            LinkedSatelliteModel.satellite_id1,
+            LinkedSatelliteModel.satellite_id2
+        ).where(
+            LinkedSatelliteModel.constellation_id.in_(plan.constellation_ids)
+        ).order_by(
+            plan.order_by(LinkedSatelliteModel.constellation_id),
+            LinkedSatelliteModel.id
+        ).execution_options(stream_results=True, yield_per=FETCH_ROWS)
+
+        for constellation_id, satellite_id1, satellite_id2 in db.session.execute(query):
+            if columns is not None:
+                columns.add_link(constellation_id, satellite_id1, satellite_id2)
+            offset = offsets[constellation_id]
+            yield f"{satellite_id1 + offset} {satellite_id2 + offset}"
+
+    @staticmethod
+    def stream_zip(plan: ExportPlan, chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                   created_at: Optional[int] = None, columnar: bool = False) -> Iterator[bytes]:
+        """
+        流式生成导出ZIP（tles.txt + isls.txt，columnar时追加 columnar/ 目录）
+
+        文件依次写入，同一时刻只有一个服务端游标处于打开状态
+        """
+        columns = ColumnarCollector(plan) if columnar else None
+
+        def entries():
+            yield ZipEntry('tles.txt', _text_blocks(ExportDAL.iter_tle_lines(plan, columns)))
+            yield ZipEntry('isls.txt', _text_blocks(ExportDAL.iter_isl_lines(plan, columns)))
+            if columns is not None:
+                yield from columns.entries()
+
+        return iter_zip_chunks(entries(), chunk_bytes, created_at)
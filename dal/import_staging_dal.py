@@ -0,0 +1,251 @@
+"""
+数据访问层（DAL）- 导入暂存
+流式导入先批量写入暂存表（不触碰正式表），流结束后在一个事务内用
+INSERT ... SELECT 一次性转入正式表：导入要么全部生效，要么全部不生效；
+导入会话（BeginImport/CommitImport）记录所属的星座和用户，卫星和链接在同一个事务中转入
+"""
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+from sqlalchemy import and_, delete, exists, func, insert, literal, or_, select
+from sqlalchemy.orm import aliased
+
+from dal.bulk_loader import BulkInserter
+from dal.constellation_dal import ConstellationDAL
+from history.exts import db
+from history.model import (
+    ConstellationModel, ImportSessionModel, LinkImportStagingModel, LinkedSatelliteModel,
+    SatelliteImportStagingModel, SatelliteModel
+)
+
+# 暂存数据的保留时间（进程崩溃等原因遗留的暂存行超过此时间后清理）
+STAGING_RETENTION = timedelta(days=1)
+
+
+class ImportStagingDAL:
+    """导入暂存数据访问层"""
+
+    @staticmethod
+    def begin_import() -> str:
+        """开始一次导入，返回导入批次ID（同时清理过期的暂存行和会话）"""
+        expired = datetime.now() - STAGING_RETENTION
+        for model in (SatelliteImportStagingModel, LinkImportStagingModel, ImportSessionModel):
+            db.session.execute(delete(model).where(model.created_at < expired))
+        db.session.commit()
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def begin_session(constellation_id: int, user_id: int) -> str:
+        """开始导入会话，记录会话所属的星座和用户，返回导入批次ID"""
+        import_id = ImportStagingDAL.begin_import()
+        db.session.add(ImportSessionModel(
+            import_id=import_id,
+            constellation_id=constellation_id,
+            user_id=int(user_id)
+        ))
+        db.session.commit()
+        return import_id
+
+    @staticmethod
+    def session_exists(import_id: str, constellation_id: int, user_id: int) -> bool:
+        """导入会话是否存在且属于该星座和用户"""
+        return db.session.execute(
+            select(ImportSessionModel.import_id).where(
+                ImportSessionModel.import_id == import_id,
+                ImportSessionModel.constellation_id == constellation_id,
+                ImportSessionModel.user_id == int(user_id)
+            )
+        ).first() is not None
+
+    @staticmethod
+    def satellite_inserter() -> BulkInserter:
+        """卫星暂存写入器，行字段：import_id, shard, sequence, satellite_id, info_line1, info_line2, ext_info"""
+        return BulkInserter(SatelliteImportStagingModel.__table__)
+
+    @staticmethod
+    def link_inserter() -> BulkInserter:
+        """链接暂存写入器，行字段：import_id, shard, sequence, satellite_id1, satellite_id2"""
+        return BulkInserter(LinkImportStagingModel.__table__)
+
+    @staticmethod
+    def checkpoints(import_id: str) -> Dict[int, int]:
+        """
+        导入的断点：每个分片已写入暂存表（已提交）的最大记录序号
+
+        每个分片的记录按序号递增发送，所以序号不超过断点的记录都已处理，
+        续传时只需发送序号更大的记录；没有暂存行的分片不在结果中
+        """
+        result = {}
+        for model in (SatelliteImportStagingModel, LinkImportStagingModel):
+            rows = db.session.execute(
+                select(model.shard, func.max(model.sequence)).where(
+                    model.import_id == import_id
+                ).group_by(model.shard)
+            )
+            for shard, sequence in rows:
+                result[shard] = max(result.get(shard, 0), sequence)
+        return result
+
+    @staticmethod
+    def _insert_satellites(import_id: str, constellation_id: int) -> int:
+        """INSERT ... SELECT 转入暂存的卫星并刷新星座卫星数量（不提交），返回写入的卫星数"""
+        staging = SatelliteImportStagingModel
+        first_rows = select(
+            func.min(staging.id).label('id')
+        ).where(
+            staging.import_id == import_id
+        ).group_by(
+            staging.satellite_id
+        ).subquery()
+
+        source = select(
+            staging.satellite_id,
+            literal(constellation_id),
+            staging.info_line1,
+            staging.info_line2,
+            staging.ext_info
+        ).join(
+            first_rows, first_rows.c.id == staging.id
+        ).where(
+            ~exists().where(
+                SatelliteModel.constellation_id == constellation_id,
+                SatelliteModel.satellite_id == staging.satellite_id
+            )
+        )
+
+        result = db.session.execute(insert(SatelliteModel).from_select(
+            ['satellite_id', 'constellation_id', 'info_line1', 'info_line2', 'ext_info'],
+            source
+        ))
+        db.session.execute(
+            ConstellationModel.__table__.update().where(
+                ConstellationModel.id == constellation_id
+            ).values(
+                satellite_count=select(func.count()).where(
+                    SatelliteModel.constellation_id == constellation_id
+                ).scalar_subquery()
+            )
+        )
+        return result.rowcount
+
+    @staticmethod
+    def _insert_links(import_id: str, constellation_id: int) -> int:
+        """INSERT IGNORE ... SELECT 转入暂存的链接（不提交），返回写入的链接数"""
+        staging = LinkImportStagingModel
+        link = LinkedSatelliteModel
+        satellite1 = aliased(SatelliteModel)
+        satellite2 = aliased(SatelliteModel)
+
+        source = select(
+            staging.satellite_id1,
+            staging.satellite_id2,
+            literal(constellation_id)
+        ).distinct().join(
+            satellite1, and_(
+                satellite1.constellation_id == constellation_id,
+                satellite1.satellite_id == staging.satellite_id1
+            )
+        ).join(
+            satellite2, and_(
+                satellite2.constellation_id == constellation_id,
+                satellite2.satellite_id == staging.satellite_id2
+            )
+        ).where(
+            staging.import_id == import_id,
+            staging.satellite_id1 != staging.satellite_id2,
+            ~exists().where(
+                link.constellation_id == constellation_id,
+                or_(
+                    and_(link.satellite_id1 == staging.satellite_id1, link.satellite_id2 == staging.satellite_id2),
+                    and_(link.satellite_id1 == staging.satellite_id2, link.satellite_id2 == staging.satellite_id1)
+                )
+            )
+        )
+
+        result = db.session.execute(
+            insert(link).prefix_with('IGNORE', dialect='mysql').from_select(
+                ['satellite_id1', 'satellite_id2', 'constellation_id'],
+                source
+            )
+        )
+        return result.rowcount
+
+    @staticmethod
+    def promote_satellites(import_id: str, constellation_id: int) -> int:
+        """
+        暂存的卫星转入satellite表并刷新星座卫星数量（单个事务，失败时丢弃暂存行）
+
+        同一卫星ID在暂存中出现多次时取第一条，星座中已存在的卫星ID跳过
+
+        Returns:
+            实际写入的卫星数
+        """
+        try:
+            count = ImportStagingDAL._insert_satellites(import_id, constellation_id)
+            if count:
+                ConstellationDAL.bump_data_version([constellation_id])
+            db.session.execute(delete(SatelliteImportStagingModel).where(
+                SatelliteImportStagingModel.import_id == import_id
+            ))
+            db.session.commit()
+        except Exception:
+            ImportStagingDAL.discard(import_id)
+            raise
+        return count
+
+    @staticmethod
+    def promote_links(import_id: str, constellation_id: int) -> int:
+        """
+        暂存的链接转入linked_satellite表（单个事务，INSERT IGNORE ... SELECT，失败时丢弃暂存行）
+
+        暂存中的卫星对需已按无向去重或规范化为 (小ID, 大ID)；自环、重复、
+        任一方向已存在的链接以及卫星不存在的链接都会被跳过
+
+        Returns:
+            实际写入的链接数
+        """
+        try:
+            count = ImportStagingDAL._insert_links(import_id, constellation_id)
+            if count:
+                ConstellationDAL.bump_data_version([constellation_id])
+            db.session.execute(delete(LinkImportStagingModel).where(
+                LinkImportStagingModel.import_id == import_id
+            ))
+            db.session.commit()
+        except Exception:
+            ImportStagingDAL.discard(import_id)
+            raise
+        return count
+
+    @staticmethod
+    def commit_session(import_id: str, constellation_id: int) -> Tuple[int, int]:
+        """
+        提交导入会话：暂存的卫星和链接在同一个事务中转入正式表（先卫星后链接），
+        并删除暂存行和会话记录
+
+        失败时回滚，正式表不受影响，暂存行和会话保留，可以重新提交
+
+        Returns:
+            (写入的卫星数, 写入的链接数)
+        """
+        try:
+            satellite_count = ImportStagingDAL._insert_satellites(import_id, constellation_id)
+            link_count = ImportStagingDAL._insert_links(import_id, constellation_id)
+            if satellite_count or link_count:
+                ConstellationDAL.bump_data_version([constellation_id])
+            for model in (SatelliteImportStagingModel, LinkImportStagingModel, ImportSessionModel):
+                db.session.execute(delete(model).where(model.import_id == import_id))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return satellite_count, link_count
+
+    @staticmethod
+    def discard(import_id: str) -> None:
+        """丢弃一次导入的暂存行（导入失败或客户端取消时调用）"""
+        db.session.rollback()
+        for model in (SatelliteImportStagingModel, LinkImportStagingModel):
+            db.session.execute(delete(model).where(model.import_id == import_id))
+        db.session.commit()
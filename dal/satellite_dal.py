@@ -3,7 +3,14 @@
 """
 from history.model import SatelliteModel, LinkedSatelliteModel, ConstellationModel
 from history.exts import db
+from dal.bulk_loader import BulkInserter
+from dal.constellation_dal import ConstellationDAL
+from orbit.tle import tle_cache
+from orbit.isl_graph import ISLGraph, LinkRecord, isl_graph_cache
+from orbit.discovery import pair_keys
 from typing import List, Optional, Tuple
+from sqlalchemy import select
+import numpy as np
 
 
 class SatelliteDAL:
@@ -50,6 +57,22 @@ class SatelliteDAL:
             constellation_id=constellation_id
         ).all()
 
+    @staticmethod
+    def get_tle_rows(constellation_id: int, satellite_ids: Optional[List[int]] = None) -> List[Tuple[int, str, str]]:
+        """获取星座卫星的TLE（只查询需要的列，不构建ORM对象）"""
+        query = select(
+            SatelliteModel.satellite_id,
+            SatelliteModel.info_line1,
+            SatelliteModel.info_line2
+        ).where(
+            SatelliteModel.constellation_id == constellation_id
+        ).order_by(
+            SatelliteModel.satellite_id
+        )
+        if satellite_ids:
+            query = query.where(SatelliteModel.satellite_id.in_(satellite_ids))
+        return [tuple(row) for row in db.session.execute(query)]
+
     @staticmethod
     def create(satellite_id: int, constellation_id: int, info_line1: str, info_line2: str, ext_info: dict=None) -> SatelliteModel:
         """创建卫星（新增description参数）"""
@@ -74,6 +97,11 @@ class SatelliteDAL:
     def update(satellite: SatelliteModel, satellite_id: int, constellation_id: int,
                info_line1: str, info_line2: str, ext_info: dict=None) -> SatelliteModel:
         """更新卫星（新增description参数）"""
+        # TLE缓存以两行内容的哈希为键，修改后的TLE本就不会命中旧条目；这里仍删除旧条目，
+        # 让库中已不存在的TLE立即让出缓存容量，而不是占着位置直到被LRU淘汰。
+        # 若另有卫星的TLE与之完全相同，只是下次传播时重新解析一次，不影响结果
+        tle_cache.invalidate(satellite.info_line1, satellite.info_line2)
+
         satellite.satellite_id = satellite_id
         satellite.constellation_id = constellation_id
         satellite.info_line1 = info_line1
@@ -86,9 +114,12 @@ class SatelliteDAL:
     def delete(satellite: SatelliteModel) -> None:
         """删除卫星"""
         constellation_id = satellite.constellation_id
+        # 释放已删除TLE占用的缓存容量（原因同update）
+        tle_cache.invalidate(satellite.info_line1, satellite.info_line2)
 
-        # 删除相关的链接
+        # 删除相关的链接：satellite_id只在星座内唯一，其他星座中同号卫星的链接不能删除
         LinkedSatelliteModel.query.filter(
+            LinkedSatelliteModel.constellation_id == constellation_id,
             (LinkedSatelliteModel.satellite_id1 == satellite.satellite_id) |
             (LinkedSatelliteModel.satellite_id2 == satellite.satellite_id)
         ).delete()
@@ -120,20 +151,21 @@ class SatelliteDAL:
         db.session.commit()
 
     @staticmethod
-    def get_links_from(satellite_id: int, constellation_id: int) -> List[LinkedSatelliteModel]:
-        """获取从该卫星出发的链接"""
-        return LinkedSatelliteModel.query.filter_by(
-            satellite_id1=satellite_id,
-            constellation_id=constellation_id
-        ).all()
+    def get_links(satellite_id: int, constellation_id: int) -> Tuple[List[LinkRecord], List[LinkRecord]]:
+        """获取卫星的全部链接 (links_from, links_to)（基于链路图索引，无SQL查询）"""
+        return LinkedSatelliteDAL.get_graph(constellation_id).links_of(satellite_id)
 
     @staticmethod
-    def get_links_to(satellite_id: int, constellation_id: int) -> List[LinkedSatelliteModel]:
-        """获取指向该卫星的链接"""
-        return LinkedSatelliteModel.query.filter_by(
-            satellite_id2=satellite_id,
-            constellation_id=constellation_id
-        ).all()
+    def get_links_from(satellite_id: int, constellation_id: int) -> List[LinkRecord]:
+        """获取从该卫星出发的链接（基于链路图索引）"""
+        links_from, _ = LinkedSatelliteDAL.get_graph(constellation_id).links_of(satellite_id)
+        return links_from
+
+    @staticmethod
+    def get_links_to(satellite_id: int, constellation_id: int) -> List[LinkRecord]:
+        """获取指向该卫星的链接（基于链路图索引）"""
+        _, links_to = LinkedSatelliteDAL.get_graph(constellation_id).links_of(satellite_id)
+        return links_to
 
 
 class LinkedSatelliteDAL:
@@ -164,27 +196,34 @@ class LinkedSatelliteDAL:
 
     @staticmethod
     def link_exists(satellite_id1: int, satellite_id2: int, constellation_id: int) -> bool:
-        """检查链接是否存在（双向检查）"""
-        return LinkedSatelliteModel.query.filter(
-            ((LinkedSatelliteModel.satellite_id1 == satellite_id1) &
-             (LinkedSatelliteModel.satellite_id2 == satellite_id2) &
-             (LinkedSatelliteModel.constellation_id == constellation_id)) |
-            ((LinkedSatelliteModel.satellite_id1 == satellite_id2) &
-             (LinkedSatelliteModel.satellite_id2 == satellite_id1) &
-             (LinkedSatelliteModel.constellation_id == constellation_id))
-        ).first() is not None
-
-    @staticmethod
-    def get_existing_links(constellation_id: int) -> set:
-        """获取星座中已存在的链接集合"""
-        links = LinkedSatelliteModel.query.filter_by(
-            constellation_id=constellation_id
-        ).all()
-        existing_links = set()
-        for link in links:
-            existing_links.add((link.satellite_id1, link.satellite_id2))
-            existing_links.add((link.satellite_id2, link.satellite_id1))
-        return existing_links
+        """检查链接是否存在（双向检查，基于链路图索引）"""
+        return LinkedSatelliteDAL.get_graph(constellation_id).has_link(satellite_id1, satellite_id2)
+
+    @staticmethod
+    def get_link_rows(constellation_id: int) -> List[Tuple[int, int, int]]:
+        """获取星座所有链接的 (id, satellite_id1, satellite_id2)（不构建ORM对象）"""
+        query = select(
+            LinkedSatelliteModel.id,
+            LinkedSatelliteModel.satellite_id1,
+            LinkedSatelliteModel.satellite_id2
+        ).where(
+            LinkedSatelliteModel.constellation_id == constellation_id
+        )
+        return [tuple(row) for row in db.session.execute(query)]
+
+    @staticmethod
+    def get_graph(constellation_id: int) -> ISLGraph:
+        """
+        获取星座链路图（CSR邻接索引，进程内缓存）
+
+        每次先读取星座的data_version（主键查询），与缓存的版本不一致时重建，
+        其他进程或Flask视图对链接的修改同样会使缓存失效
+        """
+        return isl_graph_cache.get(
+            constellation_id,
+            ConstellationDAL.get_data_version(constellation_id),
+            lambda: ISLGraph.from_rows(constellation_id, LinkedSatelliteDAL.get_link_rows(constellation_id))
+        )
 
     @staticmethod
     def batch_create(links: List[LinkedSatelliteModel]) -> None:
@@ -192,6 +231,30 @@ class LinkedSatelliteDAL:
         db.session.add_all(links)
         db.session.commit()
 
+    @staticmethod
+    def bulk_create_pairs(constellation_id: int, satellite_id1, satellite_id2) -> Tuple[int, int]:
+        """
+        批量创建链接（不构建ORM对象，按批执行多行INSERT）
+
+        已存在的链接（不区分方向）和重复的卫星对会被跳过
+
+        Returns:
+            (插入数量, 跳过数量)
+        """
+        keys = pair_keys(satellite_id1, satellite_id2)
+        existing = pair_keys(*LinkedSatelliteDAL.get_graph(constellation_id).edge_pairs().T)
+        new_keys = np.unique(keys[~np.isin(keys, existing)])
+        if len(new_keys) == 0:
+            return 0, len(keys)
+
+        inserter = BulkInserter(LinkedSatelliteModel.__table__)
+        for a, b in zip((new_keys >> 32).tolist(), (new_keys & 0xFFFFFFFF).tolist()):
+            inserter.add({"satellite_id1": a, "satellite_id2": b, "constellation_id": constellation_id})
+        inserter.close()
+        ConstellationDAL.bump_data_version([constellation_id])
+        db.session.commit()
+        return len(new_keys), len(keys) - len(new_keys)
+
     @staticmethod
     def get_by_constellation(constellation_id: int) -> List[LinkedSatelliteModel]:
         """获取星座的所有链接"""
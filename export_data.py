@@ -3,59 +3,185 @@
 数据导出工具
 从gRPC服务导出星座的TLE和ISL数据为ZIP文件
 """
+import argparse
+import hashlib
+import json
+import os
+import time
 import grpc
 import sys
 from grpc_generated import auth_pb2, auth_pb2_grpc
 from grpc_generated import constellation_pb2, constellation_pb2_grpc
 
+# 连接中断时的最大重试次数
+MAX_RETRIES = 5
+# 重试前等待的初始秒数（每次翻倍）
+RETRY_BACKOFF_SECONDS = 1.0
+# 可以从断点重试的gRPC错误
+RETRYABLE_CODES = (
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+)
+# 读取已下载部分计算校验和时的块大小
+HASH_BLOCK_BYTES = 1024 * 1024
 
-def export_constellations(channel, token, constellation_ids, output_file):
-    """导出星座数据"""
+
+class ChecksumMismatch(Exception):
+    """下载结果与服务端的大小或SHA-256不一致（通常是导出期间数据发生了变化）"""
+
+
+def _load_partial(output_file, constellation_ids, columnar):
+    """
+    读取上次未完成的下载
+
+    Returns:
+        (已下载字节数, 已下载部分的sha256对象, created_at)，没有可续传的下载时为 (0, 新sha256, 0)
+    """
+    part_file = output_file + '.part'
+    meta_file = part_file + '.json'
+    digest = hashlib.sha256()
+    if not (os.path.exists(part_file) and os.path.exists(meta_file)):
+        return 0, digest, 0
+
+    with open(meta_file, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    # 导出的星座或格式不同则不能续传
+    if (meta.get('constellation_ids') != list(constellation_ids) or meta.get('columnar', False) != columnar
+            or not meta.get('created_at')):
+        return 0, digest, 0
+
+    with open(part_file, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return os.path.getsize(part_file), digest, meta['created_at']
+
+
+def _remove_partial(output_file):
+    """删除未完成的下载"""
+    for path in (output_file + '.part', output_file + '.part.json'):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def export_constellations(channel, user_id, constellation_ids, output_file, max_retries=MAX_RETRIES,
+                          columnar=False):
+    """
+    流式导出星座数据（columnar时ZIP中同时包含列式数据）
+
+    数据块到达后立即写入 <output_file>.part 并累计SHA-256，结束时与服务端返回的大小和校验和比对，
+    一致后重命名为output_file；连接中断时从已写入的字节偏移量续传（包括上次运行留下的.part文件）
+
+    Returns:
+        文件大小（字节）
+    """
     client = constellation_pb2_grpc.ConstellationServiceStub(channel)
+    part_file = output_file + '.part'
+    meta_file = part_file + '.json'
 
-    # 调用导出API
-    response = client.ExportConstellations(
-        constellation_pb2.ExportConstellationsRequest(
-            token=token,
-            constellation_ids=constellation_ids
-        )
-    )
+    offset, digest, created_at = _load_partial(output_file, constellation_ids, columnar)
+    if offset:
+        print(f"从断点续传: 已下载 {offset} 字节")
+    else:
+        _remove_partial(output_file)
+
+    retries = 0
+    finished = False
+    while not finished:
+        try:
+            chunks = client.StreamExportConstellations(
+                constellation_pb2.ExportConstellationsRequest(
+                    user_id=user_id,
+                    constellation_ids=constellation_ids,
+                    offset=offset,
+                    created_at=created_at,
+                    columnar=columnar
+                )
+            )
+            with open(part_file, 'ab') as f:
+                for chunk in chunks:
+                    if chunk.status.code != 200:
+                        raise Exception(chunk.status.message)
+                    if chunk.offset != offset:
+                        raise Exception(f"数据块偏移量不连续（期望 {offset}，收到 {chunk.offset}）")
 
-    if response.status.code != 200:
-        raise Exception(response.status.message)
+                    # 首块返回本次导出的时间，记录下来供续传使用
+                    if not created_at:
+                        created_at = chunk.created_at
+                        with open(meta_file, 'w', encoding='utf-8') as meta:
+                            json.dump({
+                                'constellation_ids': list(constellation_ids),
+                                'columnar': columnar,
+                                'created_at': created_at
+                            }, meta)
 
-    # 保存ZIP文件
-    with open(output_file, 'wb') as f:
-        f.write(response.zip_data)
+                    if chunk.data:
+                        f.write(chunk.data)
+                        f.flush()
+                        digest.update(chunk.data)
+                        offset += len(chunk.data)
 
-    return len(response.zip_data)
+                    # 结束块：校验大小和SHA-256
+                    if chunk.sha256:
+                        if chunk.total_bytes != offset or chunk.sha256 != digest.hexdigest():
+                            _remove_partial(output_file)
+                            raise ChecksumMismatch("文件校验失败，导出期间数据可能发生了变化，请重新导出")
+                        finished = True
+                        break
+            if finished:
+                break
+            reason = "导出流在结束块之前中断"
+        except grpc.RpcError as e:
+            if e.code() not in RETRYABLE_CODES:
+                raise
+            reason = e.code().name
 
+        if retries >= max_retries:
+            raise Exception(f"重试{max_retries}次后仍未完成导出（{reason}），再次运行将从断点续传")
+        retries += 1
+        wait = RETRY_BACKOFF_SECONDS * 2 ** (retries - 1)
+        print(f"连接中断（{reason}），{wait:.0f}秒后从 {offset} 字节处续传（第{retries}次重试）")
+        time.sleep(wait)
 
-def list_constellations(channel, token):
+    os.replace(part_file, output_file)
+    os.remove(meta_file)
+    return offset
+
+
+def list_constellations(channel, user_id):
     """列出所有星座"""
     client = constellation_pb2_grpc.ConstellationServiceStub(channel)
 
     response = client.ListConstellations(
-        constellation_pb2.ListConstellationsRequest(token=token)
+        constellation_pb2.ListConstellationsRequest(user_id=user_id)
     )
 
     return response.constellations
 
 
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="从gRPC服务导出星座的TLE和ISL数据为ZIP文件（不指定星座ID时列出所有星座）",
+        epilog=f"示例: {sys.argv[0]} testuser pass123 1 2 3"
+    )
+    parser.add_argument('username', help="用户名")
+    parser.add_argument('password', help="密码")
+    parser.add_argument('constellation_ids', type=int, nargs='*', help="要导出的星座ID")
+    parser.add_argument('-o', '--output', default="constellation_data.zip", help="输出文件，默认constellation_data.zip")
+    parser.add_argument('--columnar', action='store_true',
+                        help="同时导出列式数据（columnar/ 目录下的 .npy 文件，解压后可内存映射）")
+    parser.add_argument('--retries', type=int, default=MAX_RETRIES, help=f"连接中断时的最大重试次数，默认{MAX_RETRIES}")
+    return parser.parse_args()
+
+
 def main():
     """主函数"""
-    if len(sys.argv) < 3:
-        print("使用方法:")
-        print(f"  {sys.argv[0]} <用户名> <密码> [星座ID1 星座ID2 ...]")
-        print()
-        print("示例:")
-        print(f"  {sys.argv[0]} testuser pass123           # 列出所有星座")
-        print(f"  {sys.argv[0]} testuser pass123 1 2 3     # 导出指定星座")
-        sys.exit(1)
-
-    username = sys.argv[1]
-    password = sys.argv[2]
-    constellation_ids = [int(x) for x in sys.argv[3:]] if len(sys.argv) > 3 else []
+    args = parse_args()
+    username = args.username
+    password = args.password
+    constellation_ids = args.constellation_ids
 
     print("=" * 70)
     print("  数据导出工具")
@@ -66,7 +192,7 @@ def main():
     channel = grpc.insecure_channel('localhost:50051')
     auth_client = auth_pb2_grpc.AuthServiceStub(channel)
 
-    # 登录获取token
+    # 登录获取user_id
     print("[2/3] 用户登录...")
     try:
         login_resp = auth_client.Login(
@@ -76,7 +202,7 @@ def main():
             print(f"错误: 登录失败 - {login_resp.status.message}")
             sys.exit(1)
 
-        token = login_resp.token
+        user_id = str(login_resp.user.id)
         print(f"登录成功，用户: {login_resp.user.username}")
     except Exception as e:
         print(f"错误: 登录失败 - {str(e)}")
@@ -86,7 +212,7 @@ def main():
     if not constellation_ids:
         print("\n[3/3] 列出所有星座...")
         try:
-            constellations = list_constellations(channel, token)
+            constellations = list_constellations(channel, user_id)
 
             if not constellations:
                 print("没有找到任何星座")
@@ -108,20 +234,24 @@ def main():
 
     # 导出数据
     print(f"\n[3/3] 导出星座数据...")
-    output_file = "constellation_data.zip"
+    output_file = args.output
 
     try:
-        file_size = export_constellations(channel, token, constellation_ids, output_file)
+        file_size = export_constellations(
+            channel, user_id, constellation_ids, output_file, args.retries, args.columnar
+        )
 
         print("\n" + "=" * 70)
         print("  导出成功")
         print("=" * 70)
         print(f"导出星座数: {len(constellation_ids)}")
-        print(f"文件大小: {file_size} 字节")
+        print(f"文件大小: {file_size} 字节（SHA-256校验通过）")
         print(f"保存位置: {output_file}")
         print("\nZIP文件包含:")
         print("  - tles.txt  (卫星TLE数据)")
         print("  - isls.txt  (卫星链接数据)")
+        if args.columnar:
+            print("  - columnar/ (列式数据: manifest.json、轨道根数和链接边数组 .npy)")
         print("=" * 70)
 
     except grpc.RpcError as e:
@@ -131,6 +261,5 @@ def main():
         print(f"错误: 导出失败 - {str(e)}")
         sys.exit(1)
 
-
 if __name__ == '__main__':
     main()
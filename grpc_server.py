@@ -8,15 +8,17 @@ import os
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import argparse
+import asyncio
 import grpc
 from concurrent import futures
 import logging
-from functools import wraps
+import signal
+import threading
+from typing import Dict, NamedTuple, Optional
 
-# 导入Flask的数据库扩展
-from flask import Flask
-from history.exts import db
-from history.config import SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS, SECRET_KEY
+# 导入Flask应用工厂（用于数据库连接）
+from utils.app_context import CallSessionScope, create_db_app
 
 # 导入生成的gRPC代码
 from grpc_generated import (
@@ -33,10 +35,7 @@ from grpc_services.constellation_service import ConstellationService
 from grpc_services.satellite_service import SatelliteService
 
 # 导入拦截器
-from grpc_services.interceptors import (
-    LoggingInterceptor,
-    ErrorHandlingInterceptor
-)
+from grpc_services.interceptors import FusedInterceptor, AioFusedInterceptor
 
 # 配置日志
 logging.basicConfig(
@@ -45,68 +44,80 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 收到SIGTERM后等待进行中的调用完成的最长时间（秒），超时后强制结束
+DEFAULT_SHUTDOWN_GRACE = 10
+
+# 以下为config中未配置时的默认值
+DEFAULT_PORT = 50051
+DEFAULT_MAX_WORKERS = 10
+# 同时进行的调用数上限 = 线程数 × 该倍数（超出的部分在线程池中排队，再多则立即返回RESOURCE_EXHAUSTED）
+DEFAULT_QUEUE_FACTOR = 4
+# 重型方法的并发上限：保证批量导出、导入、传播计算不会占满线程池
+DEFAULT_METHOD_CONCURRENCY = {
+    '/plotinus.ConstellationService/ExportConstellations': 2,
+    '/plotinus.ConstellationService/StreamExportConstellations': 2,
+    '/plotinus.ConstellationService/ImportSatellites': 4,
+    '/plotinus.SatelliteService/ImportLinks': 4,
+    '/plotinus.SatelliteService/PropagateConstellation': 2,
+    '/plotinus.SatelliteService/StreamEphemeris': 2,
+    '/plotinus.SatelliteService/EvaluateLinkFeasibility': 2,
+    '/plotinus.SatelliteService/DiscoverLinks': 2,
+}
+# 记录调用开始/完成日志的比例（1表示每次调用都记录）
+DEFAULT_LOG_SAMPLE_RATE = 1.0
+
+
+class ServerSettings(NamedTuple):
+    """
+    gRPC服务器参数
+
+    Attributes:
+        port: 监听端口
+        max_workers: 执行同步方法的线程数
+        maximum_concurrent_rpcs: 同时进行的调用数上限，超出时gRPC直接返回RESOURCE_EXHAUSTED；None表示不限
+        method_concurrency: {方法全名: 并发上限}，超出时立即返回RESOURCE_EXHAUSTED
+        log_sample_rate: 记录调用开始/完成日志的比例（0~1），异常日志不受影响
+    """
+    port: int
+    max_workers: int
+    maximum_concurrent_rpcs: Optional[int]
+    method_concurrency: Dict[str, int]
+    log_sample_rate: float = DEFAULT_LOG_SAMPLE_RATE
+
+
+def load_server_settings(aio=False) -> ServerSettings:
+    """
+    从config读取服务器参数（GRPC_SERVER_PORT、GRPC_MAX_WORKERS、GRPC_MAXIMUM_CONCURRENT_RPCS、GRPC_METHOD_CONCURRENCY、
+    GRPC_LOG_SAMPLE_RATE）
+
+    未配置GRPC_MAXIMUM_CONCURRENT_RPCS时，线程池服务器默认为线程数的DEFAULT_QUEUE_FACTOR倍；
+    asyncio服务器的协程方法不占线程，默认不限
+    """
+    from history import config
+
+    max_workers = getattr(config, 'GRPC_MAX_WORKERS', DEFAULT_MAX_WORKERS)
+    default_concurrent_rpcs = None if aio else max_workers * DEFAULT_QUEUE_FACTOR
+    settings = ServerSettings(
+        port=getattr(config, 'GRPC_SERVER_PORT', DEFAULT_PORT),
+        max_workers=max_workers,
+        maximum_concurrent_rpcs=getattr(config, 'GRPC_MAXIMUM_CONCURRENT_RPCS', default_concurrent_rpcs),
+        method_concurrency=dict(getattr(config, 'GRPC_METHOD_CONCURRENCY', DEFAULT_METHOD_CONCURRENCY)),
+        log_sample_rate=getattr(config, 'GRPC_LOG_SAMPLE_RATE', DEFAULT_LOG_SAMPLE_RATE)
+    )
+    for method, limit in settings.method_concurrency.items():
+        if limit >= max_workers:
+            logger.warning(f"Concurrency limit of {method} ({limit}) is not below GRPC_MAX_WORKERS ({max_workers}), "
+                           f"it can still occupy every worker thread")
+    return settings
+
 
 def init_flask_app():
     """初始化Flask应用（用于数据库连接）"""
-    app = Flask(__name__)
-    app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = SQLALCHEMY_TRACK_MODIFICATIONS
-    app.config['SECRET_KEY'] = SECRET_KEY
-    db.init_app(app)
-    return app
-
-
-def serve(port=50051):
-    """启动gRPC服务器"""
-    # 初始化Flask应用（用于数据库连接）
-    app = init_flask_app()
-
-    # 创建一个包装App Context的拦截器
-    class AppContextInterceptor(grpc.ServerInterceptor):
-        """应用上下文拦截器"""
-        def intercept_service(self, continuation, handler_call_details):
-            method_handler = continuation(handler_call_details)
-
-            if method_handler is None:
-                return None
-
-            def wrap_with_context(behavior):
-                @wraps(behavior)
-                def wrapper(request_or_iterator, context):
-                    with app.app_context():
-                        return behavior(request_or_iterator, context)
-                return wrapper
-
-            if method_handler.unary_unary:
-                return grpc.unary_unary_rpc_method_handler(
-                    wrap_with_context(method_handler.unary_unary),
-                    request_deserializer=method_handler.request_deserializer,
-                    response_serializer=method_handler.response_serializer
-                )
-            elif method_handler.stream_unary:
-                return grpc.stream_unary_rpc_method_handler(
-                    wrap_with_context(method_handler.stream_unary),
-                    request_deserializer=method_handler.request_deserializer,
-                    response_serializer=method_handler.response_serializer
-                )
-            else:
-                return method_handler
-
-    # 创建拦截器
-    interceptors = [
-        AppContextInterceptor(),  # 首先添加应用上下文
-        ErrorHandlingInterceptor(),
-        LoggingInterceptor(),
-        # AuthInterceptor(),  # 认证拦截器暂时禁用，需要进一步测试
-    ]
+    return create_db_app(__name__)
 
-    # 创建gRPC服务器
-    server = grpc.server(
-        futures.ThreadPoolExecutor(max_workers=10),
-        interceptors=interceptors
-    )
 
-    # 注册服务
+def register_services(server, constellation_service, satellite_service):
+    """注册所有服务（星座、卫星服务由调用方传入同步或asyncio实现）"""
     logger.info("Registering gRPC services...")
 
     # 注册认证服务
@@ -118,25 +129,70 @@ def serve(port=50051):
     logger.info("[OK] BaseService registered")
 
     # 注册星座服务
-    constellation_pb2_grpc.add_ConstellationServiceServicer_to_server(
-        ConstellationService(), server
-    )
-    logger.info("[OK] ConstellationService registered")
+    constellation_pb2_grpc.add_ConstellationServiceServicer_to_server(constellation_service, server)
+    logger.info(f"[OK] {type(constellation_service).__name__} registered")
 
     # 注册卫星服务
-    satellite_pb2_grpc.add_SatelliteServiceServicer_to_server(
-        SatelliteService(), server
+    satellite_pb2_grpc.add_SatelliteServiceServicer_to_server(satellite_service, server)
+    logger.info(f"[OK] {type(satellite_service).__name__} registered")
+
+
+def server_options(reuse_port=False):
+    """
+    gRPC服务器选项
+
+    reuse_port为True时启用SO_REUSEPORT，多个工作进程可以绑定同一端口，由内核分配连接；
+    为False时显式关闭，端口已被占用时启动失败，避免两个独立启动的服务器误共享端口
+    """
+    return [('grpc.so_reuseport', 1 if reuse_port else 0)]
+
+
+def serve(port=None, reuse_port=False, grace=DEFAULT_SHUTDOWN_GRACE, settings=None):
+    """
+    启动gRPC服务器
+
+    线程数、调用数上限和方法并发上限见ServerSettings（默认从config读取），port指定时覆盖配置；
+    收到SIGTERM时停止接收新调用，等待进行中的调用最多grace秒后退出
+    """
+    settings = settings or load_server_settings()
+    port = port or settings.port
+
+    # 初始化Flask应用（用于数据库连接），db.session改为按调用划分
+    sessions = CallSessionScope(init_flask_app())
+
+    # 创建拦截器（并发限制、数据库会话、错误处理、日志合并为一个）
+    interceptors = [
+        FusedInterceptor(sessions, settings.method_concurrency, settings.log_sample_rate),
+        # AuthInterceptor(),  # 认证拦截器暂时禁用，需要进一步测试
+    ]
+
+    # 创建gRPC服务器
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=settings.max_workers),
+        interceptors=interceptors,
+        options=server_options(reuse_port),
+        maximum_concurrent_rpcs=settings.maximum_concurrent_rpcs
     )
-    logger.info("[OK] SatelliteService registered")
+
+    # 注册服务
+    register_services(server, ConstellationService(), SatelliteService())
 
     # 绑定端口（使用0.0.0.0以兼容Windows）
     server.add_insecure_port(f'0.0.0.0:{port}')
 
     # 启动服务器
-    logger.info(f"Starting gRPC server on port {port}...")
+    logger.info(f"Starting gRPC server on port {port} "
+                f"(workers={settings.max_workers}, max concurrent rpcs={settings.maximum_concurrent_rpcs})...")
     server.start()
     logger.info(f"[OK] gRPC server is running on port {port}")
 
+    # SIGTERM：平滑停止（信号处理函数只能在主线程中注册）
+    if threading.current_thread() is threading.main_thread():
+        def drain(signum, frame):
+            logger.info(f"Received SIGTERM, draining in-flight calls (up to {grace}s)...")
+            server.stop(grace)
+        signal.signal(signal.SIGTERM, drain)
+
     # 保持服务器运行
     try:
         server.wait_for_termination()
@@ -145,5 +201,91 @@ def serve(port=50051):
         server.stop(0)
 
 
+async def serve_aio(port=None, reuse_port=False, grace=DEFAULT_SHUTDOWN_GRACE, settings=None):
+    """
+    启动asyncio gRPC服务器（grpc.aio）
+
+    读多的方法（星座列表/详情、按星座查询卫星）为协程，使用异步数据库引擎和异步Redis客户端，
+    等待I/O时不占用线程，大量并发请求和流在一个进程内复用；
+    其余方法沿用同步实现，在settings.max_workers个线程中执行。
+    收到SIGTERM时停止接收新调用，等待进行中的调用最多grace秒后退出
+    """
+    # 异步驱动（aiomysql、redis.asyncio）只在asyncio模式下需要
+    from utils.async_db import create_async_db_engine, create_async_session_factory
+    from utils.async_redis_client import AsyncRedisClient
+    from grpc_services.async_constellation_service import AsyncConstellationService
+    from grpc_services.async_satellite_service import AsyncSatelliteService
+
+    settings = settings or load_server_settings(aio=True)
+    port = port or settings.port
+
+    # 同步方法仍使用Flask-SQLAlchemy的模型和db.session访问数据库（会话按调用划分）
+    sessions = CallSessionScope(init_flask_app())
+    engine = create_async_db_engine()
+    session_factory = create_async_session_factory(engine)
+
+    # 同步方法在migration_thread_pool中执行
+    executor = futures.ThreadPoolExecutor(max_workers=settings.max_workers)
+    interceptors = [
+        AioFusedInterceptor(sessions, settings.method_concurrency, settings.log_sample_rate, executor=executor),
+    ]
+
+    server = grpc.aio.server(
+        migration_thread_pool=executor,
+        interceptors=interceptors,
+        options=server_options(reuse_port),
+        maximum_concurrent_rpcs=settings.maximum_concurrent_rpcs
+    )
+
+    register_services(
+        server,
+        AsyncConstellationService(session_factory),
+        AsyncSatelliteService(session_factory)
+    )
+
+    server.add_insecure_port(f'0.0.0.0:{port}')
+
+    logger.info(f"Starting asyncio gRPC server on port {port}...")
+    await server.start()
+    logger.info(f"[OK] asyncio gRPC server is running on port {port}")
+
+    # SIGTERM：平滑停止（Windows的事件循环不支持信号处理）
+    def drain():
+        logger.info(f"Received SIGTERM, draining in-flight calls (up to {grace}s)...")
+        asyncio.ensure_future(server.stop(grace))
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, drain)
+    except (NotImplementedError, RuntimeError):
+        pass
+
+    try:
+        await server.wait_for_termination()
+    finally:
+        logger.info("Shutting down gRPC server...")
+        await server.stop(0)
+        await engine.dispose()
+        await AsyncRedisClient.close()
+
+
 if __name__ == '__main__':
-    serve()
+    parser = argparse.ArgumentParser(description='启动gRPC服务器')
+    parser.add_argument('--port', type=int, help='监听端口（默认使用config中的GRPC_SERVER_PORT）')
+    parser.add_argument('--aio', action='store_true', help='使用asyncio服务器（grpc.aio，需安装aiomysql）')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='工作进程数（默认1；大于1时由监督进程启动多个进程共用端口，需系统支持SO_REUSEPORT）')
+    parser.add_argument('--grace', type=float, default=DEFAULT_SHUTDOWN_GRACE,
+                        help=f'收到SIGTERM后等待进行中调用完成的最长秒数（默认{DEFAULT_SHUTDOWN_GRACE}）')
+    parser.add_argument('--status-file', help='多进程模式下定期写入各工作进程健康状态（JSON）的文件')
+    args = parser.parse_args()
+
+    if args.processes > 1:
+        from grpc_supervisor import Supervisor
+        port = args.port or load_server_settings().port
+        Supervisor(port, args.processes, aio=args.aio, grace=args.grace, status_file=args.status_file).run()
+    elif args.aio:
+        try:
+            asyncio.run(serve_aio(args.port, grace=args.grace))
+        except KeyboardInterrupt:
+            pass
+    else:
+        serve(args.port, grace=args.grace)
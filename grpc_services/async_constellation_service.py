@@ -0,0 +1,147 @@
+"""
+gRPC星座服务实现（asyncio版本）
+读多的方法改为协程，使用异步数据库引擎和异步Redis客户端；
+其余方法沿用ConstellationService的同步实现，由grpc.aio服务器在线程池中执行
+"""
+import math
+
+import grpc
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from grpc_generated import constellation_pb2, common_pb2
+from grpc_services.constellation_service import ConstellationService
+from dal.async_dal import AsyncUserDAL, AsyncConstellationDAL, AsyncSatelliteDAL
+from utils.async_redis_client import AsyncRedisClient
+from utils.redis_keys import ConstellationKeys, TTL
+
+
+class AsyncConstellationService(ConstellationService):
+    """星座服务实现（asyncio版本）"""
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self._session_factory = session_factory
+
+    async def _verify_user_id_async(self, session, user_id, context):
+        """验证用户ID是否有效"""
+        user = await AsyncUserDAL.get_by_id(session, user_id)
+        if user is None:
+            await context.abort(grpc.StatusCode.UNAUTHENTICATED, "Invalid user ID")
+        return user_id
+
+    @staticmethod
+    def _constellation_dict(constellation) -> dict:
+        return {
+            "id": constellation.id,
+            "constellation_name": constellation.constellation_name,
+            "satellite_count": constellation.satellite_count,
+            "user_id": constellation.user_id,
+            "description": constellation.description
+        }
+
+    @staticmethod
+    def _satellite_info(sat) -> constellation_pb2.SatelliteInfo:
+        return constellation_pb2.SatelliteInfo(
+            id=sat.id,
+            satellite_id=sat.satellite_id,
+            constellation_id=sat.constellation_id,
+            info_line1=sat.info_line1,
+            info_line2=sat.info_line2
+        )
+
+    async def ListConstellations(self, request, context):
+        """获取星座列表"""
+        try:
+            async with self._session_factory() as session:
+                user_id = await self._verify_user_id_async(session, request.user_id, context)
+
+                # 先从缓存查询
+                cache_key = ConstellationKeys.list_by_user(user_id)
+                cached_data = await AsyncRedisClient.get_cached_data(cache_key)
+                if cached_data:
+                    return constellation_pb2.ListConstellationsResponse(
+                        status=common_pb2.Status(code=200, message="Success"),
+                        constellations=[constellation_pb2.Constellation(**item) for item in cached_data]
+                    )
+
+                # 缓存未命中，从数据库查询
+                constellations = await AsyncConstellationDAL.get_all_by_user(session, user_id)
+
+            constellation_list = [self._constellation_dict(const) for const in constellations]
+            await AsyncRedisClient.cache_data(cache_key, constellation_list, TTL.SHORT)
+
+            return constellation_pb2.ListConstellationsResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                constellations=[constellation_pb2.Constellation(**item) for item in constellation_list]
+            )
+
+        except grpc.aio.AbortError:
+            raise
+        except Exception as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    async def GetConstellation(self, request, context):
+        """获取星座详情（带卫星分页）"""
+        try:
+            async with self._session_factory() as session:
+                user_id = await self._verify_user_id_async(session, request.user_id, context)
+
+                # 先从缓存获取星座基本信息
+                cache_key = ConstellationKeys.info(request.constellation_id)
+                constellation = await AsyncRedisClient.get_cached_data(cache_key)
+
+                if constellation:
+                    # 缓存命中，但仍需验证用户权限
+                    if int(constellation.get("user_id")) != int(user_id):
+                        return constellation_pb2.GetConstellationResponse(
+                            status=common_pb2.Status(code=404, message="user is not authorized")
+                        )
+                else:
+                    # 缓存未命中，从数据库查询
+                    row = await AsyncConstellationDAL.get_by_id(session, request.constellation_id, user_id)
+                    if not row:
+                        return constellation_pb2.GetConstellationResponse(
+                            status=common_pb2.Status(code=404, message="Constellation not found in mysql")
+                        )
+                    constellation = self._constellation_dict(row)
+                    await AsyncRedisClient.cache_data(cache_key, constellation, TTL.MEDIUM)
+
+                # 检查是否使用分页
+                use_pagination = request.pagination and (request.pagination.page > 0 or request.pagination.per_page > 0)
+                pagination_response = None
+
+                if use_pagination:
+                    page = request.pagination.page if request.pagination.page else 1
+                    per_page = request.pagination.per_page if request.pagination.per_page else 20
+
+                    satellites, total = await AsyncConstellationDAL.get_satellites_paginated(
+                        session, constellation["id"], page, per_page
+                    )
+                    total_pages = math.ceil(total / per_page) if total else 0
+                    pagination_response = common_pb2.PaginationResponse(
+                        page=page,
+                        per_page=per_page,
+                        total_pages=total_pages,
+                        total_items=total,
+                        has_next=page < total_pages,
+                        has_prev=page > 1
+                    )
+                else:
+                    # 不使用分页，返回所有卫星
+                    satellites = await AsyncSatelliteDAL.get_by_constellation(session, constellation["id"])
+
+            response = constellation_pb2.GetConstellationResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                constellation=constellation_pb2.Constellation(**constellation),
+                satellites=[self._satellite_info(sat) for sat in satellites]
+            )
+
+            # 只有使用分页时才设置分页响应
+            if pagination_response:
+                response.pagination.CopyFrom(pagination_response)
+
+            return response
+
+        except grpc.aio.AbortError:
+            raise
+        except Exception as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
@@ -0,0 +1,80 @@
+"""
+gRPC卫星服务实现（asyncio版本）
+读多的方法改为协程，使用异步数据库引擎和异步Redis客户端；
+其余方法（含传播、路由等计算密集的方法）沿用SatelliteService的同步实现，由grpc.aio服务器在线程池中执行
+"""
+import grpc
+from google.protobuf.json_format import MessageToDict, ParseDict
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from grpc_generated import satellite_pb2, common_pb2
+from grpc_services.satellite_service import SatelliteService
+from dal.async_dal import AsyncUserDAL, AsyncConstellationDAL, AsyncSatelliteDAL
+from utils.async_redis_client import AsyncRedisClient
+from utils.redis_keys import SatelliteKeys, TTL
+
+
+class AsyncSatelliteService(SatelliteService):
+    """卫星服务实现（asyncio版本）"""
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self._session_factory = session_factory
+
+    async def GetSatellitesByConstellation(self, request, context):
+        """按星座查询卫星"""
+        try:
+            # 从缓存中查询（缓存项为卫星消息的字典形式，字段名与proto一致）
+            cache_key = SatelliteKeys.list_by_constellation(request.constellation_id)
+
+            async with self._session_factory() as session:
+                user = await AsyncUserDAL.get_by_id(session, request.user_id)
+                if user is None:
+                    await context.abort(grpc.StatusCode.UNAUTHENTICATED, "Invalid user ID")
+
+                # 验证星座所有权
+                constellation = await AsyncConstellationDAL.get_by_id(
+                    session, request.constellation_id, request.user_id
+                )
+                if not constellation:
+                    await context.abort(grpc.StatusCode.NOT_FOUND, "Constellation not found or access denied")
+
+                cache_data = await AsyncRedisClient.get_cached_data(cache_key)
+                if cache_data:
+                    return satellite_pb2.GetSatellitesByConstellationResponse(
+                        status=common_pb2.Status(code=200, message="Success"),
+                        satellites=[
+                            ParseDict(item, satellite_pb2.Satellite(), ignore_unknown_fields=True)
+                            for item in cache_data
+                        ]
+                    )
+
+                satellites = await AsyncSatelliteDAL.get_by_constellation(session, request.constellation_id)
+
+            satellite_list = [
+                satellite_pb2.Satellite(
+                    id=sat.id,
+                    satellite_id=sat.satellite_id,
+                    constellation_id=sat.constellation_id,
+                    info_line1=sat.info_line1,
+                    info_line2=sat.info_line2,
+                    ext_info=self._serialize_ext_info(sat.ext_info)
+                )
+                for sat in satellites
+            ]
+
+            # 加入缓存
+            await AsyncRedisClient.cache_data(
+                cache_key,
+                [MessageToDict(sat, preserving_proto_field_name=True) for sat in satellite_list],
+                TTL.MEDIUM
+            )
+
+            return satellite_pb2.GetSatellitesByConstellationResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                satellites=satellite_list
+            )
+
+        except grpc.aio.AbortError:
+            raise
+        except Exception as e:
+            await context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
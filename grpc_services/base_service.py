@@ -14,9 +14,19 @@ from utils.redis_keys import BaseKeys, TTL
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from grpc_generated import base_pb2, base_pb2_grpc, common_pb2
-from dal.base_dal import BaseDAL
+from dal.base_dal import BaseDAL, validate_location
+from dal.constellation_dal import ConstellationDAL
+from dal.satellite_dal import SatelliteDAL
+from orbit.frames import geodetic_up
+from orbit.propagator import PackedConstellation, count_epochs
+from orbit.spatial import LatLonGrid
+from orbit.visibility import compute_visibility_windows
 from utils.jwt_auth import JWTAuth
 import grpc
+import numpy as np
+
+# 单次可见性计算允许的 基座数×卫星数×时刻数 上限
+MAX_VISIBILITY_POINTS = 1000000000
 
 
 class BaseService(base_pb2_grpc.BaseServiceServicer):
@@ -29,6 +39,43 @@ class BaseService(base_pb2_grpc.BaseServiceServicer):
             context.abort(grpc.StatusCode.UNAUTHENTICATED, "Invalid user ID")
         return user_id
 
+    @staticmethod
+    def _request_location(request):
+        """
+        从请求中读取结构化位置
+
+        Returns:
+            (纬度, 经度, 海拔米)，未提供经纬度时返回None
+
+        Raises:
+            ValueError: 只提供了纬度或经度之一，或超出范围
+        """
+        has_lat = request.HasField('latitude')
+        has_lon = request.HasField('longitude')
+        if not has_lat and not has_lon:
+            return None
+        if not has_lat or not has_lon:
+            raise ValueError("latitude and longitude must be provided together")
+        location = (request.latitude, request.longitude,
+                    request.altitude if request.HasField('altitude') else 0.0)
+        validate_location(location)
+        return location
+
+    @staticmethod
+    def _base_to_dict(base) -> dict:
+        """基座转换为缓存/响应用的字典（未设置位置时不含位置字段）"""
+        data = {
+            "id": base.id,
+            "base_name": base.base_name,
+            "info": base.info,
+            "user_id": base.user_id
+        }
+        if base.latitude is not None:
+            data["latitude"] = base.latitude
+            data["longitude"] = base.longitude
+            data["altitude"] = base.altitude
+        return data
+
     def ListBases(self, request, context):
         """获取基座列表"""
         try:
@@ -47,21 +94,14 @@ class BaseService(base_pb2_grpc.BaseServiceServicer):
             # 缓存未命中，从数据库查询
             bases = BaseDAL.get_all_by_user(user_id)
 
-            base_list = []
-            for base in bases:
-                base_list.append(base_pb2.Base(
-                    id=base.id,
-                    base_name=base.base_name,
-                    info=base.info,
-                    user_id=base.user_id
-                ))
+            base_list = [self._base_to_dict(base) for base in bases]
 
             # 缓存数据
             RedisClient.cache_data(cache_key, base_list, TTL.MEDIUM)
 
             return base_pb2.ListBasesResponse(
                 status=common_pb2.Status(code=200, message="Success"),
-                bases=base_list
+                bases=[base_pb2.Base(**item) for item in base_list]
             )
 
         except Exception as e:
@@ -97,12 +137,7 @@ class BaseService(base_pb2_grpc.BaseServiceServicer):
                     )
                 )
 
-            base_data = {
-                "id": base.id,
-                "base_name": base.base_name,
-                "info": base.info,
-                "user_id": base.user_id
-            }
+            base_data = self._base_to_dict(base)
             RedisClient.cache_data(cache_key, base_data, TTL.MEDIUM)
 
             return base_pb2.GetBaseResponse(
@@ -132,6 +167,13 @@ class BaseService(base_pb2_grpc.BaseServiceServicer):
                     )
                 )
 
+            try:
+                location = self._request_location(request)
+            except ValueError as e:
+                return base_pb2.CreateBaseResponse(
+                    status=common_pb2.Status(code=400, message=f"Invalid location: {str(e)}")
+                )
+
             # 检查名称是否已存在
             if BaseDAL.name_exists(base_name, user_id):
                 return base_pb2.CreateBaseResponse(
@@ -142,24 +184,14 @@ class BaseService(base_pb2_grpc.BaseServiceServicer):
                 )
 
             # 创建基座
-            base = BaseDAL.create(base_name, info, user_id)
+            base = BaseDAL.create(base_name, info, user_id, location)
             cache_key = BaseKeys.info(base.id)
-            base_data = {
-                "id": base.id,
-                "base_name": base.base_name,
-                "info": base.info,
-                "user_id": base.user_id
-            }
+            base_data = self._base_to_dict(base)
             RedisClient.cache_data(cache_key, base_data, TTL.MEDIUM)
 
             return base_pb2.CreateBaseResponse(
                 status=common_pb2.Status(code=200, message="Success"),
-                base=base_pb2.Base(
-                    id=base.id,
-                    base_name=base.base_name,
-                    info=base.info,
-                    user_id=base.user_id
-                )
+                base=base_pb2.Base(**base_data)
             )
 
         except Exception as e:
@@ -194,6 +226,13 @@ class BaseService(base_pb2_grpc.BaseServiceServicer):
                     )
                 )
 
+            try:
+                location = self._request_location(request)
+            except ValueError as e:
+                return base_pb2.UpdateBaseResponse(
+                    status=common_pb2.Status(code=400, message=f"Invalid location: {str(e)}")
+                )
+
             # 检查名称是否已存在（排除自身）
             if BaseDAL.name_exists(base_name, user_id, exclude_id=base.id):
                 return base_pb2.UpdateBaseResponse(
@@ -204,24 +243,14 @@ class BaseService(base_pb2_grpc.BaseServiceServicer):
                 )
 
             # 更新基座,加入缓存
-            base = BaseDAL.update(base, base_name, info)
+            base = BaseDAL.update(base, base_name, info, location)
             cache_key = BaseKeys.info(base.id)
-            base_data = {
-                "id": base.id,
-                "base_name": base.base_name,
-                "info": base.info,
-                "user_id": base.user_id
-            }
+            base_data = self._base_to_dict(base)
             RedisClient.cache_data(cache_key, base_data, TTL.MEDIUM)
 
             return base_pb2.UpdateBaseResponse(
                 status=common_pb2.Status(code=200, message="Success"),
-                base=base_pb2.Base(
-                    id=base.id,
-                    base_name=base.base_name,
-                    info=base.info,
-                    user_id=base.user_id
-                )
+                base=base_pb2.Base(**base_data)
             )
 
         except Exception as e:
@@ -252,3 +281,85 @@ class BaseService(base_pb2_grpc.BaseServiceServicer):
 
         except Exception as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def ComputeVisibility(self, request, context):
+        """计算基座与星座卫星之间的可见窗口（基座、卫星两个维度同时向量化）"""
+        try:
+            user_id = self._verify_user_id(request.user_id, context)
+
+            # 验证星座所有权
+            if not ConstellationDAL.get_by_id(request.constellation_id, user_id):
+                return base_pb2.ComputeVisibilityResponse(
+                    status=common_pb2.Status(code=404, message="Constellation not found")
+                )
+
+            window = request.window
+            try:
+                n_times = count_epochs(window.start_time, window.end_time, window.step_seconds)
+            except ValueError as e:
+                return base_pb2.ComputeVisibilityResponse(
+                    status=common_pb2.Status(code=400, message=f"Invalid time window: {str(e)}")
+                )
+
+            # 读取预计算的ECEF（旧基座的位置由数据库迁移从info中补齐）
+            bases = BaseDAL.get_located_by_user(user_id, list(request.base_ids))
+            base_ids = [base.id for base in bases]
+
+            errors = []
+            located = set(base_ids)
+            for base_id in request.base_ids:
+                if base_id not in located:
+                    errors.append(f"Base {base_id}: not found or location not set")
+
+            if not base_ids:
+                return base_pb2.ComputeVisibilityResponse(
+                    status=common_pb2.Status(code=404, message="No bases with valid location"),
+                    errors=errors[:10]
+                )
+
+            packed = PackedConstellation.from_tle_rows(SatelliteDAL.get_tle_rows(request.constellation_id))
+            errors.extend(packed.errors)
+
+            if len(base_ids) * len(packed) * n_times > MAX_VISIBILITY_POINTS:
+                return base_pb2.ComputeVisibilityResponse(
+                    status=common_pb2.Status(
+                        code=400,
+                        message=f"Too many points ({len(base_ids)} bases x {len(packed)} satellites "
+                                f"x {n_times} epochs), limit is {MAX_VISIBILITY_POINTS}"
+                    )
+                )
+
+            lat = [base.latitude for base in bases]
+            lon = [base.longitude for base in bases]
+            base_ecef = np.array([[base.ecef_x, base.ecef_y, base.ecef_z] for base in bases])
+            windows = compute_visibility_windows(
+                packed,
+                base_ecef,
+                geodetic_up(lat, lon),
+                window.start_time,
+                window.end_time,
+                window.step_seconds,
+                request.min_elevation_deg,
+                grid=LatLonGrid(lat, lon, base_ecef)  # 按基座网格预筛选可能过顶的卫星
+            )
+
+            window_list = []
+            for b, s, rise_time, set_time in zip(windows.base_index.tolist(),
+                                                 windows.satellite_index.tolist(),
+                                                 windows.rise_time.tolist(),
+                                                 windows.set_time.tolist()):
+                window_list.append(base_pb2.VisibilityWindow(
+                    base_id=base_ids[b],
+                    satellite_id=int(packed.satellite_ids[s]),
+                    rise_time=rise_time,
+                    set_time=set_time
+                ))
+
+            return base_pb2.ComputeVisibilityResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                windows=window_list,
+                errors=errors[:10]  # 只返回前10个错误
+            )
+
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
@@ -12,11 +12,13 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from grpc_generated import constellation_pb2, constellation_pb2_grpc, common_pb2, base_pb2
 from dal.constellation_dal import ConstellationDAL
-from dal.satellite_dal import SatelliteDAL, LinkedSatelliteDAL
-from history.model import SatelliteModel
+from dal.satellite_dal import SatelliteDAL
+from dal.import_staging_dal import ImportStagingDAL
+from dal.export_stream import ExportDAL
+from dal.export_cache import export_cache
 import grpc
-from zipfile import ZipFile, ZIP_DEFLATED
-import io
+import hashlib
+import time
 
 
 class ConstellationService(constellation_pb2_grpc.ConstellationServiceServicer):
@@ -337,7 +339,14 @@ class ConstellationService(constellation_pb2_grpc.ConstellationServiceServicer):
             context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
 
     def ImportSatellites(self, request_iterator, context):
-        """批量导入卫星（客户端流式传输）"""
+        """
+        批量导入卫星（客户端流式传输，先写入暂存表，流结束后一次性转入，全部成功或全部不生效）
+
+        首条消息带import_id时为会话模式：只写入该会话的暂存表，由CommitImport统一转入；
+        流中断时已写入的批次保留，客户端可按GetImportCheckpoint返回的断点续传
+        """
+        import_id = None
+        session = False
         try:
             user_id = None
             constellation_id = None
@@ -345,8 +354,8 @@ class ConstellationService(constellation_pb2_grpc.ConstellationServiceServicer):
             fail_count = 0
             errors = []
             existing_satellite_ids = set()
-            batch = []
-            BATCH_SIZE = 100
+            inserter = None
+            checkpoint = 0
 
             for request in request_iterator:
                 # 第一次请求时验证token和constellation
@@ -362,6 +371,13 @@ class ConstellationService(constellation_pb2_grpc.ConstellationServiceServicer):
                     # 获取已存在的卫星ID
                     existing_satellite_ids = ConstellationDAL.get_existing_satellite_ids(constellation_id)
 
+                    # 按数据包大小自适应分批写入暂存表
+                    session = bool(request.import_id)
+                    if session and not ImportStagingDAL.session_exists(request.import_id, constellation_id, user_id):
+                        context.abort(grpc.StatusCode.NOT_FOUND, "Import session not found")
+                    import_id = request.import_id if session else ImportStagingDAL.begin_import()
+                    inserter = ImportStagingDAL.satellite_inserter()
+
                 # 验证卫星ID
                 satellite_id = request.satellite_id
                 if satellite_id in existing_satellite_ids:
@@ -369,109 +385,160 @@ class ConstellationService(constellation_pb2_grpc.ConstellationServiceServicer):
                     fail_count += 1
                     continue
 
-                # 创建卫星对象
-                new_satellite = SatelliteModel(
-                    satellite_id=satellite_id,
-                    constellation_id=constellation_id,
-                    info_line1=request.info_line1,
-                    info_line2=request.info_line2,
-                    ext_info={}  # ImportSatellitesRequest 不包含 ext_info
-                )
-                batch.append(new_satellite)
+                # 加入批次（批次达到预算时自动写入）
+                inserter.add({
+                    "import_id": import_id,
+                    "shard": request.shard,
+                    "sequence": request.sequence,
+                    "satellite_id": satellite_id,
+                    "info_line1": request.info_line1,
+                    "info_line2": request.info_line2,
+                    "ext_info": {}  # ImportSatellitesRequest 不包含 ext_info
+                })
                 existing_satellite_ids.add(satellite_id)
+                checkpoint = request.sequence
                 success_count += 1
 
-                # 批次提交
-                if len(batch) >= BATCH_SIZE:
-                    SatelliteDAL.batch_create(batch)
-                    batch = []
-
-            # 提交最后一批
-            if batch:
-                SatelliteDAL.batch_create(batch)
+            # 写入最后一批，然后在一个事务内转入satellite表并更新星座的卫星数量
+            if inserter:
+                inserter.close()
+                if not session:
+                    promoted = ImportStagingDAL.promote_satellites(import_id, constellation_id)
+                    import_id = None
 
-            # 更新星座的卫星数量
-            if constellation_id:
-                ConstellationDAL.update_satellite_count(constellation_id)
+                    # 暂存期间被并发写入的卫星ID会在转入时跳过
+                    if promoted < success_count:
+                        errors.append(f"{success_count - promoted} satellites were created concurrently and skipped")
+                        fail_count += success_count - promoted
+                        success_count = promoted
 
             return constellation_pb2.ImportSatellitesResponse(
                 status=common_pb2.Status(code=200, message="Success"),
                 success_count=success_count,
                 fail_count=fail_count,
-                errors=errors[:10]  # 只返回前10个错误
+                errors=errors[:10],  # 只返回前10个错误
+                checkpoint=checkpoint
             )
 
         except Exception as e:
+            # 导入未完成时丢弃暂存数据，正式表不受影响；会话模式保留已写入的批次用于续传
+            if import_id and not session:
+                ImportStagingDAL.discard(import_id)
             context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
 
-    def ExportConstellations(self, request, context):
-        """导出星座数据（TLE和ISL）"""
+    def _verify_import_constellation(self, request, context):
+        """导入会话RPC的公共校验：用户有效且星座属于该用户"""
+        user_id = self._verify_user_id(request.user_id, context)
+        constellation = ConstellationDAL.get_by_id(request.constellation_id, user_id)
+        if not constellation:
+            context.abort(grpc.StatusCode.NOT_FOUND, "Constellation not found")
+        return user_id
+
+    def BeginImport(self, request, context):
+        """开始导入会话（会话记录所属的星座和用户，续传和提交时校验）"""
         try:
-            user_id = self._verify_user_id(request.user_id, context)
-            constellation_ids = request.constellation_ids
+            user_id = self._verify_import_constellation(request, context)
+            return constellation_pb2.BeginImportResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                import_id=ImportStagingDAL.begin_session(request.constellation_id, user_id)
+            )
 
-            if not constellation_ids:
-                return constellation_pb2.ExportConstellationsResponse(
-                    status=common_pb2.Status(
-                        code=400,
-                        message="No constellation IDs provided"
-                    )
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def GetImportCheckpoint(self, request, context):
+        """查询导入会话的断点"""
+        try:
+            user_id = self._verify_import_constellation(request, context)
+            if not request.import_id:
+                return constellation_pb2.GetImportCheckpointResponse(
+                    status=common_pb2.Status(code=400, message="import_id is required")
+                )
+            if not ImportStagingDAL.session_exists(request.import_id, request.constellation_id, user_id):
+                return constellation_pb2.GetImportCheckpointResponse(
+                    status=common_pb2.Status(code=404, message="Import session not found")
                 )
 
-            # 获取选中的星座
-            constellations = []
-            for const_id in constellation_ids:
-                const = ConstellationDAL.get_by_id(const_id, user_id)
-                if const:
-                    constellations.append(const)
+            checkpoints = ImportStagingDAL.checkpoints(request.import_id)
+            return constellation_pb2.GetImportCheckpointResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                checkpoints=[
+                    constellation_pb2.ImportCheckpoint(shard=shard, sequence=sequence)
+                    for shard, sequence in sorted(checkpoints.items())
+                ]
+            )
 
-            if not constellations:
-                return constellation_pb2.ExportConstellationsResponse(
-                    status=common_pb2.Status(
-                        code=404,
-                        message="No valid constellations found"
-                    )
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def CommitImport(self, request, context):
+        """提交导入会话：卫星和链接在同一个事务中转入，失败时暂存数据保留，可以重新提交"""
+        try:
+            user_id = self._verify_import_constellation(request, context)
+            if not request.import_id:
+                return constellation_pb2.CommitImportResponse(
+                    status=common_pb2.Status(code=400, message="import_id is required")
+                )
+            if not ImportStagingDAL.session_exists(request.import_id, request.constellation_id, user_id):
+                return constellation_pb2.CommitImportResponse(
+                    status=common_pb2.Status(code=404, message="Import session not found")
                 )
 
-            # 生成TLE和ISL数据
-            tles_lines = []
-            isls_lines = []
-            constellation_sat_count = []
+            satellite_count, link_count = ImportStagingDAL.commit_session(
+                request.import_id, request.constellation_id
+            )
 
-            # 收集每个星座的卫星数量
-            for constellation in constellations:
-                satellites = SatelliteDAL.get_by_constellation(constellation.id)
-                constellation_sat_count.append(len(satellites))
+            # 卫星数量变化，清除星座缓存
+            if satellite_count:
+                RedisClient.delete_multiple_cache(
+                    ConstellationKeys.info(request.constellation_id),
+                    ConstellationKeys.list_by_user(user_id)
+                )
 
-                # 生成TLE数据
-                for sat in satellites:
-                    tles_lines.append(f"{constellation.constellation_name} {sat.satellite_id}")
-                    tles_lines.append(sat.info_line1)
-                    tles_lines.append(sat.info_line2)
-
-            # 生成ISL数据
-            for idx, constellation in enumerate(constellations):
-                # 计算偏移量
-                current_offset = sum(constellation_sat_count[:idx]) if idx > 0 else 0
-
-                # 获取该星座的所有卫星关联
-                links = LinkedSatelliteDAL.get_by_constellation(constellation.id)
-                for link in links:
-                    sat1_id = link.satellite_id1 + current_offset
-                    sat2_id = link.satellite_id2 + current_offset
-                    isls_lines.append(f"{sat1_id} {sat2_id}")
-
-            # 创建ZIP文件
-            tles_content = '\n'.join(tles_lines)
-            isls_content = '\n'.join(isls_lines)
-
-            memory_file = io.BytesIO()
-            with ZipFile(memory_file, 'w', ZIP_DEFLATED) as zipf:
-                zipf.writestr('tles.txt', tles_content)
-                zipf.writestr('isls.txt', isls_content)
-
-            memory_file.seek(0)
-            zip_data = memory_file.read()
+            return constellation_pb2.CommitImportResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                satellite_count=satellite_count,
+                link_count=link_count
+            )
+
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    @staticmethod
+    def _export_selection(constellation_ids, user_id):
+        """
+        导出请求的公共校验
+
+        Returns:
+            (导出计划, 错误状态)，校验通过时错误状态为None
+        """
+        if not constellation_ids:
+            return None, common_pb2.Status(code=400, message="No constellation IDs provided")
+
+        # 选中的星座和各星座卫星数用集合查询一次取回
+        plan = ExportDAL.plan(constellation_ids, user_id)
+        if not plan.constellations:
+            return None, common_pb2.Status(code=404, message="No valid constellations found")
+        return plan, None
+
+    def ExportConstellations(self, request, context):
+        """导出星座数据（TLE和ISL，整个ZIP文件在一个响应中返回；大数据量请使用StreamExportConstellations）"""
+        try:
+            user_id = self._verify_user_id(request.user_id, context)
+            plan, error = self._export_selection(request.constellation_ids, user_id)
+            if error:
+                return constellation_pb2.ExportConstellationsResponse(status=error)
+
+            # 星座数据未变化时直接读取缓存的导出文件
+            key = export_cache.key(plan, request.columnar)
+            artifact = export_cache.get(key)
+            if artifact:
+                zip_data = b''.join(export_cache.read(artifact))
+            else:
+                created_at = int(time.time())
+                zip_data = b''.join(export_cache.store(
+                    key, ExportDAL.stream_zip(plan, created_at=created_at, columnar=request.columnar), created_at
+                ))
 
             return constellation_pb2.ExportConstellationsResponse(
                 status=common_pb2.Status(code=200, message="Success"),
@@ -480,3 +547,109 @@ class ConstellationService(constellation_pb2_grpc.ConstellationServiceServicer):
 
         except Exception as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def StreamExportConstellations(self, request, context):
+        """
+        流式导出星座数据（服务端游标分批读取，边压缩边发送，内存占用与数据量无关）
+
+        request.offset > 0 时为续传：重新生成ZIP并跳过前offset字节，SHA-256仍按完整文件计算，
+        导出期间数据发生变化时客户端的校验会失败。
+        星座数据版本未变化且created_at一致（或未指定）时直接从缓存文件的偏移量处读取
+        """
+        try:
+            user_id = self._verify_user_id(request.user_id, context)
+            plan, error = self._export_selection(request.constellation_ids, user_id)
+            if error:
+                yield constellation_pb2.ExportChunk(status=error)
+                return
+            if request.offset < 0:
+                yield constellation_pb2.ExportChunk(
+                    status=common_pb2.Status(code=400, message="Invalid offset")
+                )
+                return
+
+            key = export_cache.key(plan, request.columnar)
+            artifact = export_cache.get(key)
+            if artifact and request.created_at in (0, artifact.created_at):
+                yield from self._stream_cached_export(artifact, request.offset, context)
+                return
+
+            created_at = request.created_at or int(time.time())
+            digest = hashlib.sha256()
+            position = 0
+            chunk_index = 0
+            chunks = export_cache.store(
+                key, ExportDAL.stream_zip(plan, created_at=created_at, columnar=request.columnar), created_at
+            )
+            for data in chunks:
+                # 客户端取消时停止查询和压缩
+                if not context.is_active():
+                    return
+
+                digest.update(data)
+                start = position
+                position += len(data)
+                # 续传时跳过客户端已有的部分
+                if position <= request.offset:
+                    continue
+                skip = max(request.offset - start, 0)
+                yield constellation_pb2.ExportChunk(
+                    status=common_pb2.Status(code=200, message="Success"),
+                    chunk_index=chunk_index,
+                    data=data[skip:],
+                    offset=start + skip,
+                    created_at=created_at
+                )
+                chunk_index += 1
+
+            if request.offset > position:
+                yield constellation_pb2.ExportChunk(
+                    status=common_pb2.Status(code=400, message="Offset beyond end of export")
+                )
+                return
+
+            # 结束块：完整文件的大小和校验和
+            yield constellation_pb2.ExportChunk(
+                status=common_pb2.Status(code=200, message="Success"),
+                chunk_index=chunk_index,
+                offset=position,
+                created_at=created_at,
+                total_bytes=position,
+                sha256=digest.hexdigest()
+            )
+
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    @staticmethod
+    def _stream_cached_export(artifact, offset, context):
+        """从缓存文件的偏移量处发送导出数据，结束块使用缓存中记录的大小和校验和"""
+        if offset > artifact.size:
+            yield constellation_pb2.ExportChunk(
+                status=common_pb2.Status(code=400, message="Offset beyond end of export")
+            )
+            return
+
+        position = offset
+        chunk_index = 0
+        for data in export_cache.read(artifact, offset):
+            if not context.is_active():
+                return
+            yield constellation_pb2.ExportChunk(
+                status=common_pb2.Status(code=200, message="Success"),
+                chunk_index=chunk_index,
+                data=data,
+                offset=position,
+                created_at=artifact.created_at
+            )
+            position += len(data)
+            chunk_index += 1
+
+        yield constellation_pb2.ExportChunk(
+            status=common_pb2.Status(code=200, message="Success"),
+            chunk_index=chunk_index,
+            offset=artifact.size,
+            created_at=artifact.created_at,
+            total_bytes=artifact.size,
+            sha256=artifact.sha256
+        )
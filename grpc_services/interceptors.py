@@ -1,8 +1,14 @@
 """
 gRPC拦截器 - 用于认证和日志
 """
+import asyncio
 import grpc
+import inspect
 import logging
+import random
+import threading
+import time
+from concurrent import futures
 from utils.jwt_auth import JWTAuth
 from dal.user_dal import UserDAL
 
@@ -13,6 +19,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 同步生成器结束的标记
+_STREAM_END = object()
+
 
 class AuthInterceptor(grpc.ServerInterceptor):
     """
@@ -61,124 +70,340 @@ class AuthInterceptor(grpc.ServerInterceptor):
         context.abort(grpc.StatusCode.UNAUTHENTICATED, 'Invalid or expired token')
 
 
-class LoggingInterceptor(grpc.ServerInterceptor):
+def is_async_handler(method_handler) -> bool:
+    """方法处理器是否为协程实现（grpc.aio服务器直接在事件循环中执行，无需线程池）"""
+    behavior = (method_handler.unary_unary or method_handler.unary_stream
+                or method_handler.stream_unary or method_handler.stream_stream)
+    return inspect.iscoroutinefunction(behavior) or inspect.isasyncgenfunction(behavior)
+
+
+class MethodConcurrencyLimiter:
     """
-    日志拦截器
-    记录所有gRPC调用的日志
+    按方法计数的并发上限（线程安全）
+
+    获取许可不等待：已达上限时立即失败，由拦截器返回RESOURCE_EXHAUSTED，
+    避免批量导出等重型调用占满线程池、让交互式调用排队
     """
 
-    def intercept_service(self, continuation, handler_call_details):
-        """拦截服务调用"""
+    def __init__(self, limits: dict):
+        self.limits = dict(limits)
+        self._active = {method: 0 for method in self.limits}
+        self._lock = threading.Lock()
 
-        method = handler_call_details.method
-        metadata = dict(handler_call_details.invocation_metadata)
+    def try_acquire(self, method: str) -> bool:
+        with self._lock:
+            if self._active[method] >= self.limits[method]:
+                return False
+            self._active[method] += 1
+            return True
+
+    def release(self, method: str) -> None:
+        with self._lock:
+            self._active[method] -= 1
+
+    def active(self) -> dict:
+        """各方法当前进行中的调用数"""
+        with self._lock:
+            return dict(self._active)
+
+    def rejection_message(self, method: str) -> str:
+        return f"Too many concurrent calls to {method} (limit {self.limits[method]}), retry later"
+
+
+def rebuild_handler(method_handler, wrap_unary_response, wrap_stream_response):
+    """按原处理器的类型重建处理器，行为函数分别用两个包装函数包装（一元响应/流式响应）"""
+    if method_handler.unary_unary:
+        return grpc.unary_unary_rpc_method_handler(
+            wrap_unary_response(method_handler.unary_unary),
+            request_deserializer=method_handler.request_deserializer,
+            response_serializer=method_handler.response_serializer
+        )
+    elif method_handler.unary_stream:
+        return grpc.unary_stream_rpc_method_handler(
+            wrap_stream_response(method_handler.unary_stream),
+            request_deserializer=method_handler.request_deserializer,
+            response_serializer=method_handler.response_serializer
+        )
+    elif method_handler.stream_unary:
+        return grpc.stream_unary_rpc_method_handler(
+            wrap_unary_response(method_handler.stream_unary),
+            request_deserializer=method_handler.request_deserializer,
+            response_serializer=method_handler.response_serializer
+        )
+    elif method_handler.stream_stream:
+        return grpc.stream_stream_rpc_method_handler(
+            wrap_stream_response(method_handler.stream_stream),
+            request_deserializer=method_handler.request_deserializer,
+            response_serializer=method_handler.response_serializer
+        )
+    return method_handler
+
+
+class SyncContextAdapter:
+    """
+    grpc.aio服务器中同步流式方法使用的上下文
+    包装grpc.aio的ServicerContext，供在线程池中执行的同步生成器调用：
+    is_active()在客户端取消或超时后返回False，流式方法据此停止生成；
+    abort()与同步服务器一致，设置状态后抛出异常结束调用
+    """
 
-        logger.info(f"gRPC call started: {method}")
-        logger.debug(f"Metadata: {metadata}")
+    def __init__(self, context, loop):
+        self._context = context
+        self._loop = loop
+
+    def is_active(self) -> bool:
+        return not self._context.done()
+
+    def abort(self, code, details='', trailing_metadata=()):
+        future = asyncio.run_coroutine_threadsafe(
+            self._context.abort(code, details, trailing_metadata), self._loop
+        )
+        raise future.exception()
+
+    def send_initial_metadata(self, metadata):
+        asyncio.run_coroutine_threadsafe(self._context.send_initial_metadata(metadata), self._loop).result()
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+def run_stream_in_executor(behavior, executor):
+    """
+    把同步的流式响应方法包装为协程生成器（grpc.aio服务器使用）
+
+    同步生成器在executor中逐条执行；
+    grpc.aio在客户端取消后既不继续迭代也不关闭同步生成器，这里在结束或取消时
+    等待正在执行的一步完成后关闭生成器，使其释放数据库会话和并发许可
+    """
+    async def wrapper(request, context):
+        loop = asyncio.get_running_loop()
+        iterator = behavior(request, SyncContextAdapter(context, loop))
+        step = None
+
+        def close():
+            if step is not None:
+                futures.wait([step])
+            iterator.close()
 
-        # 继续处理请求
         try:
-            response = continuation(handler_call_details)
-            logger.info(f"gRPC call completed: {method}")
-            return response
-        except Exception as e:
-            logger.error(f"gRPC call failed: {method}, Error: {str(e)}")
-            raise
+            while True:
+                step = executor.submit(next, iterator, _STREAM_END)
+                response = await asyncio.wrap_future(step)
+                if response is _STREAM_END:
+                    return
+                yield response
+        finally:
+            await loop.run_in_executor(executor, close)
+
+    return wrapper
 
 
-class ErrorHandlingInterceptor(grpc.ServerInterceptor):
+class FusedInterceptor(grpc.ServerInterceptor):
     """
-    错误处理拦截器
-    统一处理异常并返回友好的错误信息
+    合并的服务端拦截器
+    每次调用只经过一层包装函数，依次完成：并发限制 -> 数据库会话 -> 错误处理 -> 日志
+
+    - 包装后的处理器按方法名缓存，后续拦截器或服务返回的处理器不变时直接复用，不再每次调用重建
+    - 数据库会话：每次调用一个作用域（见utils.app_context.CallSessionScope），不推入Flask应用上下文，
+      会话在首次访问时创建、调用结束时关闭
+    - 调用开始/完成日志按log_sample_rate抽样（1表示每次调用都记录），以%格式延迟格式化；异常日志不抽样
+    - 协程方法（grpc.aio服务器）只做并发限制和日志，错误处理和数据库会话由服务自身负责
+
+    Args:
+        sessions: 同步方法使用的调用级数据库会话作用域
+        limits: {方法全名: 并发上限}，未列出的方法不限制
+        log_sample_rate: 记录调用开始/完成日志的比例（0~1）
     """
 
+    def __init__(self, sessions, limits: dict, log_sample_rate: float = 1.0):
+        self.sessions = sessions
+        self.limiter = MethodConcurrencyLimiter(limits)
+        self.log_sample_rate = log_sample_rate
+        # {方法全名: (原处理器, 包装后的处理器)}
+        self._handlers = {}
+
     def intercept_service(self, continuation, handler_call_details):
         """拦截服务调用"""
-
-        # 获取原始的method handler
         method_handler = continuation(handler_call_details)
-
         if method_handler is None:
             return None
+        return self.wrapped_handler(handler_call_details, method_handler)
 
-        # 包装unary方法
-        if method_handler.unary_unary:
-            return grpc.unary_unary_rpc_method_handler(
-                self._wrap_unary(method_handler.unary_unary),
-                request_deserializer=method_handler.request_deserializer,
-                response_serializer=method_handler.response_serializer
-            )
-        elif method_handler.unary_stream:
-            return grpc.unary_stream_rpc_method_handler(
-                self._wrap_unary_stream(method_handler.unary_stream),
-                request_deserializer=method_handler.request_deserializer,
-                response_serializer=method_handler.response_serializer
-            )
-        elif method_handler.stream_unary:
-            return grpc.stream_unary_rpc_method_handler(
-                self._wrap_stream_unary(method_handler.stream_unary),
-                request_deserializer=method_handler.request_deserializer,
-                response_serializer=method_handler.response_serializer
-            )
-        elif method_handler.stream_stream:
-            return grpc.stream_stream_rpc_method_handler(
-                self._wrap_stream_stream(method_handler.stream_stream),
-                request_deserializer=method_handler.request_deserializer,
-                response_serializer=method_handler.response_serializer
+    def wrapped_handler(self, handler_call_details, method_handler):
+        """返回method_handler包装后的处理器（按方法名缓存）"""
+        method = handler_call_details.method
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Metadata of %s: %s", method, dict(handler_call_details.invocation_metadata))
+
+        cached = self._handlers.get(method)
+        if cached is not None and cached[0] is method_handler:
+            return cached[1]
+
+        wrappers = self._async_wrappers if is_async_handler(method_handler) else self._sync_wrappers
+        wrapped = rebuild_handler(method_handler, *wrappers(method))
+        self._handlers[method] = (method_handler, wrapped)
+        return wrapped
+
+    def _sampler(self):
+        """返回本次调用是否记录开始/完成日志的判断函数"""
+        rate = self.log_sample_rate
+        if rate >= 1:
+            return lambda: logger.isEnabledFor(logging.INFO)
+        if rate <= 0:
+            return lambda: False
+        return lambda: random.random() < rate and logger.isEnabledFor(logging.INFO)
+
+    def _sync_wrappers(self, method):
+        """同步方法的包装（流式响应在生成结束或被关闭时关闭会话、释放许可）"""
+        limiter = self.limiter if method in self.limiter.limits else None
+        sessions = self.sessions
+        sampled = self._sampler()
+
+        def enter(context):
+            if limiter is not None and not limiter.try_acquire(method):
+                context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, limiter.rejection_message(method))
+            if sampled():
+                logger.info("gRPC call started: %s", method)
+                return time.perf_counter()
+            return None
+
+        def leave():
+            if limiter is not None:
+                limiter.release(method)
+
+        def fail(context, e):
+            logger.error("Unhandled exception in %s: %s", method, e, exc_info=True)
+            context.abort(
+                grpc.StatusCode.INTERNAL,
+                f'Internal server error: {str(e)}'
             )
 
-        return method_handler
-
-    def _wrap_unary(self, behavior):
-        """包装unary-unary方法"""
-        def wrapper(request, context):
-            try:
-                return behavior(request, context)
-            except Exception as e:
-                logger.error(f"Unhandled exception: {str(e)}", exc_info=True)
-                context.abort(
-                    grpc.StatusCode.INTERNAL,
-                    f'Internal server error: {str(e)}'
-                )
-        return wrapper
-
-    def _wrap_unary_stream(self, behavior):
-        """包装unary-stream方法"""
-        def wrapper(request, context):
-            try:
-                for response in behavior(request, context):
-                    yield response
-            except Exception as e:
-                logger.error(f"Unhandled exception in unary-stream: {str(e)}", exc_info=True)
-                context.abort(
-                    grpc.StatusCode.INTERNAL,
-                    f'Internal server error: {str(e)}'
-                )
-        return wrapper
-
-    def _wrap_stream_unary(self, behavior):
-        """包装stream-unary方法"""
-        def wrapper(request_iterator, context):
-            try:
-                return behavior(request_iterator, context)
-            except Exception as e:
-                logger.error(f"Unhandled exception in stream-unary: {str(e)}", exc_info=True)
-                context.abort(
-                    grpc.StatusCode.INTERNAL,
-                    f'Internal server error: {str(e)}'
-                )
-        return wrapper
-
-    def _wrap_stream_stream(self, behavior):
-        """包装stream-stream方法"""
-        def wrapper(request_iterator, context):
-            try:
-                for response in behavior(request_iterator, context):
-                    yield response
-            except Exception as e:
-                logger.error(f"Unhandled exception in stream-stream: {str(e)}", exc_info=True)
-                context.abort(
-                    grpc.StatusCode.INTERNAL,
-                    f'Internal server error: {str(e)}'
-                )
-        return wrapper
+        def wrap_unary_response(behavior):
+            def wrapper(request_or_iterator, context):
+                started = enter(context)
+                previous = sessions.activate(object())
+                try:
+                    response = behavior(request_or_iterator, context)
+                except Exception as e:
+                    fail(context, e)
+                finally:
+                    sessions.release(previous)
+                    leave()
+                if started is not None:
+                    logger.info("gRPC call completed: %s (%.1f ms)", method, (time.perf_counter() - started) * 1000)
+                return response
+            return wrapper
+
+        def wrap_stream_response(behavior):
+            def wrapper(request_or_iterator, context):
+                started = enter(context)
+                # 各步可能在不同线程中执行（grpc.aio），每一步执行前重新设置本次调用的会话作用域
+                token = object()
+                iterator = behavior(request_or_iterator, context)
+                try:
+                    while True:
+                        previous = sessions.activate(token)
+                        try:
+                            response = next(iterator)
+                        except StopIteration:
+                            break
+                        finally:
+                            sessions.deactivate(previous)
+                        yield response
+                except Exception as e:
+                    fail(context, e)
+                finally:
+                    previous = sessions.activate(token)
+                    try:
+                        iterator.close()
+                    finally:
+                        sessions.release(previous)
+                        leave()
+                if started is not None:
+                    logger.info("gRPC call completed: %s (%.1f ms)", method, (time.perf_counter() - started) * 1000)
+            return wrapper
+
+        return wrap_unary_response, wrap_stream_response
+
+    def _async_wrappers(self, method):
+        """协程方法的包装"""
+        limiter = self.limiter if method in self.limiter.limits else None
+        sampled = self._sampler()
+
+        async def enter(context):
+            if limiter is not None and not limiter.try_acquire(method):
+                await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, limiter.rejection_message(method))
+            if sampled():
+                logger.info("gRPC call started: %s", method)
+                return time.perf_counter()
+            return None
+
+        def wrap_unary_response(behavior):
+            async def wrapper(request_or_iterator, context):
+                started = await enter(context)
+                try:
+                    response = await behavior(request_or_iterator, context)
+                finally:
+                    if limiter is not None:
+                        limiter.release(method)
+                if started is not None:
+                    logger.info("gRPC call completed: %s (%.1f ms)", method, (time.perf_counter() - started) * 1000)
+                return response
+            return wrapper
+
+        def wrap_stream_response(behavior):
+            async def wrapper(request_or_iterator, context):
+                started = await enter(context)
+                try:
+                    async for response in behavior(request_or_iterator, context):
+                        yield response
+                finally:
+                    if limiter is not None:
+                        limiter.release(method)
+                if started is not None:
+                    logger.info("gRPC call completed: %s (%.1f ms)", method, (time.perf_counter() - started) * 1000)
+            return wrapper
+
+        return wrap_unary_response, wrap_stream_response
+
+
+class AioFusedInterceptor(grpc.aio.ServerInterceptor):
+    """
+    合并的服务端拦截器（grpc.aio服务器使用）
+    同步的流式响应方法改为协程生成器，在executor中逐条执行（见run_stream_in_executor），
+    客户端取消后能停止生成并释放资源；其余同步方法仍由grpc.aio在线程池中执行
+
+    Args:
+        executor: 执行同步流式方法的线程池（与服务器的migration_thread_pool相同）
+    """
+
+    def __init__(self, sessions, limits: dict, log_sample_rate: float = 1.0, executor=None):
+        self._interceptor = FusedInterceptor(sessions, limits, log_sample_rate)
+        self.executor = executor or futures.ThreadPoolExecutor()
+        # {方法全名: (同步处理器, 协程处理器)}
+        self._handlers = {}
+
+    @property
+    def limiter(self) -> MethodConcurrencyLimiter:
+        return self._interceptor.limiter
+
+    async def intercept_service(self, continuation, handler_call_details):
+        """拦截服务调用"""
+        method_handler = await continuation(handler_call_details)
+        if method_handler is None:
+            return None
+        wrapped = self._interceptor.wrapped_handler(handler_call_details, method_handler)
+        if not wrapped.unary_stream or is_async_handler(wrapped):
+            return wrapped
+
+        method = handler_call_details.method
+        cached = self._handlers.get(method)
+        if cached is not None and cached[0] is wrapped:
+            return cached[1]
+        bridged = grpc.unary_stream_rpc_method_handler(
+            run_stream_in_executor(wrapped.unary_stream, self.executor),
+            request_deserializer=wrapped.request_deserializer,
+            response_serializer=wrapped.response_serializer
+        )
+        self._handlers[method] = (wrapped, bridged)
+        return bridged
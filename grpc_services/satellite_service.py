@@ -4,6 +4,7 @@ gRPC卫星服务实现
 import sys
 import os
 import json
+import itertools
 
 from google.protobuf.json_format import MessageToDict
 from openai.types.fine_tuning import ReinforcementMethod
@@ -17,8 +18,32 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from grpc_generated import satellite_pb2, satellite_pb2_grpc, common_pb2
 from dal.satellite_dal import SatelliteDAL, LinkedSatelliteDAL
 from dal.constellation_dal import ConstellationDAL
-from history.model import LinkedSatelliteModel
+from dal.import_staging_dal import ImportStagingDAL
+from orbit.propagator import PackedConstellation, build_time_grid, count_epochs, iter_time_chunks
+from orbit.tle import tle_cache
+from orbit.feasibility import DEFAULT_CLEARANCE_KM, link_feasibility, pack_bitsets
+from orbit.discovery import discover_links
+from orbit.routing import (
+    shortest_hop_path, shortest_weighted_path, node_positions, distance_to_latency_ms
+)
 import grpc
+import numpy as np
+
+# 单次一元传播调用允许的 卫星数×时刻数 上限：每个点含位置、速度6个double（约50字节），
+# 70000点约3.5MB，低于gRPC默认4MB的接收上限
+MAX_PROPAGATION_POINTS = 70000
+
+# 流式星历：默认每块时刻数，以及每块 卫星数×时刻数 的上限（与MAX_PROPAGATION_POINTS相同，每块约3.5MB）
+DEFAULT_EPOCHS_PER_CHUNK = 60
+MAX_CHUNK_POINTS = 70000
+
+# 单次链路可用性计算允许的 链接数×时刻数 上限（1位/点，约2.5MB响应）
+MAX_FEASIBILITY_POINTS = 20000000
+# 单次链路可用性计算允许的时刻数上限（响应中的时刻列表约0.5MB；星座没有链接时同样生效）
+MAX_FEASIBILITY_EPOCHS = 100000
+
+# 候选链路发现：每颗卫星链路数上限
+MAX_DISCOVERY_NEIGHBORS = 32
 
 
 class SatelliteService(satellite_pb2_grpc.SatelliteServiceServicer):
@@ -170,11 +195,7 @@ class SatelliteService(satellite_pb2_grpc.SatelliteServiceServicer):
             self._verify_constellation_ownership(satellite.constellation_id, user_id, context)
 
             # 获取关联
-            links_from = SatelliteDAL.get_links_from(
-                satellite.satellite_id,
-                satellite.constellation_id
-            )
-            links_to = SatelliteDAL.get_links_to(
+            links_from, links_to = SatelliteDAL.get_links(
                 satellite.satellite_id,
                 satellite.constellation_id
             )
@@ -523,18 +544,74 @@ class SatelliteService(satellite_pb2_grpc.SatelliteServiceServicer):
         except Exception as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
 
+    @staticmethod
+    def _stage_links_bulk(import_id, requests):
+        """
+        批量模式：链接写入暂存表
+
+        每个卫星对规范化为 (小ID, 大ID)，只在当前批次内去重；跨批次的重复、
+        与已有链接的重复以及不存在的卫星都在转入时由集合查询和唯一约束处理
+
+        Returns:
+            (收到的链接数, 自环数, 错误信息, 最后写入的记录序号)
+        """
+        errors = []
+        received = 0
+        self_links = 0
+        checkpoint = 0
+        batch_pairs = set()
+        inserter = ImportStagingDAL.link_inserter()
+
+        for request in requests:
+            received += 1
+            sat1_id = request.satellite_id1
+            sat2_id = request.satellite_id2
+            if sat1_id == sat2_id:
+                self_links += 1
+                if len(errors) < 10:
+                    errors.append(f"Cannot link satellite {sat1_id} to itself")
+                continue
+
+            pair = (min(sat1_id, sat2_id), max(sat1_id, sat2_id))
+            if pair in batch_pairs:
+                continue
+            sent = inserter.sent
+            inserter.add({
+                "import_id": import_id,
+                "shard": request.shard,
+                "sequence": request.sequence,
+                "satellite_id1": pair[0],
+                "satellite_id2": pair[1]
+            })
+            checkpoint = request.sequence
+            # 写入器刷新了上一批时，去重集合只保留当前批次
+            if inserter.sent != sent:
+                batch_pairs.clear()
+            batch_pairs.add(pair)
+
+        inserter.close()
+        return received, self_links, errors, checkpoint
+
     def ImportLinks(self, request_iterator, context):
-        """批量导入卫星关联（客户端流式传输）"""
+        """
+        批量导入卫星关联（客户端流式传输，先写入暂存表，流结束后一次性转入，全部成功或全部不生效）
+
+        首条消息带import_id时为会话模式：按批量模式只写入该会话的暂存表，由ConstellationService.CommitImport
+        统一转入；流中断时已写入的批次保留，客户端可按断点续传
+        """
+        import_id = None
+        session = False
         try:
             user_id = None
             constellation_id = None
             success_count = 0
             fail_count = 0
             errors = []
-            existing_links = set()
-            batch = []
-            BATCH_SIZE = 100
+            graph = None
+            new_links = set()
+            inserter = None
             satellite_map = {}
+            checkpoint = 0
 
             for request in request_iterator:
                 # 第一次请求时验证token和constellation
@@ -545,8 +622,36 @@ class SatelliteService(satellite_pb2_grpc.SatelliteServiceServicer):
                     # 验证星座是否存在且属于当前用户
                     self._verify_constellation_ownership(constellation_id, user_id, context)
 
-                    # 获取已存在的关联
-                    existing_links = LinkedSatelliteDAL.get_existing_links(constellation_id)
+                    # 会话模式：只写入暂存表，重复和卫星不存在的链接在提交会话时跳过
+                    if request.import_id:
+                        if not ImportStagingDAL.session_exists(request.import_id, constellation_id, user_id):
+                            context.abort(grpc.StatusCode.NOT_FOUND, "Import session not found")
+                        session = True
+                        import_id = request.import_id
+                        received, self_links, errors, checkpoint = self._stage_links_bulk(
+                            import_id, itertools.chain([request], request_iterator)
+                        )
+                        success_count = received - self_links
+                        fail_count = self_links
+                        break
+
+                    import_id = ImportStagingDAL.begin_import()
+
+                    # 批量模式：首条消息和剩余的流一起写入暂存表，去重交给转入时的集合查询
+                    if request.bulk:
+                        received, self_links, errors, _ = self._stage_links_bulk(
+                            import_id, itertools.chain([request], request_iterator)
+                        )
+                        success_count = ImportStagingDAL.promote_links(import_id, constellation_id)
+                        import_id = None
+                        fail_count = received - success_count
+                        if fail_count > self_links:
+                            errors.append(f"{fail_count - self_links} links skipped (duplicate or satellite not found)")
+                        break
+
+                    # 已存在的关联从链路图索引中查询，本次新增的关联按 (小ID, 大ID) 记录
+                    graph = LinkedSatelliteDAL.get_graph(constellation_id)
+                    inserter = ImportStagingDAL.link_inserter()
 
                     # 获取该星座下所有卫星ID
                     satellites = SatelliteDAL.get_by_constellation(constellation_id)
@@ -575,37 +680,327 @@ class SatelliteService(satellite_pb2_grpc.SatelliteServiceServicer):
                     continue
 
                 # 检查关联是否已存在
-                if (sat1_id, sat2_id) in existing_links:
+                pair = (min(sat1_id, sat2_id), max(sat1_id, sat2_id))
+                if pair in new_links or graph.has_link(sat1_id, sat2_id):
                     errors.append(f"Link {sat1_id}-{sat2_id} already exists")
                     fail_count += 1
                     continue
 
-                # 创建关联对象
-                link = LinkedSatelliteModel(
-                    satellite_id1=sat1_id,
-                    satellite_id2=sat2_id,
-                    constellation_id=constellation_id
-                )
-                batch.append(link)
-                existing_links.add((sat1_id, sat2_id))
-                existing_links.add((sat2_id, sat1_id))
+                # 写入暂存表（批次达到预算时自动写入）
+                inserter.add({
+                    "import_id": import_id,
+                    "shard": request.shard,
+                    "sequence": request.sequence,
+                    "satellite_id1": sat1_id,
+                    "satellite_id2": sat2_id
+                })
+                new_links.add(pair)
                 success_count += 1
 
-                # 批次提交
-                if len(batch) >= BATCH_SIZE:
-                    LinkedSatelliteDAL.batch_create(batch)
-                    batch = []
+            # 写入最后一批，然后在一个事务内转入linked_satellite表
+            if inserter:
+                inserter.close()
+                promoted = ImportStagingDAL.promote_links(import_id, constellation_id)
+                import_id = None
 
-            # 提交最后一批
-            if batch:
-                LinkedSatelliteDAL.batch_create(batch)
+                # 暂存期间被并发创建的链接或删除的卫星会在转入时跳过
+                if promoted < success_count:
+                    errors.append(f"{success_count - promoted} links were changed concurrently and skipped")
+                    fail_count += success_count - promoted
+                    success_count = promoted
 
             return satellite_pb2.ImportLinksResponse(
                 status=common_pb2.Status(code=200, message="Success"),
                 success_count=success_count,
                 fail_count=fail_count,
-                errors=errors[:10]  # 只返回前10个错误
+                errors=errors[:10],  # 只返回前10个错误
+                checkpoint=checkpoint
+            )
+
+        except Exception as e:
+            # 导入未完成时丢弃暂存数据，正式表不受影响；会话模式保留已写入的批次用于续传
+            if import_id and not session:
+                ImportStagingDAL.discard(import_id)
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def PropagateConstellation(self, request, context):
+        """批量传播星座轨道（整个星座在时间网格上一次向量化计算）"""
+        try:
+            user_id = self._verify_user_id(request.user_id, context)
+
+            # 验证星座所有权
+            self._verify_constellation_ownership(request.constellation_id, user_id, context)
+
+            # 先计算时刻数并检查规模，再构建时间网格
+            window = request.window
+            try:
+                n_epochs = count_epochs(window.start_time, window.end_time, window.step_seconds)
+            except ValueError as e:
+                return satellite_pb2.PropagateConstellationResponse(
+                    status=common_pb2.Status(code=400, message=f"Invalid time window: {str(e)}")
+                )
+
+            # 一次性读取TLE并打包
+            rows = SatelliteDAL.get_tle_rows(request.constellation_id, list(request.satellite_ids))
+            packed = PackedConstellation.from_tle_rows(rows)
+
+            # 没有卫星时按1颗计算，时刻数本身也受上限约束
+            if max(len(packed), 1) * n_epochs > MAX_PROPAGATION_POINTS:
+                return satellite_pb2.PropagateConstellationResponse(
+                    status=common_pb2.Status(
+                        code=400,
+                        message=f"Too many points ({len(packed)} satellites x {n_epochs} epochs), "
+                                f"limit is {MAX_PROPAGATION_POINTS}"
+                    )
+                )
+
+            times = build_time_grid(window.start_time, window.end_time, window.step_seconds)
+            errors, positions, velocities = packed.propagate(times)
+
+            return satellite_pb2.PropagateConstellationResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                satellite_ids=packed.satellite_ids.tolist(),
+                epochs=times.tolist(),
+                positions=positions.ravel().tolist(),
+                velocities=velocities.ravel().tolist(),
+                error_codes=errors.ravel().tolist(),
+                errors=packed.errors[:10]  # 只返回前10个错误
+            )
+
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def StreamEphemeris(self, request, context):
+        """流式获取星座星历（按时间分块传播并发送，内存占用与窗口长度无关）"""
+        try:
+            user_id = self._verify_user_id(request.user_id, context)
+
+            # 验证星座所有权
+            self._verify_constellation_ownership(request.constellation_id, user_id, context)
+
+            window = request.window
+            if window.step_seconds <= 0 or window.end_time < window.start_time:
+                yield satellite_pb2.EphemerisChunk(
+                    status=common_pb2.Status(code=400, message="Invalid time window")
+                )
+                return
+
+            rows = SatelliteDAL.get_tle_rows(request.constellation_id, list(request.satellite_ids))
+            packed = PackedConstellation.from_tle_rows(rows)
+
+            # 每块大小受限于 卫星数×时刻数 上限
+            epochs_per_chunk = request.epochs_per_chunk or DEFAULT_EPOCHS_PER_CHUNK
+            epochs_per_chunk = max(1, min(epochs_per_chunk, MAX_CHUNK_POINTS // max(len(packed), 1)))
+
+            chunks = iter_time_chunks(
+                window.start_time,
+                window.end_time,
+                window.step_seconds,
+                epochs_per_chunk
             )
+            for chunk_index, times in enumerate(chunks):
+                # 客户端取消时停止计算
+                if not context.is_active():
+                    return
+
+                errors, positions, velocities = packed.propagate(times)
+                chunk = satellite_pb2.EphemerisChunk(
+                    status=common_pb2.Status(code=200, message="Success"),
+                    chunk_index=chunk_index,
+                    epochs=times.tolist(),
+                    positions=positions.ravel().tolist(),
+                    velocities=velocities.ravel().tolist(),
+                    error_codes=errors.ravel().tolist()
+                )
+                if chunk_index == 0:
+                    chunk.satellite_ids.extend(packed.satellite_ids.tolist())
+                    chunk.errors.extend(packed.errors[:10])  # 只返回前10个错误
+                yield chunk
+
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def GetTLECacheStats(self, request, context):
+        """获取TLE解析缓存统计（用于确定缓存容量）"""
+        try:
+            self._verify_user_id(request.user_id, context)
+
+            return satellite_pb2.GetTLECacheStatsResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                **tle_cache.stats()
+            )
+
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def FindRoute(self, request, context):
+        """计算两颗卫星之间的路由（在缓存的链路图上搜索，不走递归SQL）"""
+        try:
+            user_id = self._verify_user_id(request.user_id, context)
+
+            # 验证星座所有权
+            self._verify_constellation_ownership(request.constellation_id, user_id, context)
+
+            source = request.source_satellite_id
+            target = request.target_satellite_id
+            graph = LinkedSatelliteDAL.get_graph(request.constellation_id)
+
+            for satellite_id in (source, target):
+                if graph.node_index(satellite_id) is None:
+                    return satellite_pb2.FindRouteResponse(
+                        status=common_pb2.Status(
+                            code=404,
+                            message=f"Satellite {satellite_id} has no links in this constellation"
+                        )
+                    )
+
+            # 最短跳数路径
+            hop_path = shortest_hop_path(graph, source, target)
+            if hop_path is None:
+                return satellite_pb2.FindRouteResponse(
+                    status=common_pb2.Status(code=404, message="No route between satellites")
+                )
+
+            response = satellite_pb2.FindRouteResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                hop_path=hop_path,
+                hop_count=len(hop_path) - 1
+            )
+
+            # 指定时刻时，按传播后的星间距离计算最短时延路径
+            if request.HasField('time'):
+                packed = PackedConstellation.from_tle_rows(
+                    SatelliteDAL.get_tle_rows(request.constellation_id)
+                )
+                positions = node_positions(graph, packed, request.time)
+                result = shortest_weighted_path(graph, source, target, positions)
+                if result is None:
+                    response.status.message = "Success (no latency route: missing satellite positions)"
+                else:
+                    latency_path, distance_km = result
+                    response.latency_path.extend(latency_path)
+                    response.distance_km = distance_km
+                    response.latency_ms = distance_to_latency_ms(distance_km)
+
+            return response
+
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def EvaluateLinkFeasibility(self, request, context):
+        """计算星座所有链接在时间网格上的可用性（所有链接、所有时刻一次向量化计算）"""
+        try:
+            user_id = self._verify_user_id(request.user_id, context)
+
+            # 验证星座所有权
+            self._verify_constellation_ownership(request.constellation_id, user_id, context)
+
+            # 先计算时刻数并检查规模，再构建时间网格
+            window = request.window
+            try:
+                n_epochs = count_epochs(window.start_time, window.end_time, window.step_seconds)
+            except ValueError as e:
+                return satellite_pb2.EvaluateLinkFeasibilityResponse(
+                    status=common_pb2.Status(code=400, message=f"Invalid time window: {str(e)}")
+                )
+
+            if request.max_range_km < 0:
+                return satellite_pb2.EvaluateLinkFeasibilityResponse(
+                    status=common_pb2.Status(code=400, message="max_range_km cannot be negative")
+                )
+
+            if n_epochs > MAX_FEASIBILITY_EPOCHS:
+                return satellite_pb2.EvaluateLinkFeasibilityResponse(
+                    status=common_pb2.Status(
+                        code=400,
+                        message=f"Too many epochs ({n_epochs}), limit is {MAX_FEASIBILITY_EPOCHS}"
+                    )
+                )
+
+            graph = LinkedSatelliteDAL.get_graph(request.constellation_id)
+            if graph.link_count * n_epochs > MAX_FEASIBILITY_POINTS:
+                return satellite_pb2.EvaluateLinkFeasibilityResponse(
+                    status=common_pb2.Status(
+                        code=400,
+                        message=f"Too many points ({graph.link_count} links x {n_epochs} epochs), "
+                                f"limit is {MAX_FEASIBILITY_POINTS}"
+                    )
+                )
+
+            times = build_time_grid(window.start_time, window.end_time, window.step_seconds)
+            packed = PackedConstellation.from_tle_rows(SatelliteDAL.get_tle_rows(request.constellation_id))
+            feasible = link_feasibility(
+                graph,
+                packed,
+                window.start_time,
+                window.end_time,
+                window.step_seconds,
+                max_range_km=request.max_range_km or None,
+                clearance_km=request.clearance_km if request.HasField('clearance_km') else DEFAULT_CLEARANCE_KM
+            )
+
+            link_ids, src, dst = graph.link_order()
+            return satellite_pb2.EvaluateLinkFeasibilityResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                link_ids=link_ids.tolist(),
+                satellite_id1=graph.node_ids[src].tolist(),
+                satellite_id2=graph.node_ids[dst].tolist(),
+                epochs=times.tolist(),
+                bitsets=[row.tobytes() for row in pack_bitsets(feasible)],
+                feasible_counts=np.count_nonzero(feasible, axis=1).tolist(),
+                errors=packed.errors[:10]  # 只返回前10个错误
+            )
+
+        except Exception as e:
+            context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
+
+    def DiscoverLinks(self, request, context):
+        """发现候选星间链路（KD树近邻查询，每颗卫星最多K条）"""
+        try:
+            user_id = self._verify_user_id(request.user_id, context)
+
+            # 验证星座所有权
+            self._verify_constellation_ownership(request.constellation_id, user_id, context)
+
+            if request.max_range_km <= 0:
+                return satellite_pb2.DiscoverLinksResponse(
+                    status=common_pb2.Status(code=400, message="max_range_km must be positive")
+                )
+            if not 0 < request.max_neighbors <= MAX_DISCOVERY_NEIGHBORS:
+                return satellite_pb2.DiscoverLinksResponse(
+                    status=common_pb2.Status(
+                        code=400,
+                        message=f"max_neighbors must be between 1 and {MAX_DISCOVERY_NEIGHBORS}"
+                    )
+                )
+
+            packed = PackedConstellation.from_tle_rows(SatelliteDAL.get_tle_rows(request.constellation_id))
+            candidates = discover_links(
+                packed,
+                request.time,
+                request.max_range_km,
+                request.max_neighbors,
+                clearance_km=request.clearance_km if request.HasField('clearance_km') else DEFAULT_CLEARANCE_KM
+            )
+
+            response = satellite_pb2.DiscoverLinksResponse(
+                status=common_pb2.Status(code=200, message="Success"),
+                satellite_id1=candidates.satellite_id1.tolist(),
+                satellite_id2=candidates.satellite_id2.tolist(),
+                distances_km=candidates.distance_km.tolist(),
+                errors=packed.errors[:10]  # 只返回前10个错误
+            )
+
+            if request.insert and len(candidates.satellite_id1):
+                inserted, skipped = LinkedSatelliteDAL.bulk_create_pairs(
+                    request.constellation_id,
+                    candidates.satellite_id1,
+                    candidates.satellite_id2
+                )
+                response.inserted_count = inserted
+                response.skipped_count = skipped
+
+            return response
 
         except Exception as e:
             context.abort(grpc.StatusCode.INTERNAL, f"Internal error: {str(e)}")
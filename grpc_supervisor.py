@@ -0,0 +1,228 @@
+"""
+gRPC多进程服务器（监督进程）
+Python gRPC服务器受GIL限制，导出、轨道传播、缓存JSON解码等CPU密集的调用在单进程内无法利用多核。
+监督进程fork出N个工作进程，各自创建Flask应用（数据库引擎）和服务器，通过SO_REUSEPORT绑定同一端口，
+由内核把连接分配到各进程；监督进程负责：
+- 汇总各工作进程的心跳（pid、线程数、内存、CPU时间），定期输出并可写入状态文件
+- 工作进程退出或心跳超时时重启（连续崩溃时退避）
+- 收到SIGTERM/SIGINT时把SIGTERM转发给所有工作进程，等待其平滑停止
+仅支持提供SO_REUSEPORT的系统（Linux等）
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import resource
+import signal
+import socket
+import threading
+import time
+
+import grpc_server
+
+logger = logging.getLogger(__name__)
+
+# 工作进程心跳间隔（秒）
+HEARTBEAT_INTERVAL = 5
+# 超过该时间没有心跳的工作进程视为无响应，强制重启（秒）
+HEARTBEAT_TIMEOUT = 30
+# 监督进程输出健康状态的间隔（秒）
+REPORT_INTERVAL = 60
+# 工作进程重启的退避时间（秒）：连续快速崩溃时翻倍，直到上限
+RESTART_BACKOFF_MIN = 1
+RESTART_BACKOFF_MAX = 30
+# 工作进程运行超过该时间后退出视为偶发，退避时间重置（秒）
+STABLE_UPTIME = 60
+
+
+def _heartbeat(slot, reports, interval):
+    """工作进程内的心跳线程：定期上报进程状态"""
+    while True:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        reports.put({
+            'slot': slot,
+            'pid': os.getpid(),
+            'time': time.time(),
+            'threads': threading.active_count(),
+            'max_rss_mb': round(usage.ru_maxrss / 1024, 1),
+            'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 1),
+        })
+        time.sleep(interval)
+
+
+def _worker_main(slot, port, aio, grace, reports):
+    """工作进程入口：fork之后才创建Flask应用、数据库引擎和gRPC服务器"""
+    # Ctrl+C发给整个进程组，由监督进程统一转发SIGTERM，工作进程自身忽略SIGINT；
+    # SIGTERM恢复默认处理（fork继承了监督进程的处理函数），服务器启动后再注册平滑停止
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    threading.Thread(target=_heartbeat, args=(slot, reports, HEARTBEAT_INTERVAL), daemon=True).start()
+
+    if aio:
+        asyncio.run(grpc_server.serve_aio(port, reuse_port=True, grace=grace))
+    else:
+        grpc_server.serve(port, reuse_port=True, grace=grace)
+
+
+class _Worker:
+    """监督进程记录的工作进程状态"""
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.process = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.backoff = RESTART_BACKOFF_MIN
+        self.restart_at = 0.0
+        self.health = {}
+
+    def to_dict(self, now) -> dict:
+        last = self.health.get('time')
+        return {
+            'slot': self.slot,
+            'pid': self.process.pid if self.process else None,
+            'alive': bool(self.process and self.process.is_alive()),
+            'restarts': self.restarts,
+            'uptime_seconds': round(now - self.started_at, 1) if self.started_at else None,
+            'heartbeat_age_seconds': round(now - last, 1) if last else None,
+            'threads': self.health.get('threads'),
+            'max_rss_mb': self.health.get('max_rss_mb'),
+            'cpu_seconds': self.health.get('cpu_seconds'),
+        }
+
+
+class Supervisor:
+    """
+    多进程gRPC服务器的监督进程
+
+    Args:
+        port: 监听端口（所有工作进程共用）
+        processes: 工作进程数
+        aio: 工作进程使用asyncio服务器
+        grace: 平滑停止时等待进行中调用的最长时间（秒）
+        status_file: 可选，定期写入各工作进程健康状态（JSON）的文件路径
+    """
+
+    def __init__(self, port, processes, aio=False, grace=grpc_server.DEFAULT_SHUTDOWN_GRACE, status_file=None):
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError("当前系统不支持SO_REUSEPORT，无法以多进程模式运行")
+        self.port = port
+        self.aio = aio
+        self.grace = grace
+        self.status_file = status_file
+        self.workers = [_Worker(slot) for slot in range(processes)]
+        # gRPC要求服务器在fork之后创建；监督进程自身不创建任何gRPC对象
+        self._context = multiprocessing.get_context('fork')
+        self._reports = self._context.Queue()
+        self._stopping = threading.Event()
+
+    def _spawn(self, worker):
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(worker.slot, self.port, self.aio, self.grace, self._reports),
+            name=f"grpc-worker-{worker.slot}",
+            daemon=False
+        )
+        worker.process.start()
+        worker.started_at = time.time()
+        worker.health = {}
+        logger.info(f"[OK] Worker {worker.slot} started (pid {worker.process.pid})")
+
+    def _collect_reports(self, timeout):
+        """读取心跳，忽略已被替换的旧进程的心跳"""
+        deadline = time.time() + timeout
+        while True:
+            try:
+                report = self._reports.get(timeout=max(deadline - time.time(), 0))
+            except queue.Empty:
+                return
+            worker = self.workers[report['slot']]
+            if worker.process and worker.process.pid == report['pid']:
+                worker.health = report
+
+    def _check_workers(self, now):
+        """重启已退出或心跳超时的工作进程"""
+        for worker in self.workers:
+            process = worker.process
+            if process.is_alive():
+                last = worker.health.get('time', worker.started_at)
+                if now - last <= HEARTBEAT_TIMEOUT:
+                    continue
+                logger.error(f"Worker {worker.slot} (pid {process.pid}) missed heartbeats for {now - last:.0f}s, killing")
+                process.kill()
+                process.join()
+
+            if not worker.restart_at:
+                logger.error(f"Worker {worker.slot} (pid {process.pid}) exited with code {process.exitcode}")
+                # 运行较久后退出视为偶发，立即重启；连续快速崩溃时退避
+                if now - worker.started_at >= STABLE_UPTIME:
+                    worker.backoff = RESTART_BACKOFF_MIN
+                worker.restart_at = now + worker.backoff
+                worker.backoff = min(worker.backoff * 2, RESTART_BACKOFF_MAX)
+
+            if now >= worker.restart_at:
+                worker.restart_at = 0.0
+                worker.restarts += 1
+                self._spawn(worker)
+
+    def _report_health(self, now):
+        status = {
+            'supervisor_pid': os.getpid(),
+            'port': self.port,
+            'time': now,
+            'workers': [worker.to_dict(now) for worker in self.workers],
+        }
+        alive = sum(1 for item in status['workers'] if item['alive'])
+        logger.info(f"Workers alive: {alive}/{len(self.workers)} - " + ", ".join(
+            f"#{item['slot']} pid={item['pid']} rss={item['max_rss_mb']}MB cpu={item['cpu_seconds']}s "
+            f"restarts={item['restarts']}"
+            for item in status['workers']
+        ))
+        if self.status_file:
+            temp_path = f"{self.status_file}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(status, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.status_file)
+
+    def _shutdown(self):
+        """向所有工作进程发送SIGTERM，等待平滑停止，超时后强制结束"""
+        logger.info("Stopping workers...")
+        for worker in self.workers:
+            if worker.process and worker.process.is_alive():
+                worker.process.terminate()
+
+        deadline = time.time() + self.grace + 5
+        for worker in self.workers:
+            if worker.process:
+                worker.process.join(max(deadline - time.time(), 0))
+                if worker.process.is_alive():
+                    logger.error(f"Worker {worker.slot} (pid {worker.process.pid}) did not stop in time, killing")
+                    worker.process.kill()
+                    worker.process.join()
+        logger.info("[OK] All workers stopped")
+
+    def run(self):
+        """启动工作进程并监督，直到收到SIGTERM或SIGINT"""
+        def stop(signum, frame):
+            self._stopping.set()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        logger.info(f"Starting {len(self.workers)} gRPC worker processes on port {self.port}...")
+        for worker in self.workers:
+            self._spawn(worker)
+
+        # 首次在各进程上报心跳后输出，之后每REPORT_INTERVAL输出一次
+        next_report = time.time() + HEARTBEAT_INTERVAL + 1
+        try:
+            while not self._stopping.is_set():
+                self._collect_reports(timeout=1)
+                now = time.time()
+                self._check_workers(now)
+                if now >= next_report:
+                    self._report_health(now)
+                    next_report = now + REPORT_INTERVAL
+        finally:
+            self._shutdown()
@@ -2,6 +2,7 @@ from flask import Blueprint, request, render_template, redirect, url_for, g
 from history.exts import db
 from history.model import BaseModel
 from history.decorators import login_required
+from dal.base_dal import BaseDAL
 
 bp = Blueprint("base", __name__, url_prefix="/bases")
 
@@ -39,14 +40,8 @@ def add():
         if BaseModel.query.filter_by(base_name=name, user_id=g.user.id).first():
             return render_template('base/form.html', error="该基座名称已存在")
 
-        # 创建基座
-        base = BaseModel(
-            base_name=name,
-            info=info,
-            user_id=g.user.id
-        )
-        db.session.add(base)
-        db.session.commit()
+        # 创建基座（info中含位置时同时写入结构化位置）
+        BaseDAL.create(name, info, g.user.id)
         return redirect(url_for('base.list'))
 
     return render_template('base/form.html')
@@ -72,10 +67,8 @@ def edit(id):
                 name != base.base_name):
             return render_template('base/form.html', base=base, error="该基座名称已存在")
 
-        # 更新基座
-        base.base_name = name
-        base.info = info
-        db.session.commit()
+        # 更新基座（info中含位置时同时更新结构化位置）
+        BaseDAL.update(base, name, info)
         return redirect(url_for('base.detail', id=id))
 
     return render_template('base/form.html', base=base)
@@ -1,19 +1,18 @@
 from flask import Blueprint, request, render_template, redirect, url_for, g, flash
 from history.exts import db
-from history.model import ConstellationModel, SatelliteModel, LinkedSatelliteModel
+from history.model import ConstellationModel, SatelliteModel
 from history.decorators import login_required
+from dal.import_staging_dal import ImportStagingDAL
+from dal.export_stream import ExportDAL
+from dal.export_cache import export_cache
 import re
 from sqlalchemy import select
 import chardet
-import io
-from flask import make_response
-from zipfile import ZipFile, ZIP_DEFLATED
+import time
+from flask import Response, stream_with_context
 
 bp = Blueprint("constellation", __name__, url_prefix="/constellations")
 
-# 配置：每批提交的卫星数量（根据服务器性能调整，建议50-200）
-BATCH_SIZE = 100
-
 
 @bp.route("/import/<int:constellation_id>", methods=["GET", "POST"])
 @login_required
@@ -53,68 +52,61 @@ def import_satellites(constellation_id):
         success_count = 0
         fail_count = 0
         fail_reasons = []
-        batch = []
         lines = []
 
-        # 逐行读取并处理
-        for line_num, line in enumerate(file.stream, 1):
-            line_str = line.decode(detected_encoding, errors="replace").strip()
-            if not line_str:
-                continue
-            lines.append((line_num, line_str))
-
-            # 每3行解析一个卫星
-            if len(lines) == 3:
-                (num1, line1), (num2, line2), (num3, line3) = lines
-                try:
-                    match = re.search(r"\s+(\d+)$", line1)
-                    if not match:
-                        raise ValueError("未找到卫星ID（格式应为：星座名称 数字ID）")
-                    satellite_id = int(match.group(1))  # 转换为整数
-
-                    # 校验唯一性
-                    if satellite_id in existing_satellite_ids:
-                        raise ValueError(f"卫星ID {satellite_id} 已存在")
-
-                    # 创建卫星对象（移除不存在的user_id字段）
-                    new_satellite = SatelliteModel(
-                        satellite_id=satellite_id,
-                        constellation_id=constellation_id,
-                        info_line1=line2,
-                        info_line2=line3
-                    )
-                    batch.append(new_satellite)
+        # 解析结果先写入暂存表，全部读完后一次性转入（导入全部成功或全部不生效）
+        import_id = ImportStagingDAL.begin_import()
+        inserter = ImportStagingDAL.satellite_inserter()
+
+        try:
+            for line_num, line in enumerate(file.stream, 1):
+                line_str = line.decode(detected_encoding, errors="replace").strip()
+                if not line_str:
+                    continue
+                lines.append((line_num, line_str))
+
+                # 每3行解析一个卫星
+                if len(lines) == 3:
+                    (num1, line1), (num2, line2), (num3, line3) = lines
+                    try:
+                        match = re.search(r"\s+(\d+)$", line1)
+                        if not match:
+                            raise ValueError("未找到卫星ID（格式应为：星座名称 数字ID）")
+                        satellite_id = int(match.group(1))  # 转换为整数
+
+                        # 校验唯一性
+                        if satellite_id in existing_satellite_ids:
+                            raise ValueError(f"卫星ID {satellite_id} 已存在")
+                    except ValueError as e:
+                        fail_reasons.append(f"行{num1}-{num3}：{str(e)}")
+                        fail_count += 1
+                        continue
+                    finally:
+                        lines = []
+
+                    # 写入暂存表（批次达到预算时自动写入）
+                    inserter.add({
+                        "import_id": import_id,
+                        "satellite_id": satellite_id,
+                        "info_line1": line2,
+                        "info_line2": line3,
+                        "ext_info": {}
+                    })
                     existing_satellite_ids.add(satellite_id)
                     success_count += 1
 
-                    # 批次提交
-                    if len(batch) >= BATCH_SIZE:
-                        db.session.add_all(batch)
-                        db.session.commit()
-                        batch = []
-                        db.session.expire_all()
-
-                except Exception as e:
-                    fail_reasons.append(f"行{num1}-{num3}：{str(e)}")
-                    fail_count += 1
-                finally:
-                    lines = []
-
-        # 处理最后一批
-        if batch:
-            try:
-                db.session.add_all(batch)
-                db.session.commit()
-            except Exception as e:
-                db.session.rollback()
-                fail_reasons.append(f"最后批次提交失败：{str(e)}")
-                success_count -= len(batch)
-                fail_count += len(batch)
-
-        # 更新星座的卫星数量（直接计算当前实际数量）
-        actual_count = SatelliteModel.query.filter_by(constellation_id=constellation_id).count()
-        constellation.satellite_count = actual_count
-        db.session.commit()
+            inserter.close()
+            promoted = ImportStagingDAL.promote_satellites(import_id, constellation_id)
+        except Exception as e:
+            ImportStagingDAL.discard(import_id)
+            flash(f"导入失败，未写入任何数据：{str(e)}", "danger")
+            return redirect(request.url)
+
+        # 暂存期间被并发写入的卫星ID会在转入时跳过
+        if promoted < success_count:
+            fail_reasons.append(f"{success_count - promoted}个卫星ID在导入期间已被创建，已跳过")
+            fail_count += success_count - promoted
+            success_count = promoted
 
         # 显示结果
         flash(f"导入完成：成功{success_count}个，失败{fail_count}个", "success")
@@ -142,24 +134,25 @@ def export():
             flash("请至少选择一个星座", "warning")
             return render_template('constellation/export.html', constellations=constellations)
 
-        selected_constellations = ConstellationModel.query.filter(
-            ConstellationModel.id.in_(selected_ids),
-            ConstellationModel.user_id == g.user.id
-        ).all()
-
-        # 生成TLE和ISL数据
-        tles_content, isls_content, satellites_count = generate_export_data(selected_constellations)
-
-        # 创建ZIP文件
-        memory_file = io.BytesIO()
-        with ZipFile(memory_file, 'w', ZIP_DEFLATED) as zipf:
-            zipf.writestr('tles.txt', tles_content)
-            zipf.writestr('isls.txt', isls_content)
+        # 选中的星座、卫星数和ID偏移量用集合查询一次算出（与gRPC导出共用）
+        plan = ExportDAL.plan(selected_ids, g.user.id)
+        if not plan.constellations:
+            flash("所选星座不存在", "warning")
+            return render_template('constellation/export.html', constellations=constellations)
 
-        # 准备响应
-        memory_file.seek(0)
-        response = make_response(memory_file.read())
-        response.headers['Content-Type'] = 'application/zip'
+        # 星座数据未变化时直接返回缓存的导出文件；否则边查询边压缩，ZIP按块流式返回并写入缓存
+        # （生成器在请求上下文中执行，数据库会话保持可用）
+        key = export_cache.key(plan)
+        artifact = export_cache.get(key)
+        if artifact:
+            response = Response(export_cache.read(artifact), mimetype='application/zip')
+            response.headers['Content-Length'] = str(artifact.size)
+        else:
+            created_at = int(time.time())
+            response = Response(
+                stream_with_context(export_cache.store(key, ExportDAL.stream_zip(plan, created_at=created_at), created_at)),
+                mimetype='application/zip'
+            )
         response.headers['Content-Disposition'] = 'attachment; filename="constellation_data.zip"'
 
         return response
@@ -167,42 +160,6 @@ def export():
     return render_template('constellation/export.html', constellations=constellations)
 
 
-def generate_export_data(constellations):
-    """生成导出文件内容"""
-    tles_lines = []
-    isls_lines = []
-    total_offset = 0  # 用于计算卫星ID偏移量
-    constellation_sat_count = []  # 记录每个星座的卫星数量
-
-    # 首先收集所有星座的卫星数量
-    for constellation in constellations:
-        count = SatelliteModel.query.filter_by(constellation_id=constellation.id).count()
-        constellation_sat_count.append(count)
-
-    # 生成TLE数据
-    for idx, constellation in enumerate(constellations):
-        satellites = SatelliteModel.query.filter_by(constellation_id=constellation.id).all()
-        for sat in satellites:
-            tles_lines.append(f"{constellation.constellation_name} {sat.satellite_id}")
-            tles_lines.append(sat.info_line1)
-            tles_lines.append(sat.info_line2)
-
-    # 生成ISL数据
-    for idx, constellation in enumerate(constellations):
-        # 对于第二个及以后的星座，计算偏移量
-        current_offset = sum(constellation_sat_count[:idx]) if idx > 0 else 0
-
-        # 获取该星座的所有卫星关联
-        links = LinkedSatelliteModel.query.filter_by(constellation_id=constellation.id).all()
-        for link in links:
-            # 应用偏移量
-            sat1_id = link.satellite_id1 + current_offset
-            sat2_id = link.satellite_id2 + current_offset
-            isls_lines.append(f"{sat1_id} {sat2_id}")
-
-    return '\n'.join(tles_lines), '\n'.join(isls_lines), constellation_sat_count
-
-
 @bp.route('/')
 @login_required
 def list():
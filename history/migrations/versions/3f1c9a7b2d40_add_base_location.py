@@ -0,0 +1,68 @@
+"""add base location
+
+Revision ID: 3f1c9a7b2d40
+Revises: e65c1ddf6572
+Create Date: 2026-10-17 09:12:04.218311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from dal.base_dal import parse_location
+from orbit.frames import geodetic_to_ecef
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7b2d40'
+down_revision = 'e65c1ddf6572'
+branch_labels = None
+depends_on = None
+
+
+base = sa.table(
+    'base',
+    sa.column('id', sa.Integer),
+    sa.column('info', sa.Text),
+    sa.column('latitude', sa.Float),
+    sa.column('longitude', sa.Float),
+    sa.column('altitude', sa.Float),
+    sa.column('ecef_x', sa.Float),
+    sa.column('ecef_y', sa.Float),
+    sa.column('ecef_z', sa.Float),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('base', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('altitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('ecef_x', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('ecef_y', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('ecef_z', sa.Float(), nullable=True))
+
+    # 旧基座只有info文本：能解析出位置的写入大地坐标和ECEF，其余保持为空（可见性计算中报告"location not set"）
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(base.c.id, base.c.info)).fetchall()
+    for base_id, info in rows:
+        try:
+            lat, lon, alt = parse_location(info)
+        except ValueError:
+            continue
+        x, y, z = geodetic_to_ecef(lat, lon, alt / 1000.0).tolist()
+        connection.execute(
+            base.update().where(base.c.id == base_id).values(
+                latitude=lat, longitude=lon, altitude=alt,
+                ecef_x=x, ecef_y=y, ecef_z=z
+            )
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('base', schema=None) as batch_op:
+        batch_op.drop_column('ecef_z')
+        batch_op.drop_column('ecef_y')
+        batch_op.drop_column('ecef_x')
+        batch_op.drop_column('altitude')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
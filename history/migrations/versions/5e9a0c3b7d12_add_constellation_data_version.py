@@ -0,0 +1,32 @@
+"""add constellation data version
+
+Revision ID: 5e9a0c3b7d12
+Revises: c4d7e2a91f05
+Create Date: 2026-10-17 09:44:18.370915
+
+"""
+import time
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9a0c3b7d12'
+down_revision = 'c4d7e2a91f05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('constellation', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.BigInteger(), server_default='0', nullable=False))
+
+    # 已有星座的初始版本号与新建星座一致取当前时间（纳秒），与之前导出缓存中的版本号不会重复
+    constellation = sa.table('constellation', sa.column('data_version', sa.BigInteger))
+    op.execute(constellation.update().values(data_version=time.time_ns()))
+
+
+def downgrade():
+    with op.batch_alter_table('constellation', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
@@ -0,0 +1,53 @@
+"""add import staging tables
+
+Revision ID: 8b2e4d1c6a93
+Revises: 3f1c9a7b2d40
+Create Date: 2026-10-17 09:20:37.554102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4d1c6a93'
+down_revision = '3f1c9a7b2d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('satellite_import_staging',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('import_id', sa.String(length=32), nullable=False),
+    sa.Column('satellite_id', sa.Integer(), nullable=False),
+    sa.Column('info_line1', sa.Text(), nullable=False),
+    sa.Column('info_line2', sa.Text(), nullable=False),
+    sa.Column('ext_info', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('satellite_import_staging', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_satellite_import_staging_import_id'), ['import_id'], unique=False)
+
+    op.create_table('link_import_staging',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('import_id', sa.String(length=32), nullable=False),
+    sa.Column('satellite_id1', sa.Integer(), nullable=False),
+    sa.Column('satellite_id2', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('link_import_staging', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_link_import_staging_import_id'), ['import_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('link_import_staging', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_link_import_staging_import_id'))
+
+    op.drop_table('link_import_staging')
+    with op.batch_alter_table('satellite_import_staging', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_satellite_import_staging_import_id'))
+
+    op.drop_table('satellite_import_staging')
@@ -0,0 +1,46 @@
+"""add import sessions
+
+Revision ID: c4d7e2a91f05
+Revises: 8b2e4d1c6a93
+Create Date: 2026-10-17 09:31:52.907466
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d7e2a91f05'
+down_revision = '8b2e4d1c6a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 并行、可续传的导入：暂存行记录分片号和源文件中的序号
+    with op.batch_alter_table('satellite_import_staging', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('shard', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('sequence', sa.BigInteger(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('link_import_staging', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('shard', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('sequence', sa.BigInteger(), server_default='0', nullable=False))
+
+    op.create_table('import_session',
+    sa.Column('import_id', sa.String(length=32), nullable=False),
+    sa.Column('constellation_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('import_id')
+    )
+
+
+def downgrade():
+    op.drop_table('import_session')
+    with op.batch_alter_table('link_import_staging', schema=None) as batch_op:
+        batch_op.drop_column('sequence')
+        batch_op.drop_column('shard')
+
+    with op.batch_alter_table('satellite_import_staging', schema=None) as batch_op:
+        batch_op.drop_column('sequence')
+        batch_op.drop_column('shard')
@@ -1,4 +1,8 @@
+from datetime import datetime
+import time
 from history.exts import db
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
 from werkzeug.security import generate_password_hash, check_password_hash
 
 class UserModel(db.Model):
@@ -21,6 +25,9 @@ class ConstellationModel(db.Model):
     satellite_count = db.Column(db.Integer, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
     description = db.Column(db.Text, nullable=False)
+    # 数据版本号：星座内卫星或链接的任何变更都会加1（导出缓存等按版本判断数据是否变化）；
+    # 初始值取创建时间（纳秒），星座ID被复用或数据库重建后也不会与旧的版本号重复
+    data_version = db.Column(db.BigInteger, default=time.time_ns, nullable=False)
 
     user = db.relationship(UserModel, backref="constellations")
     satellites = db.relationship('SatelliteModel', backref='constellation', cascade='all, delete-orphan')
@@ -98,10 +105,82 @@ class LinkedSatelliteModel(db.Model):
     constellation = db.relationship("ConstellationModel", backref="linked_satellites")
 
 
+class SatelliteImportStagingModel(db.Model):
+    """卫星导入暂存表：流式导入先写入此表，完成后一次性转入satellite表"""
+    __tablename__ = "satellite_import_staging"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    import_id = db.Column(db.String(32), nullable=False, index=True)  # 导入批次
+    satellite_id = db.Column(db.Integer, nullable=False)
+    info_line1 = db.Column(db.Text, nullable=False)
+    info_line2 = db.Column(db.Text, nullable=False)
+    ext_info = db.Column(db.JSON, default=dict, nullable=False)
+    shard = db.Column(db.Integer, default=0, nullable=False)  # 并行导入的分片号
+    sequence = db.Column(db.BigInteger, default=0, nullable=False)  # 记录在源文件中的序号（断点续传）
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
+class LinkImportStagingModel(db.Model):
+    """链接导入暂存表：流式导入先写入此表，完成后一次性转入linked_satellite表"""
+    __tablename__ = "link_import_staging"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    import_id = db.Column(db.String(32), nullable=False, index=True)  # 导入批次
+    satellite_id1 = db.Column(db.Integer, nullable=False)
+    satellite_id2 = db.Column(db.Integer, nullable=False)
+    shard = db.Column(db.Integer, default=0, nullable=False)  # 并行导入的分片号
+    sequence = db.Column(db.BigInteger, default=0, nullable=False)  # 记录在源文件中的序号（断点续传）
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
+class ImportSessionModel(db.Model):
+    """导入会话：BeginImport时创建，记录会话所属的星座和用户，提交后删除"""
+    __tablename__ = "import_session"
+    import_id = db.Column(db.String(32), primary_key=True)  # 导入批次（与暂存行的import_id相同）
+    constellation_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
 class BaseModel(db.Model):
     __tablename__ = "base"
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     base_name = db.Column(db.String(100), nullable=False)
     info = db.Column(db.Text, nullable=False)
+    # 大地坐标（WGS84，度、度、米），未设置位置时为空
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    altitude = db.Column(db.Float, nullable=True)
+    # 预计算的ECEF位置（km），随大地坐标一起写入
+    ecef_x = db.Column(db.Float, nullable=True)
+    ecef_y = db.Column(db.Float, nullable=True)
+    ecef_z = db.Column(db.Float, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    user = db.relationship(UserModel, backref="bases")
\ No newline at end of file
+    user = db.relationship(UserModel, backref="bases")
+
+
+def _changed_constellation_ids(session) -> set:
+    """本次flush中卫星或链接有变更的星座ID（含修改前所属的星座）"""
+    constellation_ids = set()
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (SatelliteModel, LinkedSatelliteModel)):
+            constellation_ids.add(obj.constellation_id)
+    for obj in session.dirty:
+        if isinstance(obj, (SatelliteModel, LinkedSatelliteModel)) and session.is_modified(obj):
+            history = inspect(obj).attrs.constellation_id.history
+            constellation_ids.update(history.added or [obj.constellation_id])
+            constellation_ids.update(history.deleted or [])
+    constellation_ids.discard(None)
+    return constellation_ids
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_data_version(session, flush_context, instances):
+    """通过ORM增删改卫星或链接时，所属星座的data_version加1（与变更在同一事务中提交）"""
+    constellation_ids = _changed_constellation_ids(session)
+    if constellation_ids:
+        session.connection().execute(
+            ConstellationModel.__table__.update().where(
+                ConstellationModel.id.in_(constellation_ids)
+            ).values(
+                data_version=ConstellationModel.data_version + 1
+            )
+        )
@@ -3,11 +3,14 @@
 ISL文件导入工具
 从ISL格式文件批量导入卫星链接数据到gRPC服务
 """
+import argparse
+import os
 import grpc
 import sys
 import chardet
 from grpc_generated import auth_pb2, auth_pb2_grpc
 from grpc_generated import satellite_pb2, satellite_pb2_grpc
+from import_pipeline import begin_import, commit_import, get_checkpoints, upload_parallel
 
 
 def detect_encoding(file_path):
@@ -21,17 +24,20 @@ def detect_encoding(file_path):
         return encoding
 
 
-def parse_isl_file(file_path, constellation_id):
+def iter_isl_file(file_path, constellation_id, stats=None):
     """
-    解析ISL文件
+    逐行解析ISL文件，按文件顺序逐条产出链接数据（边读边上传）
 
     ISL文件格式（每行一条链接）：
     卫星ID1 卫星ID2
+
+    Args:
+        stats: 可选dict，结束时写入 parsed（链接数）
     """
     encoding = detect_encoding(file_path)
     print(f"检测到文件编码: {encoding}")
 
-    links = []
+    parsed = 0
     line_num = 0
 
     with open(file_path, 'r', encoding=encoding, errors='replace') as f:
@@ -50,53 +56,79 @@ def parse_isl_file(file_path, constellation_id):
             try:
                 sat1_id = int(parts[0])
                 sat2_id = int(parts[1])
-
-                # 创建链接数据
-                links.append({
-                    'constellation_id': constellation_id,
-                    'satellite_id1': sat1_id,
-                    'satellite_id2': sat2_id
-                })
-
             except ValueError:
                 print(f"警告: 行{line_num} 卫星ID必须为数字，跳过")
                 continue
 
-    return links
+            # 创建链接数据
+            parsed += 1
+            yield {
+                'constellation_id': constellation_id,
+                'satellite_id1': sat1_id,
+                'satellite_id2': sat2_id
+            }
+
+    if stats is not None:
+        stats['parsed'] = parsed
 
 
-def import_links_stream(channel, user_id, links):
-    """使用流式传输导入链接"""
+def parse_isl_file(file_path, constellation_id):
+    """解析ISL文件"""
+    return list(iter_isl_file(file_path, constellation_id))
+
+
+def import_links_stream(channel, user_id, links, import_id, parallel=1, checkpoints=None):
+    """
+    使用流式传输导入链接（parallel条流并行写入导入会话的暂存表）
+
+    Returns:
+        (每条流的响应列表, 按断点跳过的链接数)
+    """
     client = satellite_pb2_grpc.SatelliteServiceStub(channel)
 
-    def request_generator():
-        for link in links:
-            yield satellite_pb2.ImportLinksRequest(
-                user_id=user_id,
-                constellation_id=link['constellation_id'],
-                satellite_id1=link['satellite_id1'],
-                satellite_id2=link['satellite_id2']
-            )
+    def make_request(link, shard, sequence):
+        return satellite_pb2.ImportLinksRequest(
+            user_id=user_id,
+            constellation_id=link['constellation_id'],
+            satellite_id1=link['satellite_id1'],
+            satellite_id2=link['satellite_id2'],
+            import_id=import_id,
+            shard=shard,
+            sequence=sequence
+        )
 
     # 调用流式API
-    response = client.ImportLinks(request_generator())
-    return response
+    return upload_parallel(client.ImportLinks, links, make_request, parallel, checkpoints)
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="从ISL格式文件批量导入卫星链接数据到gRPC服务",
+        epilog=f"示例: {sys.argv[0]} links.txt testuser pass123 1"
+    )
+    parser.add_argument('isl_file', help="ISL文件路径")
+    parser.add_argument('username', help="用户名")
+    parser.add_argument('password', help="密码")
+    parser.add_argument('constellation_id', type=int, help="星座ID")
+    parser.add_argument('--parallel', type=int, default=1, help="并行上传的流数，默认1（不超过服务端该方法的并发上限，默认4）")
+    parser.add_argument('--resume', metavar='IMPORT_ID',
+                        help="从服务端断点继续未完成的导入（--parallel需与首次导入一致）")
+    args = parser.parse_args()
+    if args.parallel < 1:
+        parser.error("--parallel 必须大于0")
+    return args
 
 
 def main():
     """主函数"""
-    if len(sys.argv) < 5:
-        print("使用方法:")
-        print(f"  {sys.argv[0]} <ISL文件路径> <用户名> <密码> <星座ID>")
-        print()
-        print("示例:")
-        print(f"  {sys.argv[0]} links.txt testuser pass123 1")
-        sys.exit(1)
+    args = parse_args()
+    isl_file = args.isl_file
+    constellation_id = args.constellation_id
 
-    isl_file = sys.argv[1]
-    username = sys.argv[2]
-    password = sys.argv[3]
-    constellation_id = int(sys.argv[4])
+    if not os.path.isfile(isl_file):
+        print(f"错误: 文件不存在 - {isl_file}")
+        sys.exit(1)
 
     print("=" * 70)
     print("  ISL文件导入工具")
@@ -111,7 +143,7 @@ def main():
     print("[2/4] 用户登录...")
     try:
         login_resp = auth_client.Login(
-            auth_pb2.LoginRequest(username=username, password=password)
+            auth_pb2.LoginRequest(username=args.username, password=args.password)
         )
         if login_resp.status.code != 200:
             print(f"错误: 登录失败 - {login_resp.status.message}")
@@ -123,51 +155,77 @@ def main():
         print(f"错误: 登录失败 - {str(e)}")
         sys.exit(1)
 
-    # 解析ISL文件
-    print(f"\n[3/4] 解析ISL文件: {isl_file}")
+    # 创建导入会话，或从断点继续
     try:
-        links = parse_isl_file(isl_file, constellation_id)
-        print(f"成功解析 {len(links)} 条链接")
-    except FileNotFoundError:
-        print(f"错误: 文件不存在 - {isl_file}")
+        if args.resume:
+            import_id = args.resume
+            checkpoints = get_checkpoints(channel, user_id, constellation_id, import_id)
+            print(f"继续导入会话: {import_id}（{len(checkpoints)} 个分片有断点）")
+        else:
+            import_id = begin_import(channel, user_id, constellation_id)
+            checkpoints = {}
+            print(f"导入会话: {import_id}")
+    except grpc.RpcError as e:
+        print(f"错误: gRPC调用失败 - {e.code()}: {e.details()}")
         sys.exit(1)
     except Exception as e:
-        print(f"错误: 文件解析失败 - {str(e)}")
+        print(f"错误: {str(e)}")
         sys.exit(1)
 
-    if not links:
+    # 边解析边上传
+    print(f"\n[3/4] 解析并导入ISL文件: {isl_file}（{args.parallel} 条上传流）")
+    stats = {}
+    try:
+        links = iter_isl_file(isl_file, constellation_id, stats)
+        responses, skipped = import_links_stream(
+            channel, user_id, links, import_id, args.parallel, checkpoints
+        )
+    except grpc.RpcError as e:
+        print(f"错误: gRPC调用失败 - {e.code()}: {e.details()}")
+        print(f"已上传的数据保留在服务端，可使用 --resume {import_id} --parallel {args.parallel} 继续")
+        sys.exit(1)
+    except Exception as e:
+        print(f"错误: 导入失败 - {str(e)}")
+        print(f"已上传的数据保留在服务端，可使用 --resume {import_id} --parallel {args.parallel} 继续")
+        sys.exit(1)
+
+    if not stats.get('parsed'):
         print("错误: 没有解析到任何链接数据")
         sys.exit(1)
 
-    # 导入链接
-    print(f"\n[4/4] 开始导入链接...")
+    # 提交会话：暂存的链接一次性转入正式表，重复和卫星不存在的链接在此跳过
+    print("\n[4/4] 提交导入...")
     try:
-        response = import_links_stream(channel, user_id, links)
-
-        print("\n" + "=" * 70)
-        print("  导入结果")
-        print("=" * 70)
-        print(f"状态: {response.status.message}")
-        print(f"成功: {response.success_count} 条")
-        print(f"失败: {response.fail_count} 条")
-
-        if response.errors:
-            print(f"\n错误信息（前{len(response.errors)}条）:")
-            for error in response.errors:
-                print(f"  - {error}")
-
-        print("=" * 70)
-
-        if response.fail_count > 0:
-            sys.exit(1)
-
+        commit_resp = commit_import(channel, user_id, constellation_id, import_id)
     except grpc.RpcError as e:
         print(f"错误: gRPC调用失败 - {e.code()}: {e.details()}")
         sys.exit(1)
     except Exception as e:
-        print(f"错误: 导入失败 - {str(e)}")
+        print(f"错误: {str(e)}")
         sys.exit(1)
 
+    uploaded = sum(response.success_count + response.fail_count for response in responses) + skipped
+    errors = [error for response in responses for error in response.errors][:10]
+    fail_count = uploaded - commit_resp.link_count
+
+    print("\n" + "=" * 70)
+    print("  导入结果")
+    print("=" * 70)
+    print(f"解析: {stats['parsed']} 条")
+    if skipped:
+        print(f"断点前已上传: {skipped} 条")
+    print(f"成功: {commit_resp.link_count} 条")
+    print(f"失败: {fail_count} 条（自环、重复或卫星不存在）")
+
+    if errors:
+        print(f"\n错误信息（前{len(errors)}条）:")
+        for error in errors:
+            print(f"  - {error}")
+
+    print("=" * 70)
+
+    if fail_count > 0:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,111 @@
+"""
+导入工具公共模块
+导入会话（BeginImport / GetImportCheckpoint / CommitImport）和多流并行上传
+
+记录按文件顺序编号（序号从1开始），第k条记录发往分片 (k-1) % N，每个分片一条客户端流；
+分片各有一个有界队列，某条流发送变慢时队列写满，读取和解析随之暂停（背压）。
+服务端按分片记录已写入暂存表的最大序号作为断点，续传时跳过不超过断点的记录，
+因此续传时并行数必须与首次导入一致
+"""
+import queue
+
+from grpc_generated import constellation_pb2, constellation_pb2_grpc
+
+# 每个分片队列中等待发送的请求数上限
+DEFAULT_QUEUE_SIZE = 1000
+# 队列写满时检查流状态的间隔（秒）
+PUT_POLL_SECONDS = 0.5
+
+# 队列结束标记
+_END = object()
+
+
+def begin_import(channel, user_id, constellation_id):
+    """开始导入会话，返回import_id"""
+    client = constellation_pb2_grpc.ConstellationServiceStub(channel)
+    response = client.BeginImport(constellation_pb2.BeginImportRequest(
+        user_id=user_id,
+        constellation_id=constellation_id
+    ))
+    if response.status.code != 200:
+        raise RuntimeError(f"创建导入会话失败 - {response.status.message}")
+    return response.import_id
+
+
+def get_checkpoints(channel, user_id, constellation_id, import_id):
+    """查询导入会话的断点，返回 {分片号: 已写入的最大序号}"""
+    client = constellation_pb2_grpc.ConstellationServiceStub(channel)
+    response = client.GetImportCheckpoint(constellation_pb2.GetImportCheckpointRequest(
+        user_id=user_id,
+        constellation_id=constellation_id,
+        import_id=import_id
+    ))
+    if response.status.code != 200:
+        raise RuntimeError(f"查询导入断点失败 - {response.status.message}")
+    return {item.shard: item.sequence for item in response.checkpoints}
+
+
+def commit_import(channel, user_id, constellation_id, import_id):
+    """提交导入会话，返回CommitImportResponse"""
+    client = constellation_pb2_grpc.ConstellationServiceStub(channel)
+    response = client.CommitImport(constellation_pb2.CommitImportRequest(
+        user_id=user_id,
+        constellation_id=constellation_id,
+        import_id=import_id
+    ))
+    if response.status.code != 200:
+        raise RuntimeError(f"提交导入失败 - {response.status.message}")
+    return response
+
+
+def _put(shard_queue, item, call):
+    """写入分片队列；队列满时等待，期间流已结束（出错）则抛出异常而不是一直阻塞"""
+    while True:
+        try:
+            shard_queue.put(item, timeout=PUT_POLL_SECONDS)
+            return
+        except queue.Full:
+            if call.done():
+                call.result()  # 流失败时抛出grpc.RpcError
+                raise RuntimeError("上传流提前结束")
+
+
+def upload_parallel(rpc, records, make_request, parallel=1, checkpoints=None, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    把记录分片到多条并行的客户端流上传
+
+    Args:
+        rpc: 客户端流方法（如 stub.ImportSatellites）
+        records: 按文件顺序产出的记录（可以是生成器，边解析边上传）
+        make_request: (记录, 分片号, 序号) -> 请求消息
+        parallel: 并行流数
+        checkpoints: 续传断点 {分片号: 序号}
+        queue_size: 每个分片队列的长度
+
+    Returns:
+        (每条流的响应列表, 按断点跳过的记录数)
+    """
+    checkpoints = checkpoints or {}
+    if any(shard >= parallel for shard in checkpoints):
+        raise ValueError(f"断点包含分片 {max(checkpoints)}，续传时的并行数需与首次导入一致")
+
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(parallel)]
+    # 每条流在gRPC的线程中从自己的队列取请求
+    calls = [rpc.future(iter(shard_queue.get, _END)) for shard_queue in queues]
+    skipped = 0
+    try:
+        for sequence, record in enumerate(records, 1):
+            shard = (sequence - 1) % parallel
+            if sequence <= checkpoints.get(shard, 0):
+                skipped += 1
+                continue
+            _put(queues[shard], make_request(record, shard, sequence), calls[shard])
+
+        for shard_queue, call in zip(queues, calls):
+            _put(shard_queue, _END, call)
+        return [call.result() for call in calls], skipped
+    except BaseException:
+        # 任一流失败或读取出错时取消所有流，已写入暂存表的批次保留用于续传
+        for call in calls:
+            call.cancel()
+        raise
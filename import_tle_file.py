@@ -3,12 +3,27 @@
 TLE文件导入工具
 从TLE格式文件批量导入卫星数据到gRPC服务
 """
+import argparse
+import itertools
+import multiprocessing
+import os
 import grpc
 import sys
 import re
 import chardet
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from grpc_generated import auth_pb2, auth_pb2_grpc
 from grpc_generated import constellation_pb2, constellation_pb2_grpc
+from import_pipeline import begin_import, commit_import, get_checkpoints, upload_parallel
+from orbit.tle import parse_tle
+
+# 每个解析任务的记录数
+CHUNK_RECORDS = 5000
+# 每个解析进程的在途任务数（限制已解析未上传的数据量）
+PENDING_CHUNKS_PER_WORKER = 2
+# 第一行末尾的卫星ID
+SATELLITE_ID_PATTERN = re.compile(r'\s+(\d+)$')
 
 
 def detect_encoding(file_path):
@@ -22,99 +37,174 @@ def detect_encoding(file_path):
         return encoding
 
 
-def parse_tle_file(file_path, constellation_id):
+def read_record_chunks(file_path, encoding, chunk_records=CHUNK_RECORDS):
     """
-    解析TLE文件
+    按3行记录边界切分文件（只读取和切分，不解析）
 
-    TLE文件格式（每3行一个卫星）：
-    星座名称 卫星ID
-    TLE Line 1
-    TLE Line 2
+    Yields:
+        [(行号, 行内容)]，每块 chunk_records*3 个非空行；文件末尾不足3行的部分单独作为最后一块
     """
-    encoding = detect_encoding(file_path)
-    print(f"检测到文件编码: {encoding}")
-
-    satellites = []
+    chunk_lines = chunk_records * 3
     lines = []
-    line_num = 0
-
     with open(file_path, 'r', encoding=encoding, errors='replace') as f:
-        for line in f:
-            line_num += 1
+        for line_num, line in enumerate(f, 1):
             line = line.strip()
             if not line:
                 continue
-
             lines.append((line_num, line))
+            if len(lines) >= chunk_lines:
+                yield lines
+                lines = []
+    if lines:
+        yield lines
 
-            # 每3行解析一个卫星
-            if len(lines) == 3:
-                (num1, line1), (num2, line2), (num3, line3) = lines
 
-                try:
-                    # 从第一行提取卫星ID
-                    match = re.search(r'\s+(\d+)$', line1)
-                    if not match:
-                        print(f"警告: 行{num1} 未找到卫星ID，跳过")
-                        lines = []
-                        continue
+def parse_record_chunk(lines, constellation_id):
+    """
+    解析一块TLE记录（在进程池中执行）
 
-                    satellite_id = int(match.group(1))
+    Returns:
+        (卫星列表, 警告列表)
+    """
+    satellites = []
+    warnings = []
+    complete = len(lines) - len(lines) % 3
+    for k in range(0, complete, 3):
+        (num1, line1), (num2, line2), (num3, line3) = lines[k:k + 3]
+
+        # 从第一行提取卫星ID
+        match = SATELLITE_ID_PATTERN.search(line1)
+        if not match:
+            warnings.append(f"行{num1} 未找到卫星ID，跳过")
+            continue
+
+        # 格式和校验和验证
+        try:
+            parse_tle(line2, line3)
+        except ValueError as e:
+            warnings.append(f"行{num2}-{num3} TLE无效（{str(e)}），跳过")
+            continue
+
+        satellites.append({
+            'satellite_id': int(match.group(1)),
+            'constellation_id': constellation_id,
+            'info_line1': line2,
+            'info_line2': line3
+        })
+
+    if complete < len(lines):
+        warnings.append(f"文件末尾有{len(lines) - complete}行未能组成完整的卫星数据")
+    return satellites, warnings
+
+
+def iter_tle_file(file_path, constellation_id, workers=None, stats=None):
+    """
+    并行解析TLE文件，按文件顺序逐条产出卫星数据
 
-                    # 创建卫星数据
-                    satellites.append({
-                        'satellite_id': satellite_id,
-                        'constellation_id': constellation_id,
-                        'info_line1': line2,
-                        'info_line2': line3
-                    })
+    主进程按记录边界切块，进程池并行解析（含校验和验证），解析完一块就产出一块，
+    因此上传可以在解析过程中开始；在途的解析任务数有上限，上传较慢时读取会自动暂停
 
-                except Exception as e:
-                    print(f"警告: 行{num1}-{num3} 解析失败: {str(e)}")
+    Args:
+        stats: 可选dict，结束时写入 parsed（卫星数）/ warnings（警告数）
+    """
+    encoding = detect_encoding(file_path)
+    print(f"检测到文件编码: {encoding}")
 
-                finally:
-                    lines = []
+    workers = workers or os.cpu_count() or 1
+    parsed = 0
+    warning_count = 0
+    pending = deque()
+    chunks = read_record_chunks(file_path, encoding)
+
+    # 调用时gRPC通道已打开（后台线程在运行），gRPC不支持fork这样的进程，解析进程以spawn方式启动
+    spawn = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=spawn) as executor:
+        for chunk in itertools.islice(chunks, workers * PENDING_CHUNKS_PER_WORKER):
+            pending.append(executor.submit(parse_record_chunk, chunk, constellation_id))
+
+        while pending:
+            satellites, warnings = pending.popleft().result()
+            # 取走一块后再提交一块，保持在途任务数不变
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(executor.submit(parse_record_chunk, chunk, constellation_id))
+
+            for warning in warnings:
+                print(f"警告: {warning}")
+            warning_count += len(warnings)
+            parsed += len(satellites)
+            yield from satellites
+
+    if stats is not None:
+        stats['parsed'] = parsed
+        stats['warnings'] = warning_count
 
-    # 检查是否有未完成的3行
-    if lines:
-        print(f"警告: 文件末尾有{len(lines)}行未能组成完整的卫星数据")
 
-    return satellites
+def parse_tle_file(file_path, constellation_id, workers=None):
+    """
+    解析TLE文件
+
+    TLE文件格式（每3行一个卫星）：
+    星座名称 卫星ID
+    TLE Line 1
+    TLE Line 2
+    """
+    return list(iter_tle_file(file_path, constellation_id, workers))
 
 
-def import_satellites_stream(channel, user_id, satellites):
-    """使用流式传输导入卫星"""
+def import_satellites_stream(channel, user_id, satellites, import_id, parallel=1, checkpoints=None):
+    """
+    使用流式传输导入卫星（parallel条流并行写入导入会话的暂存表）
+
+    Returns:
+        (每条流的响应列表, 按断点跳过的卫星数)
+    """
     client = constellation_pb2_grpc.ConstellationServiceStub(channel)
 
-    def request_generator():
-        for sat in satellites:
-            yield constellation_pb2.ImportSatellitesRequest(
-                user_id=user_id,
-                constellation_id=sat['constellation_id'],
-                satellite_id=sat['satellite_id'],
-                info_line1=sat['info_line1'],
-                info_line2=sat['info_line2']
-            )
+    def make_request(sat, shard, sequence):
+        return constellation_pb2.ImportSatellitesRequest(
+            user_id=user_id,
+            constellation_id=sat['constellation_id'],
+            satellite_id=sat['satellite_id'],
+            info_line1=sat['info_line1'],
+            info_line2=sat['info_line2'],
+            import_id=import_id,
+            shard=shard,
+            sequence=sequence
+        )
 
     # 调用流式API
-    response = client.ImportSatellites(request_generator())
-    return response
+    return upload_parallel(client.ImportSatellites, satellites, make_request, parallel, checkpoints)
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(
+        description="从TLE格式文件批量导入卫星数据到gRPC服务",
+        epilog=f"示例: {sys.argv[0]} satellites.txt testuser pass123 1"
+    )
+    parser.add_argument('tle_file', help="TLE文件路径")
+    parser.add_argument('username', help="用户名")
+    parser.add_argument('password', help="密码")
+    parser.add_argument('constellation_id', type=int, help="星座ID")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="解析进程数，默认CPU核数")
+    parser.add_argument('--parallel', type=int, default=1, help="并行上传的流数，默认1（不超过服务端该方法的并发上限，默认4）")
+    parser.add_argument('--resume', metavar='IMPORT_ID',
+                        help="从服务端断点继续未完成的导入（--parallel需与首次导入一致）")
+    args = parser.parse_args()
+    if args.parallel < 1:
+        parser.error("--parallel 必须大于0")
+    return args
 
 
 def main():
     """主函数"""
-    if len(sys.argv) < 5:
-        print("使用方法:")
-        print(f"  {sys.argv[0]} <TLE文件路径> <用户名> <密码> <星座ID>")
-        print()
-        print("示例:")
-        print(f"  {sys.argv[0]} satellites.txt testuser pass123 1")
-        sys.exit(1)
+    args = parse_args()
+    tle_file = args.tle_file
+    constellation_id = args.constellation_id
 
-    tle_file = sys.argv[1]
-    username = sys.argv[2]
-    password = sys.argv[3]
-    constellation_id = int(sys.argv[4])
+    if not os.path.isfile(tle_file):
+        print(f"错误: 文件不存在 - {tle_file}")
+        sys.exit(1)
 
     print("=" * 70)
     print("  TLE文件导入工具")
@@ -129,7 +219,7 @@ def main():
     print("[2/4] 用户登录...")
     try:
         login_resp = auth_client.Login(
-            auth_pb2.LoginRequest(username=username, password=password)
+            auth_pb2.LoginRequest(username=args.username, password=args.password)
         )
         if login_resp.status.code != 200:
             print(f"错误: 登录失败 - {login_resp.status.message}")
@@ -141,51 +231,78 @@ def main():
         print(f"错误: 登录失败 - {str(e)}")
         sys.exit(1)
 
-    # 解析TLE文件
-    print(f"\n[3/4] 解析TLE文件: {tle_file}")
+    # 创建导入会话，或从断点继续
     try:
-        satellites = parse_tle_file(tle_file, constellation_id)
-        print(f"成功解析 {len(satellites)} 个卫星")
-    except FileNotFoundError:
-        print(f"错误: 文件不存在 - {tle_file}")
+        if args.resume:
+            import_id = args.resume
+            checkpoints = get_checkpoints(channel, user_id, constellation_id, import_id)
+            print(f"继续导入会话: {import_id}（{len(checkpoints)} 个分片有断点）")
+        else:
+            import_id = begin_import(channel, user_id, constellation_id)
+            checkpoints = {}
+            print(f"导入会话: {import_id}")
+    except grpc.RpcError as e:
+        print(f"错误: gRPC调用失败 - {e.code()}: {e.details()}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+
+    # 解析与上传流水线并行：解析完一块就开始上传
+    print(f"\n[3/4] 解析并导入TLE文件: {tle_file}（{args.workers} 个解析进程，{args.parallel} 条上传流）")
+    stats = {}
+    try:
+        satellites = iter_tle_file(tle_file, constellation_id, args.workers, stats)
+        responses, skipped = import_satellites_stream(
+            channel, user_id, satellites, import_id, args.parallel, checkpoints
+        )
+    except grpc.RpcError as e:
+        print(f"错误: gRPC调用失败 - {e.code()}: {e.details()}")
+        print(f"已上传的数据保留在服务端，可使用 --resume {import_id} --parallel {args.parallel} 继续")
         sys.exit(1)
     except Exception as e:
-        print(f"错误: 文件解析失败 - {str(e)}")
+        print(f"错误: 导入失败 - {str(e)}")
+        print(f"已上传的数据保留在服务端，可使用 --resume {import_id} --parallel {args.parallel} 继续")
         sys.exit(1)
 
-    if not satellites:
+    if not stats.get('parsed'):
         print("错误: 没有解析到任何卫星数据")
         sys.exit(1)
 
-    # 导入卫星
-    print(f"\n[4/4] 开始导入卫星...")
+    # 提交会话：暂存的卫星一次性转入正式表
+    print("\n[4/4] 提交导入...")
     try:
-        response = import_satellites_stream(channel, user_id, satellites)
-
-        print("\n" + "=" * 70)
-        print("  导入结果")
-        print("=" * 70)
-        print(f"状态: {response.status.message}")
-        print(f"成功: {response.success_count} 个")
-        print(f"失败: {response.fail_count} 个")
-
-        if response.errors:
-            print(f"\n错误信息（前{len(response.errors)}条）:")
-            for error in response.errors:
-                print(f"  - {error}")
-
-        print("=" * 70)
-
-        if response.fail_count > 0:
-            sys.exit(1)
-
+        commit_resp = commit_import(channel, user_id, constellation_id, import_id)
     except grpc.RpcError as e:
         print(f"错误: gRPC调用失败 - {e.code()}: {e.details()}")
         sys.exit(1)
     except Exception as e:
-        print(f"错误: 导入失败 - {str(e)}")
+        print(f"错误: {str(e)}")
         sys.exit(1)
 
+    staged = sum(response.success_count for response in responses)
+    fail_count = sum(response.fail_count for response in responses)
+    errors = [error for response in responses for error in response.errors][:10]
+
+    print("\n" + "=" * 70)
+    print("  导入结果")
+    print("=" * 70)
+    print(f"解析: {stats['parsed']} 个（警告 {stats['warnings']} 条）")
+    if skipped:
+        print(f"断点前已上传: {skipped} 个")
+    print(f"上传: {staged} 个")
+    print(f"成功: {commit_resp.satellite_count} 个")
+    print(f"失败: {fail_count} 个")
+
+    if errors:
+        print(f"\n错误信息（前{len(errors)}条）:")
+        for error in errors:
+            print(f"  - {error}")
+
+    print("=" * 70)
+
+    if fail_count > 0:
+        sys.exit(1)
 
 if __name__ == '__main__':
     main()
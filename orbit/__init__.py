@@ -0,0 +1,47 @@
+"""
+轨道计算模块初始化
+"""
+from .propagator import PackedConstellation, build_time_grid, count_epochs, iter_time_chunks, unix_to_jd
+from .tle import TLEElements, TLECache, parse_tle, tle_cache
+from .isl_graph import ISLGraph, ISLGraphCache, LinkRecord, isl_graph_cache
+from .frames import geodetic_to_ecef, geodetic_up, gmst, teme_to_ecef
+from .spatial import LatLonGrid, footprint_angle
+from .visibility import VisibilityWindows, compute_visibility_windows, elevation_deg
+from .feasibility import line_of_sight, link_feasibility, pack_bitsets
+from .discovery import CandidateLinks, discover_links, pair_keys
+from .routing import shortest_hop_path, shortest_weighted_path, node_positions, next_hop_table
+
+__all__ = [
+    'PackedConstellation',
+    'build_time_grid',
+    'count_epochs',
+    'iter_time_chunks',
+    'unix_to_jd',
+    'TLEElements',
+    'TLECache',
+    'parse_tle',
+    'tle_cache',
+    'ISLGraph',
+    'ISLGraphCache',
+    'LinkRecord',
+    'isl_graph_cache',
+    'line_of_sight',
+    'link_feasibility',
+    'pack_bitsets',
+    'CandidateLinks',
+    'discover_links',
+    'pair_keys',
+    'shortest_hop_path',
+    'shortest_weighted_path',
+    'node_positions',
+    'next_hop_table',
+    'geodetic_to_ecef',
+    'geodetic_up',
+    'gmst',
+    'teme_to_ecef',
+    'LatLonGrid',
+    'footprint_angle',
+    'VisibilityWindows',
+    'compute_visibility_windows',
+    'elevation_deg'
+]
@@ -0,0 +1,88 @@
+"""
+候选星间链路发现模块
+在某一时刻的传播位置上用KD树查找通信距离内的卫星对（避免O(n²)两两扫描），
+按距离从近到远贪心选取，每颗卫星最多保留K条链路，并剔除被地球遮挡的卫星对
+"""
+from typing import NamedTuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .feasibility import DEFAULT_CLEARANCE_KM, line_of_sight
+from .frames import WGS84_A
+from .propagator import PackedConstellation
+
+
+class CandidateLinks(NamedTuple):
+    """候选链路（按距离升序），satellite_id1 < satellite_id2"""
+    satellite_id1: np.ndarray
+    satellite_id2: np.ndarray
+    distance_km: np.ndarray
+
+
+def pair_keys(satellite_id1, satellite_id2) -> np.ndarray:
+    """无向卫星对的int64键（小ID在高32位），用于向量化去重和比对"""
+    a = np.asarray(satellite_id1, dtype=np.int64)
+    b = np.asarray(satellite_id2, dtype=np.int64)
+    return (np.minimum(a, b) << 32) | np.maximum(a, b)
+
+
+def discover_links(packed: PackedConstellation, unix_time: int, max_range_km: float, max_neighbors: int,
+                   clearance_km: float = DEFAULT_CLEARANCE_KM) -> CandidateLinks:
+    """
+    发现某一时刻的候选链路
+
+    Args:
+        packed: 星座TLE
+        unix_time: 时刻（Unix秒）
+        max_range_km: 最大通信距离
+        max_neighbors: 每颗卫星最多的链路数K
+        clearance_km: 视线距地面的最小高度
+
+    Returns:
+        CandidateLinks，TLE无效或传播失败的卫星不参与
+    """
+    empty = CandidateLinks(np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0))
+    if len(packed) < 2 or max_neighbors <= 0:
+        return empty
+
+    errors, r, _ = packed.propagate(np.array([unix_time], dtype=np.int64))
+    valid = np.flatnonzero(errors[:, 0] == 0)
+    if len(valid) < 2:
+        return empty
+    positions = r[valid, 0, :]
+
+    # 每颗卫星查询最近的K个邻居（第一个结果是自身），超出距离的结果下标为len(positions)
+    k = min(max_neighbors + 1, len(positions))
+    distances, neighbors = cKDTree(positions).query(positions, k=k, distance_upper_bound=max_range_km)
+    source = np.repeat(np.arange(len(positions)), k)
+    neighbors = neighbors.ravel()
+    distances = distances.ravel()
+    found = (neighbors < len(positions)) & (neighbors != source)
+    source, neighbors, distances = source[found], neighbors[found], distances[found]
+
+    # 无向去重（a->b 与 b->a 只保留一次）
+    low = np.minimum(source, neighbors)
+    high = np.maximum(source, neighbors)
+    _, first = np.unique(low * len(positions) + high, return_index=True)
+    low, high, distances = low[first], high[first], distances[first]
+
+    # 剔除被地球遮挡的卫星对
+    visible = line_of_sight(positions[low], positions[high], WGS84_A + clearance_km)
+    low, high, distances = low[visible], high[visible], distances[visible]
+
+    # 按距离从近到远贪心选取，两端链路数都未达到K时才保留
+    order = np.argsort(distances, kind='stable')
+    degree = [0] * len(positions)
+    keep = []
+    for i, a, b in zip(order.tolist(), low[order].tolist(), high[order].tolist()):
+        if degree[a] < max_neighbors and degree[b] < max_neighbors:
+            degree[a] += 1
+            degree[b] += 1
+            keep.append(i)
+    keep = np.array(keep, dtype=np.int64)
+
+    ids = packed.satellite_ids[valid]
+    sat1 = ids[low[keep]]
+    sat2 = ids[high[keep]]
+    return CandidateLinks(np.minimum(sat1, sat2), np.maximum(sat1, sat2), distances[keep])
@@ -0,0 +1,91 @@
+"""
+星间链路可用性模块
+在时间网格上对星座的所有已存链接一次向量化判断是否可用：
+两端卫星距离不超过最大通信距离，且视线不被地球（含大气层余量）遮挡
+"""
+from typing import Optional
+
+import numpy as np
+
+from .frames import WGS84_A
+from .isl_graph import ISLGraph
+from .propagator import PackedConstellation, iter_time_chunks
+
+# 视线距地面的默认最小高度（km），大致为稠密大气层顶
+DEFAULT_CLEARANCE_KM = 80.0
+
+# 每块 链接数×时刻数 的上限（限制中间数组内存）
+MAX_CHUNK_POINTS = 2000000
+
+
+def line_of_sight(r1: np.ndarray, r2: np.ndarray, min_radius: float) -> np.ndarray:
+    """
+    判断两点之间的线段是否与半径为min_radius的球不相交
+
+    Args:
+        r1/r2: (..., 3) 地心位置（km）
+        min_radius: 遮挡球半径（km）
+
+    Returns:
+        (...) bool，位置为NaN时为False
+    """
+    d = r2 - r1
+    dd = np.sum(d * d, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # 线段上离地心最近的点参数 t = -r1·d / |d|^2，限制在 [0, 1]
+        t = np.clip(-np.sum(r1 * d, axis=-1) / dd, 0.0, 1.0)
+    t = np.where(dd > 0, t, 0.0)
+    closest = r1 + t[..., None] * d
+    with np.errstate(invalid='ignore'):
+        return np.sum(closest * closest, axis=-1) > min_radius * min_radius
+
+
+def link_feasibility(graph: ISLGraph, packed: PackedConstellation, start_time: int, end_time: int,
+                     step_seconds: int, max_range_km: Optional[float] = None,
+                     clearance_km: float = DEFAULT_CLEARANCE_KM) -> np.ndarray:
+    """
+    计算所有链接在时间网格上的可用性
+
+    Args:
+        graph: 星座链路图，链接顺序为graph.link_order()
+        packed: 星座TLE
+        max_range_km: 最大通信距离，None表示不限
+        clearance_km: 视线距地面的最小高度
+
+    Returns:
+        (时刻数, 链接数) bool，端点TLE无效或传播失败的链接为False
+    """
+    _, src, dst = graph.link_order()
+    rows_src = packed.index_of(graph.node_ids[src])
+    rows_dst = packed.index_of(graph.node_ids[dst])
+    min_radius = WGS84_A + clearance_km
+
+    epochs_per_chunk = max(1, MAX_CHUNK_POINTS // max(len(src), 1))
+    result = []
+    for chunk in iter_time_chunks(start_time, end_time, step_seconds, epochs_per_chunk):
+        errors, positions, _ = packed.propagate(chunk)
+        positions[errors != 0] = np.nan
+        # 末尾追加一行NaN，下标-1（不在星座中的端点）正好取到该行
+        positions = np.concatenate([positions, np.full((1, len(chunk), 3), np.nan)])
+
+        # (链接数, 时刻数, 3)
+        r1 = positions[rows_src]
+        r2 = positions[rows_dst]
+        feasible = line_of_sight(r1, r2, min_radius)
+        if max_range_km is not None:
+            with np.errstate(invalid='ignore'):
+                feasible &= np.linalg.norm(r2 - r1, axis=-1) <= max_range_km
+        result.append(feasible.T)
+
+    if not result:
+        return np.zeros((0, len(src)), dtype=bool)
+    return np.concatenate(result)
+
+
+def pack_bitsets(feasible: np.ndarray) -> np.ndarray:
+    """
+    (时刻数, 链接数) bool 打包为每个时刻一个位图
+
+    第k条链接对应第 k // 8 个字节的第 k % 8 位（低位在前）
+    """
+    return np.packbits(feasible, axis=1, bitorder='little')
@@ -0,0 +1,62 @@
+"""
+坐标系转换模块
+TEME -> ECEF（忽略极移），WGS84大地坐标 -> ECEF，以及站心坐标相关计算
+"""
+import numpy as np
+
+# WGS84椭球参数
+WGS84_A = 6378.137                  # 长半轴（km）
+WGS84_F = 1.0 / 298.257223563       # 扁率
+WGS84_E2 = WGS84_F * (2.0 - WGS84_F)  # 第一偏心率平方
+
+
+def gmst(jd: np.ndarray, fr: np.ndarray) -> np.ndarray:
+    """格林尼治平恒星时（IAU-82，弧度），与SGP4输出的TEME坐标配套使用"""
+    tut1 = (jd - 2451545.0 + fr) / 36525.0
+    seconds = (-6.2e-6 * tut1 ** 3 + 0.093104 * tut1 ** 2
+               + (876600.0 * 3600.0 + 8640184.812866) * tut1 + 67310.54841)
+    return np.mod(np.radians(seconds / 240.0), 2.0 * np.pi)
+
+
+def teme_to_ecef(positions: np.ndarray, theta: np.ndarray) -> np.ndarray:
+    """
+    TEME位置转换为ECEF（绕z轴旋转-GMST）
+
+    Args:
+        positions: (..., 时刻数, 3)
+        theta: (时刻数,) GMST弧度
+    """
+    cos_t = np.cos(theta)
+    sin_t = np.sin(theta)
+    x = positions[..., 0]
+    y = positions[..., 1]
+    result = np.empty_like(positions)
+    result[..., 0] = cos_t * x + sin_t * y
+    result[..., 1] = -sin_t * x + cos_t * y
+    result[..., 2] = positions[..., 2]
+    return result
+
+
+def geodetic_to_ecef(lat_deg, lon_deg, alt_km) -> np.ndarray:
+    """WGS84大地坐标（度、度、km）转换为ECEF（km），返回 (..., 3)"""
+    lat = np.radians(np.asarray(lat_deg, dtype=np.float64))
+    lon = np.radians(np.asarray(lon_deg, dtype=np.float64))
+    alt = np.asarray(alt_km, dtype=np.float64)
+    sin_lat = np.sin(lat)
+    n = WGS84_A / np.sqrt(1.0 - WGS84_E2 * sin_lat ** 2)
+    return np.stack([
+        (n + alt) * np.cos(lat) * np.cos(lon),
+        (n + alt) * np.cos(lat) * np.sin(lon),
+        (n * (1.0 - WGS84_E2) + alt) * sin_lat
+    ], axis=-1)
+
+
+def geodetic_up(lat_deg, lon_deg) -> np.ndarray:
+    """站心天顶方向单位向量（椭球法向，ECEF），返回 (..., 3)"""
+    lat = np.radians(np.asarray(lat_deg, dtype=np.float64))
+    lon = np.radians(np.asarray(lon_deg, dtype=np.float64))
+    return np.stack([
+        np.cos(lat) * np.cos(lon),
+        np.cos(lat) * np.sin(lon),
+        np.sin(lat)
+    ], axis=-1)
@@ -0,0 +1,196 @@
+"""
+星间链路（ISL）图索引模块
+按星座将linked_satellite行构建为压缩稀疏行（CSR）邻接结构，并在进程内按版本缓存
+"""
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class LinkRecord(NamedTuple):
+    """链接记录（字段与LinkedSatelliteModel一致）"""
+    id: int
+    satellite_id1: int
+    satellite_id2: int
+    constellation_id: int
+
+
+class ISLGraph:
+    """
+    星座链路图（CSR，无向）
+
+    每条链接在两个端点各存一条邻接项：
+        indptr[i]:indptr[i+1] 为节点i的邻接项区间
+        indices: 邻居节点下标
+        link_ids: 对应链接的主键
+        outgoing: 该节点是否为链接的satellite_id1
+    """
+
+    def __init__(self, constellation_id: int, node_ids: np.ndarray, indptr: np.ndarray,
+                 indices: np.ndarray, link_ids: np.ndarray, outgoing: np.ndarray):
+        self.constellation_id = constellation_id
+        self.node_ids = node_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.link_ids = link_ids
+        self.outgoing = outgoing
+        self._lists = None
+
+    @classmethod
+    def from_rows(cls, constellation_id: int, rows: Iterable[Tuple[int, int, int]]) -> 'ISLGraph':
+        """从 (link_id, satellite_id1, satellite_id2) 行构建"""
+        table = np.array(list(rows), dtype=np.int64).reshape(-1, 3)
+        link_ids, sat1, sat2 = table[:, 0], table[:, 1], table[:, 2]
+
+        node_ids = np.unique(np.concatenate([sat1, sat2])).astype(np.int32)
+        n_links = len(link_ids)
+
+        # 每条链接展开为两个方向的邻接项
+        src = np.searchsorted(node_ids, np.concatenate([sat1, sat2]))
+        dst = np.searchsorted(node_ids, np.concatenate([sat2, sat1]))
+        outgoing = np.concatenate([np.ones(n_links, dtype=bool), np.zeros(n_links, dtype=bool)])
+        edge_link_ids = np.concatenate([link_ids, link_ids])
+
+        order = np.argsort(src, kind='stable')
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(node_ids)), out=indptr[1:])
+
+        return cls(
+            constellation_id,
+            node_ids,
+            indptr,
+            dst[order].astype(np.int32),
+            edge_link_ids[order],
+            outgoing[order]
+        )
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def link_count(self) -> int:
+        return len(self.indices) // 2
+
+    def edge_sources(self) -> np.ndarray:
+        """每个邻接项的源节点下标（与indices对齐）"""
+        return np.repeat(np.arange(self.node_count), np.diff(self.indptr))
+
+    def as_lists(self) -> Tuple[List[int], List[int]]:
+        """(indptr, indices) 的Python列表形式（供图搜索的内层循环使用，惰性构建）"""
+        if self._lists is None:
+            self._lists = (self.indptr.tolist(), self.indices.tolist())
+        return self._lists
+
+    def node_index(self, satellite_id: int) -> Optional[int]:
+        """卫星ID -> 节点下标（不在图中返回None）"""
+        i = int(np.searchsorted(self.node_ids, satellite_id))
+        if i < len(self.node_ids) and self.node_ids[i] == satellite_id:
+            return i
+        return None
+
+    def neighbors(self, satellite_id: int) -> np.ndarray:
+        """获取邻居卫星ID（O(度)）"""
+        i = self.node_index(satellite_id)
+        if i is None:
+            return np.zeros(0, dtype=np.int32)
+        return self.node_ids[self.indices[self.indptr[i]:self.indptr[i + 1]]]
+
+    def has_link(self, satellite_id1: int, satellite_id2: int) -> bool:
+        """检查两颗卫星之间是否存在链接（不区分方向）"""
+        return bool(np.any(self.neighbors(satellite_id1) == satellite_id2))
+
+    def links_of(self, satellite_id: int) -> Tuple[List[LinkRecord], List[LinkRecord]]:
+        """
+        获取卫星的链接
+
+        Returns:
+            (links_from, links_to): 该卫星作为satellite_id1 / satellite_id2的链接
+        """
+        i = self.node_index(satellite_id)
+        if i is None:
+            return [], []
+        start, end = self.indptr[i], self.indptr[i + 1]
+        links_from = []
+        links_to = []
+        for link_id, neighbor, outgoing in zip(self.link_ids[start:end].tolist(),
+                                               self.node_ids[self.indices[start:end]].tolist(),
+                                               self.outgoing[start:end].tolist()):
+            if outgoing:
+                links_from.append(LinkRecord(link_id, satellite_id, neighbor, self.constellation_id))
+            else:
+                links_to.append(LinkRecord(link_id, neighbor, satellite_id, self.constellation_id))
+        return links_from, links_to
+
+    def link_order(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        按链接主键升序排列的所有链接
+
+        Returns:
+            (link_ids, 源节点下标, 目的节点下标)，源为satellite_id1一端
+        """
+        src = self.edge_sources()[self.outgoing]
+        dst = self.indices[self.outgoing]
+        link_ids = self.link_ids[self.outgoing]
+        order = np.argsort(link_ids, kind='stable')
+        return link_ids[order], src[order], dst[order]
+
+    def edge_mask(self, link_mask: np.ndarray) -> np.ndarray:
+        """
+        将按link_order()排列的链接掩码展开为邻接项掩码（与indices对齐）
+
+        链接的两个方向邻接项取相同的值
+        """
+        link_ids = np.sort(self.link_ids[self.outgoing])
+        return np.asarray(link_mask, dtype=bool)[np.searchsorted(link_ids, self.link_ids)]
+
+    def edge_pairs(self) -> np.ndarray:
+        """所有链接的 (satellite_id1, satellite_id2) 数组，形状 (链接数, 2)"""
+        src = self.edge_sources()
+        mask = self.outgoing
+        return np.stack([self.node_ids[src[mask]], self.node_ids[self.indices[mask]]], axis=1)
+
+
+class ISLGraphCache:
+    """
+    链路图的进程内缓存（线程安全）
+    缓存的图记录构建时星座的数据版本号（数据库中ConstellationModel.data_version），
+    调用方每次传入当前版本号，不一致时重建；版本号随卫星、链接的任何变更在数据库中递增，
+    因此其他进程或绕过DAL的写入（如Flask视图）也会使缓存失效
+    """
+
+    def __init__(self):
+        self._graphs: Dict[int, Tuple[int, ISLGraph]] = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self, constellation_id: int) -> None:
+        """丢弃星座的缓存图（如星座删除后释放内存）"""
+        with self._lock:
+            self._graphs.pop(constellation_id, None)
+
+    def get(self, constellation_id: int, version: Optional[int], loader: Callable[[], ISLGraph]) -> ISLGraph:
+        """
+        获取星座链路图，缓存的版本与version不一致时通过loader重建
+
+        Args:
+            constellation_id: 星座ID
+            version: 星座当前的数据版本号，应在loader读取链接之前读取；None表示星座不存在，不缓存
+            loader: 从数据库构建链路图
+        """
+        with self._lock:
+            cached = self._graphs.get(constellation_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        # 在锁外加载，避免阻塞其他星座
+        graph = loader()
+
+        if version is not None:
+            with self._lock:
+                self._graphs[constellation_id] = (version, graph)
+        return graph
+
+
+# 进程级单例
+isl_graph_cache = ISLGraphCache()
@@ -0,0 +1,161 @@
+"""
+轨道传播模块
+将星座的TLE一次性解析为打包的数组，并在时间网格上批量进行SGP4传播
+"""
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sgp4.api import Satrec, SatrecArray
+
+from .tle import UNIX_EPOCH_JD, TLEElements, tle_cache
+
+SECONDS_PER_DAY = 86400.0
+
+
+def count_epochs(start_time: int, end_time: int, step_seconds: int) -> int:
+    """
+    时间网格的时刻数（包含起止时刻），不构建网格；用于在分配内存之前检查请求规模
+
+    Raises:
+        ValueError: 步长不为正或结束时刻早于起始时刻
+    """
+    if step_seconds <= 0:
+        raise ValueError("step_seconds must be positive")
+    if end_time < start_time:
+        raise ValueError("end_time must not be earlier than start_time")
+    return (end_time - start_time) // step_seconds + 1
+
+
+def build_time_grid(start_time: int, end_time: int, step_seconds: int) -> np.ndarray:
+    """
+    构建时间网格（Unix秒，包含起止时刻）
+
+    Args:
+        start_time: 起始时刻（Unix秒）
+        end_time: 结束时刻（Unix秒）
+        step_seconds: 步长（秒）
+
+    Returns:
+        np.ndarray: int64时间数组
+    """
+    if step_seconds <= 0:
+        raise ValueError("step_seconds must be positive")
+    if end_time < start_time:
+        raise ValueError("end_time must not be earlier than start_time")
+    return np.arange(start_time, end_time + 1, step_seconds, dtype=np.int64)
+
+
+def iter_time_chunks(start_time: int, end_time: int, step_seconds: int,
+                     epochs_per_chunk: int) -> Iterator[np.ndarray]:
+    """
+    按块生成时间网格（每块最多epochs_per_chunk个时刻）
+    不会一次性构建完整网格，内存占用与窗口长度无关
+    """
+    if step_seconds <= 0:
+        raise ValueError("step_seconds must be positive")
+    if end_time < start_time:
+        raise ValueError("end_time must not be earlier than start_time")
+    if epochs_per_chunk <= 0:
+        raise ValueError("epochs_per_chunk must be positive")
+
+    chunk_span = step_seconds * epochs_per_chunk
+    chunk_start = start_time
+    while chunk_start <= end_time:
+        chunk_end = min(chunk_start + chunk_span - step_seconds, end_time)
+        yield build_time_grid(chunk_start, chunk_end, step_seconds)
+        chunk_start += chunk_span
+
+
+def unix_to_jd(unix_seconds) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Unix秒转换为儒略日（整数部分 + 小数部分，分开保存以保证精度）
+
+    Returns:
+        (jd, fr): 两个float64数组
+    """
+    days = np.asarray(unix_seconds, dtype=np.float64) / SECONDS_PER_DAY
+    whole_days = np.floor(days)
+    return whole_days + UNIX_EPOCH_JD, days - whole_days
+
+
+class PackedConstellation:
+    """
+    打包后的星座
+    TLE只解析一次，之后整个星座在时间网格上通过一次向量化调用完成传播
+    """
+
+    def __init__(self, satellite_ids: List[int], satrecs: List[Satrec],
+                 elements: List[TLEElements], errors: Optional[List[str]] = None):
+        self.satellite_ids = np.asarray(satellite_ids, dtype=np.int32)
+        self.errors = errors or []
+        self._satrecs = satrecs
+        self._elements = elements
+        self._array = SatrecArray(satrecs) if satrecs else None
+
+    def __len__(self) -> int:
+        return len(self._satrecs)
+
+    @classmethod
+    def from_tle_rows(cls, rows: Iterable[Tuple[int, str, str]]) -> 'PackedConstellation':
+        """
+        从 (satellite_id, info_line1, info_line2) 行构建
+
+        TLE通过进程级缓存编译，解析失败的卫星会被跳过，原因记录在errors中
+        """
+        satellite_ids = []
+        satrecs = []
+        elements = []
+        errors = []
+        for satellite_id, info_line1, info_line2 in rows:
+            try:
+                compiled = tle_cache.get(info_line1, info_line2)
+            except ValueError as e:
+                errors.append(f"Satellite {satellite_id}: {str(e)}")
+                continue
+            satellite_ids.append(satellite_id)
+            satrecs.append(compiled.satrec)
+            elements.append(compiled.elements)
+        return cls(satellite_ids, satrecs, elements, errors)
+
+    def index_of(self, satellite_ids) -> np.ndarray:
+        """卫星ID -> 打包后的下标（不在星座中或TLE无效的为-1）"""
+        satellite_ids = np.asarray(satellite_ids, dtype=np.int64)
+        if len(self) == 0:
+            return np.full(len(satellite_ids), -1, dtype=np.int64)
+        order = np.argsort(self.satellite_ids, kind='stable')
+        sorted_ids = self.satellite_ids[order]
+        pos = np.clip(np.searchsorted(sorted_ids, satellite_ids), 0, len(sorted_ids) - 1)
+        return np.where(sorted_ids[pos] == satellite_ids, order[pos], -1)
+
+    def element_arrays(self) -> dict:
+        """
+        轨道根数打包为NumPy数组（字段含义见TLEElements）
+
+        Returns:
+            dict: 根数名称 -> float64数组（长度为卫星数）
+        """
+        columns = np.array(self._elements, dtype=np.float64).reshape(len(self), len(TLEElements._fields))
+        return {name: columns[:, i] for i, name in enumerate(TLEElements._fields)}
+
+    def propagate(self, times: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        在时间网格上传播所有卫星（TEME坐标系）
+
+        Args:
+            times: Unix秒数组
+
+        Returns:
+            (errors, positions, velocities):
+                errors: (卫星数, 时刻数) uint8，非0表示SGP4错误码
+                positions: (卫星数, 时刻数, 3) km
+                velocities: (卫星数, 时刻数, 3) km/s
+        """
+        n_times = len(times)
+        if self._array is None:
+            return (
+                np.zeros((0, n_times), dtype=np.uint8),
+                np.zeros((0, n_times, 3)),
+                np.zeros((0, n_times, 3))
+            )
+        jd, fr = unix_to_jd(times)
+        return self._array.sgp4(jd, fr)
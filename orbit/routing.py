@@ -0,0 +1,177 @@
+"""
+星间链路路由模块
+在缓存的CSR链路图上计算最短跳数路径和按时延加权的最短路径（Dijkstra/A*）
+"""
+import heapq
+import math
+from collections import deque
+from typing import List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from .isl_graph import ISLGraph
+from .propagator import PackedConstellation
+
+# 真空光速（km/s）
+SPEED_OF_LIGHT_KM_S = 299792.458
+
+# 路由表计算时每批处理的目的节点数（限制中间矩阵的内存）
+ROUTING_TABLE_BLOCK = 512
+
+
+def _reconstruct(parent: dict, target: int) -> List[int]:
+    """根据前驱表还原节点下标路径"""
+    path = [target]
+    while parent[path[-1]] >= 0:
+        path.append(parent[path[-1]])
+    path.reverse()
+    return path
+
+
+def shortest_hop_path(graph: ISLGraph, source: int, target: int) -> Optional[List[int]]:
+    """
+    最短跳数路径（BFS）
+
+    Args:
+        source/target: 卫星ID
+
+    Returns:
+        卫星ID路径，不可达返回None
+    """
+    src = graph.node_index(source)
+    dst = graph.node_index(target)
+    if src is None or dst is None:
+        return None
+
+    indptr, indices = graph.as_lists()
+    parent = {src: -1}
+    queue = deque([src])
+    while queue:
+        u = queue.popleft()
+        if u == dst:
+            return graph.node_ids[_reconstruct(parent, dst)].tolist()
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if v not in parent:
+                parent[v] = u
+                queue.append(v)
+    return None
+
+
+def node_positions(graph: ISLGraph, packed: PackedConstellation, unix_time: int) -> np.ndarray:
+    """
+    计算图中各节点在某时刻的位置（TEME，km），与graph.node_ids对齐
+
+    TLE无效或传播失败的节点位置为NaN
+    """
+    positions = np.full((graph.node_count, 3), np.nan)
+    if len(packed) == 0:
+        return positions
+    errors, r, _ = packed.propagate(np.array([unix_time], dtype=np.int64))
+    r = r[:, 0, :]
+    r[errors[:, 0] != 0] = np.nan
+
+    # 图节点映射到packed中的卫星
+    rows = packed.index_of(graph.node_ids)
+    found = rows >= 0
+    positions[found] = r[rows[found]]
+    return positions
+
+
+def edge_distances(graph: ISLGraph, positions: np.ndarray) -> np.ndarray:
+    """所有邻接项的端点距离（km，一次向量化计算），端点位置未知的为inf"""
+    distances = np.linalg.norm(positions[graph.edge_sources()] - positions[graph.indices], axis=1)
+    distances[np.isnan(distances)] = np.inf
+    return distances
+
+
+def shortest_weighted_path(graph: ISLGraph, source: int, target: int, positions: np.ndarray
+                           ) -> Optional[Tuple[List[int], float]]:
+    """
+    按距离加权的最短路径（A*，启发函数为到终点的直线距离，满足一致性）
+
+    Args:
+        source/target: 卫星ID
+        positions: node_positions() 的结果
+
+    Returns:
+        (卫星ID路径, 总距离km)，不可达返回None
+    """
+    src = graph.node_index(source)
+    dst = graph.node_index(target)
+    if src is None or dst is None:
+        return None
+
+    indptr, indices = graph.as_lists()
+    weights = edge_distances(graph, positions).tolist()
+    heuristic = np.linalg.norm(positions - positions[dst], axis=1)
+    heuristic = np.nan_to_num(heuristic, nan=0.0).tolist()
+
+    dist = {src: 0.0}
+    parent = {src: -1}
+    closed = set()
+    heap = [(heuristic[src], 0.0, src)]
+    while heap:
+        _, d, u = heapq.heappop(heap)
+        if u == dst:
+            return graph.node_ids[_reconstruct(parent, dst)].tolist(), d
+        if u in closed:
+            continue
+        closed.add(u)
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + weights[k]
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                parent[v] = u
+                heapq.heappush(heap, (nd + heuristic[v], nd, v))
+    return None
+
+
+def distance_to_latency_ms(distance_km: float) -> float:
+    """传播距离转换为光速时延（毫秒）"""
+    return distance_km / SPEED_OF_LIGHT_KM_S * 1000.0
+
+
+def next_hop_table(graph: ISLGraph, positions: Optional[np.ndarray] = None,
+                   link_mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    计算全网路由表（每个节点到每个目的节点的下一跳）
+
+    Args:
+        positions: node_positions() 的结果；为None时按跳数计算，否则按星间距离计算
+        link_mask: 可选，按graph.link_order()排列的链接可用掩码（link_feasibility()的一行），
+            不可用的链接不参与路由
+
+    Returns:
+        (节点数, 节点数) 矩阵，[i, j] 为从节点i去往节点j的下一跳节点下标，
+        不可达为-1，i == j时为i本身。节点数小于32768时为int16，否则为int32
+    """
+    n = graph.node_count
+    dtype = np.int16 if n < 2 ** 15 else np.int32
+    table = np.full((n, n), -1, dtype=dtype)
+    if n == 0:
+        return table
+
+    # 去掉端点位置未知的邻接项后构建CSR矩阵
+    if positions is None:
+        weights = np.ones(len(graph.indices))
+    else:
+        weights = edge_distances(graph, positions)
+    valid = np.isfinite(weights)
+    if link_mask is not None:
+        valid &= graph.edge_mask(link_mask)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(graph.edge_sources()[valid], minlength=n), out=indptr[1:])
+    matrix = csr_matrix((weights[valid], graph.indices[valid], indptr), shape=(n, n))
+
+    # 无向图中，以j为源的最短路径树上i的前驱即为i去往j的下一跳
+    for start in range(0, n, ROUTING_TABLE_BLOCK):
+        block = np.arange(start, min(start + ROUTING_TABLE_BLOCK, n))
+        _, predecessors = dijkstra(matrix, directed=False, indices=block, return_predecessors=True)
+        predecessors[predecessors < 0] = -1
+        table[:, block] = predecessors.T
+        table[block, block] = block
+    return table
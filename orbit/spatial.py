@@ -0,0 +1,100 @@
+"""
+空间预筛选模块
+按经纬度网格对基座分桶，每个网格用中心方向和角半径近似；
+对每个网格先用覆盖区（足迹）角度的保守上界筛出可能过顶的卫星，再做精确的仰角计算
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from .frames import WGS84_A, WGS84_F
+
+# 默认网格大小（度）
+DEFAULT_CELL_DEG = 10.0
+# 地心半径下界（极半径再留1km余量），半径越小覆盖区越大，保证筛选保守
+MIN_EARTH_RADIUS = WGS84_A * (1.0 - WGS84_F) - 1.0
+# 地心方向与大地天顶方向的偏差（最大约0.19度）等近似误差的余量
+ANGLE_MARGIN = np.radians(0.5)
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    """按最后一维归一化"""
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def footprint_angle(radius: np.ndarray, min_elevation_deg: float) -> np.ndarray:
+    """
+    卫星在仰角门限下的覆盖区地心半角（弧度）
+
+    lambda = arccos(R * cos(e) / r) - e，R取地心半径下界
+    """
+    elevation = np.radians(min_elevation_deg)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = MIN_EARTH_RADIUS * np.cos(elevation) / radius
+    return np.arccos(np.clip(ratio, -1.0, 1.0)) - elevation
+
+
+class LatLonGrid:
+    """
+    基座经纬度网格索引
+
+    Attributes:
+        cells: 每个网格内的基座下标数组
+        centers: (网格数, 3) 网格中心方向（单位向量）
+        radii: (网格数,) 网格内基座相对中心方向的最大夹角（弧度）
+    """
+
+    def __init__(self, latitudes, longitudes, base_ecef: np.ndarray, cell_deg: float = DEFAULT_CELL_DEG):
+        if cell_deg <= 0:
+            raise ValueError("cell_deg must be positive")
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        directions = _unit(np.asarray(base_ecef, dtype=np.float64).reshape(-1, 3))
+
+        rows = np.floor((latitudes + 90.0) / cell_deg).astype(np.int64)
+        cols = np.floor((longitudes + 180.0) / cell_deg).astype(np.int64)
+        _, inverse = np.unique(rows * 1000003 + cols, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.flatnonzero(np.diff(inverse[order])) + 1
+
+        self.cell_deg = cell_deg
+        self.cells: List[np.ndarray] = np.split(order, bounds) if len(order) else []
+        self.centers = np.zeros((len(self.cells), 3))
+        self.radii = np.zeros(len(self.cells))
+        for i, members in enumerate(self.cells):
+            center = _unit(directions[members].sum(axis=0))
+            self.centers[i] = center
+            self.radii[i] = np.arccos(np.clip(directions[members] @ center, -1.0, 1.0)).max()
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def candidates(self, sat_ecef: np.ndarray, min_elevation_deg: float) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        筛选每个网格可能看到的卫星
+
+        Args:
+            sat_ecef: (卫星数, 时刻数, 3) km，位置未知为NaN
+            min_elevation_deg: 仰角门限（度）
+
+        Returns:
+            [(基座下标, 候选卫星下标)]，只包含有候选卫星的网格；
+            不在候选中的 (基座, 卫星) 在所有时刻都低于门限
+        """
+        radius = np.linalg.norm(sat_ecef, axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            directions = sat_ecef / radius[..., None]
+        # (卫星数, 时刻数) 覆盖区半角 + 余量
+        limit = footprint_angle(radius, min_elevation_deg) + ANGLE_MARGIN
+
+        # 一次矩阵乘法得到所有 (卫星, 时刻, 网格) 的夹角
+        angle = np.arccos(np.clip(directions @ self.centers.T, -1.0, 1.0))
+        with np.errstate(invalid='ignore'):
+            hit = np.any(angle <= limit[..., None] + self.radii, axis=1)
+
+        result = []
+        for cell, members in enumerate(self.cells):
+            sat_index = np.flatnonzero(hit[:, cell])
+            if len(sat_index):
+                result.append((members, sat_index))
+        return result
@@ -0,0 +1,183 @@
+"""
+TLE解析与缓存模块
+按固定列解析TLE两行为轨道根数，并提供进程内LRU缓存（以TLE两行的哈希为键）
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import NamedTuple
+
+from sgp4.api import Satrec, WGS72
+
+# TLE单行的标准长度
+TLE_LINE_LENGTH = 69
+
+# Unix纪元（1970-01-01）对应的儒略日
+UNIX_EPOCH_JD = 2440587.5
+
+# 缓存默认容量（条）
+DEFAULT_CACHE_SIZE = 50000
+
+
+class TLEElements(NamedTuple):
+    """TLE轨道根数（角度单位为度，平均运动单位为 圈/天）"""
+    epoch_jd: float
+    inclination: float
+    raan: float
+    eccentricity: float
+    arg_perigee: float
+    mean_anomaly: float
+    mean_motion: float
+    bstar: float
+
+
+class CompiledTLE(NamedTuple):
+    """编译后的TLE：轨道根数 + SGP4传播对象"""
+    elements: TLEElements
+    satrec: Satrec
+
+
+def tle_checksum(line: str) -> int:
+    """计算TLE行校验和（前68列数字之和，'-'计为1，模10）"""
+    total = 0
+    for char in line[:TLE_LINE_LENGTH - 1]:
+        if char.isdigit():
+            total += int(char)
+        elif char == '-':
+            total += 1
+    return total % 10
+
+
+def _check_line(line: str, line_number: int) -> None:
+    """检查TLE单行的格式和校验和"""
+    if len(line) < TLE_LINE_LENGTH or not line.startswith(f"{line_number} "):
+        raise ValueError(f"invalid TLE line {line_number}")
+    if not line[TLE_LINE_LENGTH - 1].isdigit() or int(line[TLE_LINE_LENGTH - 1]) != tle_checksum(line):
+        raise ValueError(f"TLE line {line_number} checksum mismatch")
+
+
+def _parse_exponent_field(field: str) -> float:
+    """解析TLE中的假定小数点指数字段（如 ' 38792-4' -> 0.38792e-4）"""
+    field = field.strip()
+    if not field:
+        return 0.0
+    sign = -1.0 if field[0] == '-' else 1.0
+    field = field.lstrip('+-')
+    mantissa, exponent = field[:-2], field[-2:]
+    return sign * float(f"0.{mantissa}") * 10 ** int(exponent)
+
+
+def _epoch_to_jd(epoch_year: int, epoch_day: float) -> float:
+    """TLE历元（两位年份 + 年积日）转换为儒略日"""
+    year = 2000 + epoch_year if epoch_year < 57 else 1900 + epoch_year
+    jan1 = (date(year, 1, 1) - date(1970, 1, 1)).days + UNIX_EPOCH_JD
+    return jan1 + epoch_day - 1.0
+
+
+def parse_tle(info_line1: str, info_line2: str) -> TLEElements:
+    """
+    按固定列解析TLE两行（包含校验和验证）
+
+    Raises:
+        ValueError: 格式错误或校验和不匹配
+    """
+    line1 = info_line1.strip()
+    line2 = info_line2.strip()
+    _check_line(line1, 1)
+    _check_line(line2, 2)
+    try:
+        return TLEElements(
+            epoch_jd=_epoch_to_jd(int(line1[18:20]), float(line1[20:32])),
+            inclination=float(line2[8:16]),
+            raan=float(line2[17:25]),
+            eccentricity=float(f"0.{line2[26:33].strip()}"),
+            arg_perigee=float(line2[34:42]),
+            mean_anomaly=float(line2[43:51]),
+            mean_motion=float(line2[52:63]),
+            bstar=_parse_exponent_field(line1[53:61])
+        )
+    except ValueError as e:
+        raise ValueError(f"invalid TLE field: {str(e)}")
+
+
+def tle_key(info_line1: str, info_line2: str) -> str:
+    """TLE两行的哈希（缓存键）"""
+    digest = hashlib.sha1()
+    digest.update(info_line1.strip().encode('ascii', errors='replace'))
+    digest.update(b'\n')
+    digest.update(info_line2.strip().encode('ascii', errors='replace'))
+    return digest.hexdigest()
+
+
+class TLECache:
+    """
+    编译后TLE的进程内LRU缓存（线程安全）
+    以TLE两行的哈希为键，避免每次传播/校验重复解析
+    """
+
+    def __init__(self, max_size: int = DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, info_line1: str, info_line2: str) -> CompiledTLE:
+        """
+        获取编译后的TLE，未命中时解析并加入缓存
+
+        Raises:
+            ValueError: TLE格式错误或校验和不匹配（错误结果不缓存）
+        """
+        key = tle_key(info_line1, info_line2)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        # 在锁外解析，避免阻塞其他线程
+        line1 = info_line1.strip()
+        line2 = info_line2.strip()
+        elements = parse_tle(line1, line2)
+        compiled = CompiledTLE(elements, Satrec.twoline2rv(line1, line2, WGS72))
+
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def invalidate(self, info_line1: str, info_line2: str) -> bool:
+        """删除某条TLE的缓存，返回是否存在"""
+        key = tle_key(info_line1, info_line2)
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        """清空缓存（计数器保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """缓存统计信息（用于确定缓存容量）"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# 进程级单例
+tle_cache = TLECache()
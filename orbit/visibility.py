@@ -0,0 +1,142 @@
+"""
+地面站可见性模块
+计算 (基座, 卫星) 对在时间范围内高于仰角门限的可见窗口（升起/降落时刻）
+基座和卫星两个维度一次向量化计算，时间维度分块处理以限制内存
+"""
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .frames import gmst, teme_to_ecef
+from .propagator import PackedConstellation, iter_time_chunks, unix_to_jd
+from .spatial import LatLonGrid
+
+# 每块 基座数×卫星数×时刻数 的上限（限制中间数组内存）
+MAX_CHUNK_POINTS = 2000000
+
+
+class VisibilityWindows(NamedTuple):
+    """可见窗口（按基座、卫星、升起时刻排序），时刻为Unix秒"""
+    base_index: np.ndarray
+    satellite_index: np.ndarray
+    rise_time: np.ndarray
+    set_time: np.ndarray
+
+
+def elevation_deg(sat_ecef: np.ndarray, base_ecef: np.ndarray, base_up: np.ndarray) -> np.ndarray:
+    """
+    计算所有 (基座, 卫星, 时刻) 的仰角
+
+    Args:
+        sat_ecef: (卫星数, 时刻数, 3) km
+        base_ecef: (基座数, 3) km
+        base_up: (基座数, 3) 天顶方向单位向量
+
+    Returns:
+        (基座数, 卫星数, 时刻数) 仰角（度），卫星位置未知时为NaN
+    """
+    n_sat, n_times, _ = sat_ecef.shape
+    flat = sat_ecef.reshape(-1, 3)
+    # 展开 |s - b|^2 和 (s - b)·u，用两次矩阵乘法代替 (基座, 卫星, 时刻, 3) 的差向量数组
+    dot_up = base_up @ flat.T - np.sum(base_ecef * base_up, axis=1)[:, None]
+    range_sq = (np.sum(flat ** 2, axis=1)[None, :]
+                - 2.0 * (base_ecef @ flat.T)
+                + np.sum(base_ecef ** 2, axis=1)[:, None])
+    sin_el = dot_up / np.sqrt(np.maximum(range_sq, 1e-12))
+    elevation = np.degrees(np.arcsin(np.clip(sin_el, -1.0, 1.0)))
+    return elevation.reshape(len(base_ecef), n_sat, n_times)
+
+
+def _prefiltered_elevation(sat_ecef, base_ecef, base_up, grid, min_elevation_deg):
+    """先按网格筛选候选卫星，只对候选 (基座, 卫星) 对计算仰角，其余填NaN（视为不可见）"""
+    elevation = np.full((len(base_ecef),) + sat_ecef.shape[:2], np.nan)
+    for base_index, sat_index in grid.candidates(sat_ecef, min_elevation_deg):
+        elevation[np.ix_(base_index, sat_index)] = elevation_deg(
+            sat_ecef[sat_index], base_ecef[base_index], base_up[base_index]
+        )
+    return elevation
+
+
+def _crossing_times(elevation, times, b, s, k, min_elevation_deg):
+    """在采样点k和k+1之间线性插值仰角穿越门限的时刻"""
+    el0 = elevation[b, s, k]
+    el1 = elevation[b, s, k + 1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        frac = np.clip((min_elevation_deg - el0) / (el1 - el0), 0.0, 1.0)
+    # 一端位置未知时取后一个采样时刻
+    frac = np.where(np.isfinite(frac), frac, 1.0)
+    return times[k] + frac * (times[k + 1] - times[k])
+
+
+def compute_visibility_windows(packed: PackedConstellation, base_ecef: np.ndarray, base_up: np.ndarray,
+                               start_time: int, end_time: int, step_seconds: int,
+                               min_elevation_deg: float, grid: Optional[LatLonGrid] = None) -> VisibilityWindows:
+    """
+    计算所有 (基座, 卫星) 对的可见窗口
+
+    窗口起止按采样点之间的线性插值细化；时间范围开始时已可见的窗口从start_time算起，
+    结束时仍可见的窗口截断到最后一个采样时刻。
+    提供grid时每个时间块先按基座网格筛选可能过顶的卫星，只对候选对做精确计算；
+    候选对在整个时间块（含拼接的上一采样点）上都精确计算，插值用到的相邻点不会缺失，
+    结果与不筛选时一致
+    """
+    n_pairs = max(len(base_ecef) * len(packed), 1)
+    epochs_per_chunk = max(2, MAX_CHUNK_POINTS // n_pairs)
+
+    rises = []
+    sets = []
+    prev_ecef = None
+    prev_elevation = None
+    prev_time = None
+    for chunk in iter_time_chunks(start_time, end_time, step_seconds, epochs_per_chunk):
+        errors, positions, _ = packed.propagate(chunk)
+        positions[errors != 0] = np.nan
+        jd, fr = unix_to_jd(chunk)
+        sat_ecef = teme_to_ecef(positions, gmst(jd, fr))
+        times = chunk.astype(np.float64)
+
+        if prev_ecef is not None:
+            # 拼接上一块的最后一个采样点，保证跨块的穿越不会丢失
+            sat_ecef = np.concatenate([prev_ecef[:, None, :], sat_ecef], axis=1)
+            times = np.concatenate([[prev_time], times])
+
+        if grid is None:
+            elevation = elevation_deg(sat_ecef, base_ecef, base_up)
+        else:
+            elevation = _prefiltered_elevation(sat_ecef, base_ecef, base_up, grid, min_elevation_deg)
+
+        if prev_ecef is None:
+            # 起始时刻已可见
+            b, s = np.nonzero(elevation[:, :, 0] >= min_elevation_deg)
+            rises.append((b, s, np.full(len(b), times[0])))
+
+        visible = elevation >= min_elevation_deg
+        rising = ~visible[:, :, :-1] & visible[:, :, 1:]
+        setting = visible[:, :, :-1] & ~visible[:, :, 1:]
+        for mask, events in ((rising, rises), (setting, sets)):
+            b, s, k = np.nonzero(mask)
+            events.append((b, s, _crossing_times(elevation, times, b, s, k, min_elevation_deg)))
+
+        prev_ecef = sat_ecef[:, -1]
+        prev_elevation = elevation[:, :, -1]
+        prev_time = times[-1]
+
+    # 结束时刻仍可见
+    if prev_elevation is not None:
+        b, s = np.nonzero(prev_elevation >= min_elevation_deg)
+        sets.append((b, s, np.full(len(b), prev_time)))
+
+    def _sorted(events):
+        if not events:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+        b = np.concatenate([e[0] for e in events])
+        s = np.concatenate([e[1] for e in events])
+        t = np.concatenate([e[2] for e in events])
+        order = np.lexsort((t, s, b))
+        return b[order], s[order], t[order]
+
+    # 同一 (基座, 卫星) 的升起和降落严格交替，排序后第k个升起与第k个降落配对
+    rise_b, rise_s, rise_t = _sorted(rises)
+    _, _, set_t = _sorted(sets)
+    return VisibilityWindows(rise_b, rise_s, rise_t, set_t)
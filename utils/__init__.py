@@ -2,6 +2,6 @@
 工具模块初始化
 """
 from .jwt_auth import JWTAuth
-from .app_context import with_app_context, with_app_context_stream
+from .app_context import with_app_context, with_app_context_stream, create_db_app
 
-__all__ = ['JWTAuth', 'with_app_context', 'with_app_context_stream']
+__all__ = ['JWTAuth', 'with_app_context', 'with_app_context_stream', 'create_db_app']
@@ -1,9 +1,29 @@
 """
 Flask应用上下文装饰器
-用于在gRPC服务中提供Flask应用上下文
+用于在gRPC服务中提供Flask应用上下文，以及不依赖应用上下文的调用级数据库会话
 """
+import threading
 from functools import wraps
 from flask import Flask
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+
+def create_db_app(import_name: str = __name__) -> Flask:
+    """
+    创建仅用于数据库访问的Flask应用（gRPC服务、批处理任务使用）
+
+    Args:
+        import_name: Flask应用的import_name
+    """
+    from history.exts import db
+    from history.config import SQLALCHEMY_DATABASE_URI, SQLALCHEMY_TRACK_MODIFICATIONS, SECRET_KEY
+
+    app = Flask(import_name)
+    app.config['SQLALCHEMY_DATABASE_URI'] = SQLALCHEMY_DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = SQLALCHEMY_TRACK_MODIFICATIONS
+    app.config['SECRET_KEY'] = SECRET_KEY
+    db.init_app(app)
+    return app
 
 
 def with_app_context(app: Flask):
@@ -37,3 +57,49 @@ def with_app_context_stream(app: Flask):
                     yield item
         return wrapper
     return decorator
+
+
+class CallSessionScope:
+    """
+    gRPC调用级的数据库会话作用域（不推入/弹出Flask应用上下文）
+
+    Flask-SQLAlchemy默认按当前应用上下文划分db.session，应用上下文保存在contextvars中；
+    而grpc为每次调用新建一个contextvars.Context（grpc._server._RPCState.context），
+    之前的调用在同一工作线程中推入的应用上下文对后续调用不可见，has_app_context()总是False，
+    只能每次调用推入/弹出一次。这里把db.session换成直接绑定engine的scoped_session，
+    以拦截器为每次调用创建的令牌为作用域键（令牌保存在线程局部变量中，流式调用每一步执行前重新设置）：
+    会话在调用第一次访问db.session时才创建，调用结束时关闭并移除，不访问数据库的调用没有额外开销。
+    令牌之外（启动、批处理等）按线程划分会话
+
+    Args:
+        app: 已初始化db的Flask应用（只在创建时用于取得engine）
+    """
+
+    def __init__(self, app: Flask):
+        from history.exts import db
+
+        with app.app_context():
+            engine = db.engine
+        self._local = threading.local()
+        self.session = scoped_session(sessionmaker(bind=engine), scopefunc=self._scope_key)
+        db.session = self.session
+
+    def _scope_key(self):
+        return getattr(self._local, 'token', None) or threading.get_ident()
+
+    def activate(self, token):
+        """把token设为当前线程的会话作用域，返回之前的令牌（传给deactivate/release恢复）"""
+        previous = getattr(self._local, 'token', None)
+        self._local.token = token
+        return previous
+
+    def deactivate(self, previous) -> None:
+        """恢复之前的作用域（会话保留，供同一调用的下一步使用）"""
+        self._local.token = previous
+
+    def release(self, previous) -> None:
+        """关闭并移除当前作用域的会话（未创建时无操作），然后恢复之前的作用域"""
+        try:
+            self.session.remove()
+        finally:
+            self._local.token = previous
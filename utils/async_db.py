@@ -0,0 +1,51 @@
+"""
+异步数据库引擎
+asyncio gRPC服务（grpc_server.py --aio）使用SQLAlchemy异步引擎访问数据库，
+查询等待期间不占用线程，同一进程内可以同时处理大量请求
+"""
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+# 同步驱动 -> 对应的异步驱动
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+
+def to_async_uri(uri: str) -> str:
+    """把同步驱动的数据库URI换成对应的异步驱动（已是异步驱动时原样返回）"""
+    url = make_url(uri)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    if driver is None:
+        return uri
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def create_async_db_engine() -> AsyncEngine:
+    """
+    按配置创建异步数据库引擎
+
+    优先使用config中的ASYNC_DATABASE_URI，未配置时由SQLALCHEMY_DATABASE_URI换用异步驱动得到；
+    连接池大小与同步引擎使用相同的配置项
+    """
+    from history import config
+
+    uri = getattr(config, 'ASYNC_DATABASE_URI', None) or to_async_uri(config.SQLALCHEMY_DATABASE_URI)
+    options = {}
+    if not make_url(uri).drivername.startswith('sqlite'):
+        options = {
+            'pool_size': getattr(config, 'SQLALCHEMY_POOL_SIZE', 20),
+            'max_overflow': getattr(config, 'SQLALCHEMY_MAX_OVERFLOW', 40),
+            'pool_recycle': getattr(config, 'SQLALCHEMY_POOL_RECYCLE', 3600),
+            'pool_pre_ping': True,
+        }
+    return create_async_engine(uri, **options)
+
+
+def create_async_session_factory(engine: AsyncEngine) -> async_sessionmaker:
+    """创建异步会话工厂（提交后不过期对象，响应构建时无需再次查询）"""
+    return async_sessionmaker(engine, expire_on_commit=False)
@@ -0,0 +1,81 @@
+"""
+异步Redis客户端
+asyncio gRPC服务使用，缓存键、序列化格式和出错降级策略与RedisClient一致
+"""
+import json
+import logging
+from typing import Any, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from history.config import (
+    REDIS_HOST, REDIS_PORT, REDIS_PASSWORD,
+    REDIS_DB, REDIS_POOL_SIZE
+)
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 连接池（连接在首次使用时于事件循环中建立）
+_redis_pool = aioredis.ConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    password=REDIS_PASSWORD,
+    db=REDIS_DB,
+    max_connections=REDIS_POOL_SIZE,
+    socket_keepalive=True,
+    health_check_interval=30,
+    decode_responses=True
+)
+
+
+class AsyncRedisClient:
+    """异步Redis客户端封装类"""
+
+    @staticmethod
+    def get_instance() -> aioredis.Redis:
+        """获取异步Redis客户端实例（从连接池获取）"""
+        return aioredis.Redis(connection_pool=_redis_pool)
+
+    @staticmethod
+    async def cache_data(key: str, data: Any, expire_seconds: int = 1800) -> bool:
+        """缓存数据（dict、list自动JSON序列化），Redis不可用时返回False"""
+        try:
+            if isinstance(data, (dict, list)):
+                data = json.dumps(data, ensure_ascii=False)
+            await AsyncRedisClient.get_instance().set(key, data, ex=expire_seconds)
+            logger.debug(f"Cached data for key: {key}, TTL: {expire_seconds}s")
+            return True
+        except RedisError as e:
+            logger.error(f"Redis cache error for key {key}: {e}")
+            return False
+
+    @staticmethod
+    async def get_cached_data(key: str, is_json: bool = True) -> Optional[Any]:
+        """获取缓存数据（默认JSON反序列化），不存在或出错返回None"""
+        try:
+            data = await AsyncRedisClient.get_instance().get(key)
+            if data is None:
+                return None
+            if is_json:
+                return json.loads(data)
+            return data
+        except (RedisError, json.JSONDecodeError) as e:
+            logger.error(f"Redis get error for key {key}: {e}")
+            return None
+
+    @staticmethod
+    async def delete_cache(key: str) -> bool:
+        """删除单个缓存"""
+        try:
+            result = await AsyncRedisClient.get_instance().delete(key)
+            logger.debug(f"Deleted cache for key: {key}")
+            return result > 0
+        except RedisError as e:
+            logger.error(f"Redis delete error for key {key}: {e}")
+            return False
+
+    @staticmethod
+    async def close() -> None:
+        """关闭连接池（服务停止时调用）"""
+        await _redis_pool.disconnect()
@@ -157,6 +157,13 @@ class LinkKeys:
         """
         return f"{PROJECT_PREFIX}:link:graph:{constellation_id}"
 
+    @staticmethod
+    def routing_table(constellation_id: int, timestamp: int) -> str:
+        """星座某一时刻的全网路由表（NumPy下一跳矩阵，npz二进制）
+        TTL: 1小时（由批处理任务生成）
+        """
+        return f"{LinkKeys.graph_data(constellation_id)}:routing:{timestamp}"
+
 
 # ==================== 基站相关键 ====================
 class BaseKeys: